@@ -0,0 +1,243 @@
+"""Server-side DataTables engine shared by the /api table endpoints.
+
+Each endpoint declares a ``TableSpec`` (columns, a search matcher from
+``search.py``, default order and a row serializer) and hands it to ``serve``.
+
+A spec either loads ORM objects and turns each into a dict (``row``), or,
+with ``fields``, selects plain column tuples and turns each into a list of
+values in ``fields`` order. ``?format=array`` returns rows as arrays in
+column order instead of objects, which DataTables reads with
+``columns: [{data: 0}, ...]`` and which doesn't repeat every key per row.
+
+Paging uses keyset (seek) pagination on ``(sort column, id)``: after serving a
+page we remember the sort key of its first and last row by absolute position.
+When the client then asks for the next (or previous) page we seek from that
+key instead of making the database walk and discard ``start`` rows.  OFFSET is
+only used for random jumps we have no cursor for.  Cursors are keyed on the
+versions of the spec's tables, so after any insert or delete positions are
+recomputed with OFFSET rather than seeking from a stale boundary.
+
+Cursors live in a small LRU inside each worker, not in ``extensions.cache``.
+They are short-lived, and a page view shouldn't turn into shared-cache
+writes. A follow-up request served by another worker just pays one OFFSET.
+
+Nullable sort columns seek with NULL-aware predicates. MySQL and SQLite
+both sort NULL lowest (first ascending, last descending), and the
+predicates assume that order.
+"""
+import hashlib
+import os
+import time
+
+from flask import request, jsonify
+from sqlalchemy import func, or_, and_, asc, desc
+
+import etags
+from extensions import db
+from tiercache import LRU
+
+CURSOR_TIMEOUT = 300  # seconds a page boundary stays usable for seeking
+CURSOR_ITEMS = 20000  # boundaries kept per worker
+
+_cursors = LRU(CURSOR_ITEMS)
+
+
+def _reset_after_fork():
+    global _cursors
+    _cursors = LRU(CURSOR_ITEMS)  # a fresh lock, too
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class Column:
+    """One client-visible column. ``attr`` is the mapped attribute to sort on."""
+
+    def __init__(self, name, attr=None, orderable=True):
+        self.name = name
+        self.attr = attr
+        self.orderable = orderable and attr is not None
+
+
+class TableSpec:
+    def __init__(self, name, model, columns, row, search=None, default_order=("created_at", "desc"), query=None,
+                 tables=None, fields=None):
+        self.name = name
+        self.model = model
+        self.columns = columns
+        # callable(obj) -> dict, or with ``fields`` callable(tuple) -> list of values
+        self.row = row
+        # value names for list rows; the first ones must be the columns, in order
+        self.fields = fields
+        self.search = search                # callable(term) -> filter clause
+        self.default_order = default_order  # (column name, "asc"|"desc")
+        self.query = query                  # optional callable() -> base query
+        # tables whose writes change the response (for the ETag)
+        self.tables = tuple(tables or (model.__tablename__,))
+        self._by_name = {c.name: c for c in columns}
+
+    def base_query(self):
+        if self.query is not None:
+            return self.query()
+        return db.session.query(self.model)
+
+    def column(self, name):
+        return self._by_name.get(name)
+
+
+def parse_params():
+    """Parse DataTables params from request.values (GET or POST)."""
+    args = request.values
+    order_col_index = args.get("order[0][column]")
+    order_data = None
+    if order_col_index is not None and order_col_index.isdigit():
+        # DataTables tells us which data key the ordered column is bound to
+        order_data = args.get(f"columns[{order_col_index}][data]")
+    return {
+        "draw": int(args.get("draw", "1")),
+        "start": max(int(args.get("start", "0")), 0),
+        "length": int(args.get("length", "10")),
+        "search": (args.get("search[value]") or "").strip(),
+        "order_index": order_col_index,
+        "order_data": order_data,
+        "order_dir": args.get("order[0][dir]", "asc").lower(),
+        "format": (args.get("format") or "").lower(),
+    }
+
+
+def _resolve_order(spec, params):
+    col = None
+    if params["order_data"] and not params["order_data"].isdigit():
+        col = spec.column(params["order_data"])
+    elif params["order_index"] is not None and params["order_index"].isdigit():
+        idx = min(int(params["order_index"]), len(spec.columns) - 1)
+        col = spec.columns[idx]
+    if col is None or not col.orderable:
+        name, direction = spec.default_order
+        return spec.column(name), direction == "desc"
+    return col, params["order_dir"] == "desc"
+
+
+def _cursor_key(spec, signature, position):
+    return f"dt:{spec.name}:{signature}:{position}"
+
+
+def _nullable(attr):
+    return getattr(getattr(attr, "expression", attr), "nullable", True)
+
+
+def _seek(attr, key_attr, cursor, descending):
+    """Rows after ``cursor`` in (attr, id) order, NULL sorting lowest."""
+    value, ident = cursor
+    if value is None:
+        # ascending, NULLs come first: the rest of the NULLs, then every value
+        if descending:
+            return and_(attr.is_(None), key_attr < ident)
+        return or_(and_(attr.is_(None), key_attr > ident), attr.is_not(None))
+    if descending:
+        clause = or_(attr < value, and_(attr == value, key_attr < ident))
+        # descending, NULLs come last
+        return or_(clause, attr.is_(None)) if _nullable(attr) else clause
+    return or_(attr > value, and_(attr == value, key_attr > ident))
+
+
+def _remember(spec, signature, position, attr, row):
+    _cursors.set(_cursor_key(spec, signature, position), (getattr(row, attr.key), row.id),
+                 time.monotonic() + CURSOR_TIMEOUT)
+
+
+def _cursor(spec, signature, position):
+    return _cursors.get(_cursor_key(spec, signature, position), time.monotonic())
+
+
+def fetch_page(spec, query, col, descending, start, length, signature):
+    """Return one page of ``query`` ordered by (col, id), seeking when possible."""
+    attr, key_attr = col.attr, spec.model.id
+    fwd = (desc, desc) if descending else (asc, asc)
+    ordered = query.order_by(fwd[0](attr), fwd[1](key_attr))
+
+    if length < 0:  # "All"
+        return ordered.offset(start).all()
+    if start == 0:
+        rows = ordered.limit(length).all()
+    else:
+        after = _cursor(spec, signature, start - 1)
+        before = None if after else _cursor(spec, signature, start + length)
+        if after:
+            rows = ordered.filter(_seek(attr, key_attr, after, descending)).limit(length).all()
+        elif before:
+            back = (asc, asc) if descending else (desc, desc)
+            rows = (
+                query.filter(_seek(attr, key_attr, before, not descending))
+                .order_by(back[0](attr), back[1](key_attr))
+                .limit(length)
+                .all()
+            )
+            rows.reverse()
+        else:
+            rows = ordered.offset(start).limit(length).all()
+
+    if rows:
+        _remember(spec, signature, start, attr, rows[0])
+        _remember(spec, signature, start + len(rows) - 1, attr, rows[-1])
+    return rows
+
+
+def _serialize(spec, rows, as_arrays):
+    if spec.fields is not None:
+        values = [spec.row(r) for r in rows]
+        if as_arrays:
+            return values
+        fields = spec.fields
+        return [dict(zip(fields, v)) for v in values]
+    dicts = [spec.row(r) for r in rows]
+    if as_arrays:
+        names = [c.name for c in spec.columns]
+        return [[d.get(n) for n in names] for d in dicts]
+    return dicts
+
+
+def serve(spec):
+    """Answer a DataTables server-side request for ``spec``.
+
+    GETs carry an ETag built from the versions of ``spec.tables``; a matching
+    ``If-None-Match`` gets a 304 before any data query runs.
+    """
+    params = parse_params()
+    model = spec.model
+
+    etag, versions = etags.etag_for(set(spec.tables) | {model.__tablename__}, exclude=("draw", "_"))
+    if request.method == "GET":
+        unchanged = etags.not_modified(etag)
+        if unchanged is not None:
+            return unchanged
+
+    query = spec.base_query()
+    total_records = versions[model.__tablename__][0]
+
+    search_value = params["search"]
+    if search_value and spec.search:
+        clause = spec.search(search_value)
+        query = query.filter(clause)
+        # matchers only reference the model's own table, so count without joins
+        filtered_records = db.session.query(func.count(model.id)).filter(clause).scalar() or 0
+    else:
+        filtered_records = total_records
+
+    col, descending = _resolve_order(spec, params)
+    # positions shift with every insert/delete, so cursors belong to one table version
+    stamp = ",".join(f"{t}={versions[t][1]}" for t in sorted(versions))
+    signature = hashlib.md5(
+        f"{search_value}\x00{col.name}\x00{int(descending)}\x00{stamp}".encode("utf-8")
+    ).hexdigest()
+    rows = fetch_page(spec, query, col, descending, params["start"], params["length"], signature)
+
+    resp = jsonify({
+        "draw": params["draw"],
+        "recordsTotal": total_records,
+        "recordsFiltered": filtered_records,
+        "data": _serialize(spec, rows, params["format"] == "array"),
+    })
+    if request.method == "GET":
+        etags.stamp(resp, etag)
+    return resp
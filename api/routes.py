@@ -1,358 +1,217 @@
-from flask import Blueprint, request, jsonify, abort
-from flask_jwt_extended import verify_jwt_in_request, get_jwt
-from sqlalchemy import func, or_, asc, desc
-from sqlalchemy.orm import joinedload
+from flask import Blueprint, abort, request, jsonify
+from sqlalchemy import or_
 
-from extensions import db
+import search
+from auth.context import login_required, admin_required
+from extensions import db, cache
 from models import User, Customer, Game, Bank, Transaction
+from api.datatables import Column, TableSpec, serve
 
 api_bp = Blueprint("api", __name__, url_prefix="/api")
 
-def _parse_dt_params():
-    """Parse DataTables params from request.args (GET or POST)."""
-    args = request.values  # works for GET or POST
-    draw   = int(args.get("draw", "1"))
-    start  = int(args.get("start", "0"))
-    length = int(args.get("length", "10"))
-    search_value = (args.get("search[value]") or "").strip()
-    # Sorting: DataTables can send multiple order[i], we’ll use the first
-    order_col_index = args.get("order[0][column]")
-    order_dir = args.get("order[0][dir]", "asc").lower()
-    return draw, start, length, search_value, order_col_index, order_dir
-
-def _jwt_required():
-    # API endpoints: enforce JWT but keep JSON when unauthorized via your global handlers
-    verify_jwt_in_request()
+def _fmt(dt, fmt="%Y-%m-%d %H:%M"):
+    return dt.strftime(fmt) if dt else ""
+
+def _customer_row(customer):
+    return {
+        "id": customer.id,
+        "name": customer.name,
+        "acc_id": customer.acc_id,
+        "created_by": customer.created_by or "",
+        "updated_by": customer.updated_by or "",
+        "created_at": _fmt(customer.created_at),
+        "updated_at": _fmt(customer.updated_at)
+    }
+
+def _named_row(obj):
+    # games and banks share the same shape
+    return {
+        "id": obj.id,
+        "name": obj.name,
+        "created_by": obj.created_by or "",
+        "updated_by": obj.updated_by or "",
+        "created_at": _fmt(obj.created_at),
+        "updated_at": _fmt(obj.updated_at)
+    }
+
+# /api/transactions reads plain column tuples, never Transaction objects
+TRANSACTION_FIELDS = [
+    "id", "amount", "currency", "bank_stor", "customer_name", "bank_name", "game_name", "type",
+    "created_by", "updated_by", "created_at", "updated_at",
+    "customer_id", "bank_id", "game_id",
+]
+_TRANSACTION_SELECT = [
+    Transaction.id, Transaction.amount, Transaction.currency, Transaction.bank_stor,
+    Customer.name.label("customer_name"), Bank.name.label("bank_name"), Game.name.label("game_name"),
+    Transaction.type, Transaction.created_by, Transaction.updated_by,
+    Transaction.created_at, Transaction.updated_at,
+    Transaction.customer_id, Transaction.bank_id, Transaction.game_id,
+]
+
+def _transactions_query():
+    return (
+        db.session.query(*_TRANSACTION_SELECT)
+        .select_from(Transaction)
+        .outerjoin(Customer, Customer.id == Transaction.customer_id)
+        .outerjoin(Bank, Bank.id == Transaction.bank_id)
+        .outerjoin(Game, Game.id == Transaction.game_id)
+    )
 
-def _admin_required():
-    _jwt_required()
-    claims = get_jwt() or {}
-    if not claims.get("is_admin", False):
-        abort(403, description="Admins only")
+def _transaction_values(r):
+    (tid, amount, currency, bank_stor, customer_name, bank_name, game_name, type_,
+     created_by, updated_by, created_at, updated_at, customer_id, bank_id, game_id) = r
+    return [
+        tid, amount, currency, bank_stor,
+        customer_name or "", bank_name or "", game_name or "", type_,
+        created_by or "", updated_by or "",
+        # same text as _fmt, without strftime's per-call format parsing
+        created_at.isoformat(" ", "minutes") if created_at else "",
+        updated_at.isoformat(" ", "minutes") if updated_at else "",
+        customer_id, bank_id, game_id,
+    ]
+
+def _user_row(u):
+    return {
+        "id": u.id,
+        "fullname": u.fullname,
+        "username": u.username,
+        "is_admin": bool(u.is_admin),
+        "created_at": _fmt(u.created_at, "%Y-%m-%d %H:%M:%S %p"),
+        "updated_at": _fmt(u.updated_at, "%Y-%m-%d %H:%M:%S %p")
+    }
+
+def _audit_columns(model):
+    return [
+        Column("created_by", model.created_by),
+        Column("updated_by", model.updated_by),
+        Column("created_at", model.created_at),
+        Column("updated_at", model.updated_at),
+    ]
+
+CUSTOMERS = TableSpec(
+    "customers", Customer,
+    columns=[Column("id", Customer.id), Column("name", Customer.name), Column("acc_id", Customer.acc_id),
+             *_audit_columns(Customer)],
+    search=search.customers,
+    row=_customer_row,
+)
+
+GAMES = TableSpec(
+    "games", Game,
+    columns=[Column("id", Game.id), Column("name", Game.name), *_audit_columns(Game)],
+    search=search.games,
+    row=_named_row,
+)
+
+BANKS = TableSpec(
+    "banks", Bank,
+    columns=[Column("id", Bank.id), Column("name", Bank.name), *_audit_columns(Bank)],
+    search=search.banks,
+    row=_named_row,
+)
+
+TRANSACTIONS = TableSpec(
+    "transactions", Transaction,
+    columns=[
+        Column("id", Transaction.id),
+        Column("amount", Transaction.amount),
+        Column("currency", Transaction.currency),
+        Column("bank_stor", Transaction.bank_stor),
+        Column("customer_name"),
+        Column("bank_name"),
+        Column("game_name"),
+        Column("type", Transaction.type),
+        *_audit_columns(Transaction),
+    ],
+    search=search.transactions,
+    row=_transaction_values,
+    fields=TRANSACTION_FIELDS,
+    query=_transactions_query,
+    # rows show customer/bank/game names
+    tables=("transactions", "customers", "banks", "games"),
+)
+
+USERS = TableSpec(
+    "users", User,
+    columns=[Column("id", User.id), Column("fullname", User.fullname), Column("username", User.username),
+             Column("is_admin", User.is_admin), Column("created_at", User.created_at),
+             Column("updated_at", User.updated_at)],
+    search=search.users,
+    row=_user_row,
+)
 
 @api_bp.route("/customers", methods=["GET", "POST"])
 def customers_table():
-    _jwt_required()
-
-    draw, start, length, search_value, order_col_index, order_dir = _parse_dt_params()
-    columns = ["id", "name", "acc_id", "created_by", "updated_by", "created_at", "updated_at"]
-
-    base_query = db.session.query(Customer)
-    total_records = db.session.scalar(db.select(func.count(Customer.id))) or 0
-
-    if search_value:
-        like = f"%{search_value}%"
-        base_query = base_query.filter(
-            or_(Customer.name.ilike(like), Customer.acc_id.ilike(like))
-        )
-
-    filtered_records = base_query.with_entities(func.count(Customer.id)).scalar() or 0
-
-    # Ordering
-    if order_col_index is not None and order_col_index.isdigit():
-        idx = int(order_col_index)
-        idx = min(max(idx, 0), len(columns) - 1)
-        colname = columns[idx]
-        col = getattr(Customer, colname)
-        if order_dir == "desc":
-            base_query = base_query.order_by(desc(col))
-        else:
-            base_query = base_query.order_by(asc(col))
-    else:
-        base_query = base_query.order_by(desc(Customer.created_at))
-
-    # Paging
-    rows = base_query.offset(start).limit(length).all()
-
-    data = []
-    for customer in rows:
-        data.append({
-            "id": customer.id,
-            "name": customer.name,
-            "acc_id": customer.acc_id,
-            "created_by": customer.created_by or "",
-            "updated_by": customer.updated_by or "",
-            "created_at": customer.created_at.strftime("%Y-%m-%d %H:%M") if customer.created_at else "",
-            "updated_at": customer.updated_at.strftime("%Y-%m-%d %H:%M") if customer.updated_at else ""
-        })
-
-    return jsonify({
-        "draw": draw,
-        "recordsTotal": total_records,
-        "recordsFiltered": filtered_records,
-        "data": data
-    })
+    login_required()
+    return serve(CUSTOMERS)
 
 @api_bp.route("/games", methods=["GET", "POST"])
 def games_table():
-    _jwt_required()
-
-    draw, start, length, search_value, order_col_index, order_dir = _parse_dt_params()
-    columns = ["id", "name", "created_by", "updated_by", "created_at", "updated_at"]
-
-    base_query = db.session.query(Game)
-    total_records = db.session.scalar(db.select(func.count(Game.id))) or 0
-
-    if search_value:
-        like = f"%{search_value}%"
-        base_query = base_query.filter(
-            Game.name.ilike(like)
-        )
-
-    filtered_records = base_query.with_entities(func.count(Game.id)).scalar() or 0
-
-    # Ordering
-    if order_col_index is not None and order_col_index.isdigit():
-        idx = int(order_col_index)
-        idx = min(max(idx, 0), len(columns) - 1)
-        colname = columns[idx]
-        col = getattr(Game, colname)
-        if order_dir == "desc":
-            base_query = base_query.order_by(desc(col))
-        else:
-            base_query = base_query.order_by(asc(col))
-    else:
-        base_query = base_query.order_by(desc(Game.created_at))
-
-    # Paging
-    rows = base_query.offset(start).limit(length).all()
-
-    data = []
-    for game in rows:
-        data.append({
-            "id": game.id,
-            "name": game.name,
-            "created_by": game.created_by or "",
-            "updated_by": game.updated_by or "",
-            "created_at": game.created_at.strftime("%Y-%m-%d %H:%M") if game.created_at else "",
-            "updated_at": game.updated_at.strftime("%Y-%m-%d %H:%M") if game.updated_at else ""
-        })
-
-    return jsonify({
-        "draw": draw,
-        "recordsTotal": total_records,
-        "recordsFiltered": filtered_records,
-        "data": data
-    })
+    login_required()
+    return serve(GAMES)
 
 @api_bp.route("/banks", methods=["GET", "POST"])
 def banks_table():
-    _jwt_required()
-
-    draw, start, length, search_value, order_col_index, order_dir = _parse_dt_params()
-    columns = ["id", "name", "created_by", "updated_by", "created_at", "updated_at"]
-
-    base_query = db.session.query(Bank)
-    total_records = db.session.scalar(db.select(func.count(Bank.id))) or 0
-
-    if search_value:
-        like = f"%{search_value}%"
-        base_query = base_query.filter(
-            Bank.name.ilike(like)
-        )
-
-    filtered_records = base_query.with_entities(func.count(Bank.id)).scalar() or 0
-
-    # Ordering
-    if order_col_index is not None and order_col_index.isdigit():
-        idx = int(order_col_index)
-        idx = min(max(idx, 0), len(columns) - 1)
-        colname = columns[idx]
-        col = getattr(Bank, colname)
-        if order_dir == "desc":
-            base_query = base_query.order_by(desc(col))
-        else:
-            base_query = base_query.order_by(asc(col))
-    else:
-        base_query = base_query.order_by(desc(Bank.created_at))
-
-    # Paging
-    rows = base_query.offset(start).limit(length).all()
-
-    data = []
-    for bank in rows:
-        data.append({
-            "id": bank.id,
-            "name": bank.name,
-            "created_by": bank.created_by or "",
-            "updated_by": bank.updated_by or "",
-            "created_at": bank.created_at.strftime("%Y-%m-%d %H:%M") if bank.created_at else "",
-            "updated_at": bank.updated_at.strftime("%Y-%m-%d %H:%M") if bank.updated_at else ""
-        })
-
-    return jsonify({
-        "draw": draw,
-        "recordsTotal": total_records,
-        "recordsFiltered": filtered_records,
-        "data": data
-    })
+    login_required()
+    return serve(BANKS)
 
 @api_bp.route("/transactions", methods=["GET", "POST"])
 def transactions_table():
-    _jwt_required()
-
-    draw, start, length, search_value, order_col_index, order_dir = _parse_dt_params()
-    columns = ["id", "amount", "created_by", "updated_by", "created_at", "updated_at"]
-
-    base_query = db.session.query(Transaction).options(
-        joinedload(Transaction.customer),
-        joinedload(Transaction.bank),
-        joinedload(Transaction.game)
-    )
-    total_records = db.session.scalar(db.select(func.count(Transaction.id))) or 0
-
-    if search_value:
-        like = f"%{search_value}%"
-        base_query = base_query.filter(
-            Transaction.name.ilike(like)
-        )
-
-    filtered_records = base_query.with_entities(func.count(Transaction.id)).scalar() or 0
-
-    # Ordering
-    if order_col_index is not None and order_col_index.isdigit():
-        idx = int(order_col_index)
-        idx = min(max(idx, 0), len(columns) - 1)
-        colname = columns[idx]
-        col = getattr(Transaction, colname)
-        if order_dir == "desc":
-            base_query = base_query.order_by(desc(col))
-        else:
-            base_query = base_query.order_by(asc(col))
-    else:
-        base_query = base_query.order_by(desc(Transaction.created_at))
-
-    # Paging
-    rows = base_query.offset(start).limit(length).all()
-
-    data = []
-    for transaction in rows:
-        data.append({
-            "id": transaction.id,
-            "amount": transaction.amount,
-            "bank_stor": transaction.bank_stor,
-            "customer_id": transaction.customer_id,
-            "customer_name": transaction.customer.name if transaction.customer else "",
-            "bank_id": transaction.bank_id,
-            "bank_name": transaction.bank.name if transaction.bank else "",
-            "game_id": transaction.game_id,
-            "game_name": transaction.game.name if transaction.game else "",
-            "currency": transaction.currency,
-            "type": transaction.type,
-            "created_by": transaction.created_by or "",
-            "updated_by": transaction.updated_by or "",
-            "created_at": transaction.created_at.strftime("%Y-%m-%d %H:%M") if transaction.created_at else "",
-            "updated_at": transaction.updated_at.strftime("%Y-%m-%d %H:%M") if transaction.updated_at else ""
-        })
-
-    return jsonify({
-        "draw": draw,
-        "recordsTotal": total_records,
-        "recordsFiltered": filtered_records,
-        "data": data
-    })
-
-@api_bp.route("/booking", methods=["GET", "POST"])
-def books_table():
-    _jwt_required()
-
-    draw, start, length, search_value, order_col_index, order_dir = _parse_dt_params()
-
-    # Column mapping (MUST match columns config on client)
-    columns = ["id", "title", "author", "isbn", "published_year", "copies", "created_at"]
-
-    base_query = db.session.query(Book)
-    total_records = db.session.scalar(db.select(func.count(Book.id))) or 0
-
-    # Searching
-    if search_value:
-        like = f"%{search_value}%"
-        base_query = base_query.filter(
-            or_(Book.title.ilike(like), Book.author.ilike(like), Book.isbn.ilike(like))
-        )
-
-    filtered_records = base_query.with_entities(func.count(Book.id)).scalar() or 0
-
-    # Ordering
-    if order_col_index is not None and order_col_index.isdigit():
-        idx = int(order_col_index)
-        idx = min(max(idx, 0), len(columns)-1)
-        colname = columns[idx]
-        col = getattr(Book, colname)
-        if order_dir == "desc":
-            base_query = base_query.order_by(desc(col))
-        else:
-            base_query = base_query.order_by(asc(col))
-    else:
-        base_query = base_query.order_by(desc(Book.created_at))
-
-    # Paging
-    rows = base_query.offset(start).limit(length).all()
-
-    data = []
-    for b in rows:
-        data.append({
-            "id": b.id,
-            "title": b.title,
-            "author": b.author,
-            "isbn": b.isbn or "",
-            "published_year": b.published_year or "",
-            "copies": b.copies,
-            "created_at": b.created_at.strftime("%Y-%m-%d %H:%M") if b.created_at else ""
-        })
-
-    return jsonify({
-        "draw": draw,
-        "recordsTotal": total_records,
-        "recordsFiltered": filtered_records,
-        "data": data
-    })
+    login_required()
+    return serve(TRANSACTIONS)
 
 @api_bp.route("/users", methods=["GET", "POST"])
 def users_table():
-    _admin_required()  # only admins can see users table
-
-    draw, start, length, search_value, order_col_index, order_dir = _parse_dt_params()
-
-    columns = ["id", "fullname", "username", "is_admin", "created_at", "updated_at"]
-
-    base_query = db.session.query(User)
-    total_records = db.session.scalar(db.select(func.count(User.id))) or 0
-
-    if search_value:
-        like = f"%{search_value}%"
-        base_query = base_query.filter(User.username.ilike(like))
-
-    filtered_records = base_query.with_entities(func.count(User.id)).scalar() or 0
-
-    if order_col_index is not None and order_col_index.isdigit():
-        idx = int(order_col_index)
-        idx = min(max(idx, 0), len(columns)-1)
-        colname = columns[idx]
-        col = getattr(User, colname)
-        if order_dir == "desc":
-            base_query = base_query.order_by(desc(col))
-        else:
-            base_query = base_query.order_by(asc(col))
-    else:
-        base_query = base_query.order_by(desc(User.created_at))
-
-    rows = base_query.offset(start).limit(length).all()
-
-    data = []
-    for u in rows:
-        data.append({
-            "id": u.id,
-            "fullname": u.fullname,
-            "username": u.username,
-            "is_admin": bool(u.is_admin),
-            "created_at": u.created_at.strftime("%Y-%m-%d %H:%M:%S %p") if u.created_at else "",
-            "updated_at": u.updated_at.strftime("%Y-%m-%d %H:%M:%S %p") if u.updated_at else ""
-        })
-
-    return jsonify({
-        "draw": draw,
-        "recordsTotal": total_records,
-        "recordsFiltered": filtered_records,
-        "data": data
-    })
+    admin_required()  # only admins can see users table
+    return serve(USERS)
+
+LOOKUP_PAGE_SIZE = 20
+LOOKUP_TIMEOUT = 30  # seconds; new records show up in the picker after this
+
+def _customer_option(c):
+    return {"id": c.id, "text": f"{c.name} - {c.acc_id}", "name": c.name, "acc_id": c.acc_id}
+
+def _named_option(obj):
+    return {"id": obj.id, "text": obj.name, "name": obj.name}
+
+# kind -> (model, prefix-indexed columns, option builder)
+LOOKUPS = {
+    "customers": (Customer, (Customer.name, Customer.acc_id), _customer_option),
+    "banks": (Bank, (Bank.name,), _named_option),
+    "games": (Game, (Game.name,), _named_option),
+}
+
+def _lookup(kind, term, page):
+    model, columns, option = LOOKUPS[kind]
+    query = db.session.query(model)
+    if term:
+        query = query.filter(or_(*[search.prefix_match(c, term) for c in columns]))
+    rows = (
+        query.order_by(columns[0], model.id)
+        .offset((page - 1) * LOOKUP_PAGE_SIZE)
+        .limit(LOOKUP_PAGE_SIZE + 1)  # one extra row tells us whether there's more
+        .all()
+    )
+    return {
+        "results": [option(r) for r in rows[:LOOKUP_PAGE_SIZE]],
+        "pagination": {"more": len(rows) > LOOKUP_PAGE_SIZE},
+    }
+
+@api_bp.get("/lookup/<kind>")
+def lookup(kind):
+    """Select2 AJAX typeahead: ?q=<prefix>&page=<n>."""
+    login_required()
+    if kind not in LOOKUPS:
+        abort(404)
+    term = (request.args.get("q") or "").strip()
+    page = max(request.args.get("page", 1, type=int) or 1, 1)
+
+    key = f"lookup:{kind}:{term.lower()}:{page}"
+    payload = cache.get(key)
+    if payload is None:
+        payload = _lookup(kind, term, page)
+        cache.set(key, payload, timeout=LOOKUP_TIMEOUT)
+
+    resp = jsonify(payload)
+    resp.headers["Cache-Control"] = f"private, max-age={LOOKUP_TIMEOUT}"
+    return resp
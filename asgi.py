@@ -0,0 +1,170 @@
+"""ASGI entry point: serves the read-only JSON endpoints on an event loop.
+
+    uvicorn asgi:app --workers 4
+    # or: gunicorn -k uvicorn.workers.UvicornWorker -w 4 asgi:app
+
+Under WSGI, each request holds a worker thread while its queries run, so
+slow report queries pin every thread. Here the DataTables endpoints
+(``/api/*``) and ``/reports/api/summary`` run on the loop against an async
+engine (aiomysql for MySQL, aiosqlite for SQLite). Thousands of reads can
+wait on the database at once from a few processes, queueing on
+``ASYNC_POOL_SIZE`` connections instead of on threads.
+
+The views themselves don't change. Each request opens an ``AsyncSession``
+and runs the normal Flask dispatch (hooks, auth, ETags, compression)
+inside ``AsyncSession.run_sync``, SQLAlchemy's greenlet bridge. During
+that call ``db.session`` is bound to the session's sync facade, so queries
+through ``db.session`` await the async driver and yield the loop.
+
+Nothing else in that call is async by itself. The other blocking I/O on
+these paths is handed to the loop's thread pool through ``offload.run``:
+the cache's L2 (tiercache.py), counter seeding on a sync connection
+(counters.py) and the metrics file flush. Replica routing (replicas.py)
+is skipped here; these requests read from ``ASYNC_DATABASE_URL``. New
+blocking calls on these endpoints need the same treatment.
+
+Everything else (pages, writes, exports, login) goes to the WSGI app on
+asgiref's thread pool, exactly as under a WSGI server.
+
+Needs ``asgiref``, ``aiomysql`` (or ``aiosqlite``) and an ASGI server such
+as ``uvicorn``.
+"""
+import io
+import sys
+
+from asgiref.wsgi import WsgiToAsgi
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from werkzeug.exceptions import HTTPException
+
+from extensions import db
+
+ASYNC_DRIVERS = {"mysql": "aiomysql", "mariadb": "aiomysql", "sqlite": "aiosqlite"}
+# Endpoints served on the loop: whole blueprints, and single endpoints
+ASYNC_BLUEPRINTS = {"api"}
+ASYNC_ENDPOINTS = {"reports.api_summary"}
+
+
+def async_database_url(config):
+    """``ASYNC_DATABASE_URL``, or the app's database URL with its async driver."""
+    if config.get("ASYNC_DATABASE_URL"):
+        return config["ASYNC_DATABASE_URL"]
+    url = make_url(config["SQLALCHEMY_DATABASE_URI"])
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f"no async driver known for {backend}; set ASYNC_DATABASE_URL")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+def _environ(scope):
+    """WSGI environ for a body-less ASGI HTTP request."""
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+        "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+        "QUERY_STRING": scope["query_string"].decode("ascii"),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(b""),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    server = scope.get("server") or ("localhost", 80)
+    environ["SERVER_NAME"], environ["SERVER_PORT"] = server[0], str(server[1] or 80)
+    if scope.get("client"):
+        environ["REMOTE_ADDR"], environ["REMOTE_PORT"] = scope["client"][0], str(scope["client"][1])
+    for name, value in scope["headers"]:
+        name = name.decode("latin1")
+        if name == "content-type":
+            key = "CONTENT_TYPE"
+        elif name == "content-length":
+            key = "CONTENT_LENGTH"
+        else:
+            key = "HTTP_" + name.upper().replace("-", "_")
+        value = value.decode("latin1")
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+class AsyncApp:
+    """ASGI app running the async endpoints itself and the rest through WSGI."""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.engine = None  # created on first use, inside the worker's event loop
+
+    def _engine(self):
+        if self.engine is None:
+            config = self.flask_app.config
+            self.engine = create_async_engine(
+                async_database_url(config), **config.get("ASYNC_ENGINE_OPTIONS", {})
+            )
+        return self.engine
+
+    def _is_async(self, environ):
+        try:
+            endpoint, _ = self.flask_app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            return False  # 404/405/redirects: let Flask answer as usual
+        return endpoint in ASYNC_ENDPOINTS or endpoint.partition(".")[0] in ASYNC_BLUEPRINTS
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            return await self.wsgi(scope, receive, send)
+        environ = _environ(scope)
+        if not self._is_async(environ):
+            return await self.wsgi(scope, receive, send)
+
+        async with AsyncSession(self._engine()) as session:
+            status, headers, body = await session.run_sync(self._dispatch, environ)
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(k.lower().encode("latin1"), v.encode("latin1")) for k, v in headers],
+        })
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else body})
+
+    def _dispatch(self, sync_session, environ):
+        """Flask's wsgi_app for one request, with db.session bound to ``sync_session``."""
+        app = self.flask_app
+        ctx = app.request_context(environ)
+        error = None
+        try:
+            ctx.push()
+            db.session.registry.set(sync_session)
+            try:
+                response = app.full_dispatch_request()
+            except Exception as e:
+                error = e
+                response = app.handle_exception(e)
+            body = response.get_data()
+            response.close()
+            return response.status_code, list(response.headers.items()), body
+        finally:
+            ctx.pop(error)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self.engine is not None:
+                    await self.engine.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def create_asgi_app(flask_app=None):
+    if flask_app is None:
+        from main import app as flask_app
+    return AsyncApp(flask_app)
+
+
+app = create_asgi_app()
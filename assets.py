@@ -0,0 +1,326 @@
+"""Self-hosted, fingerprinted static bundles.
+
+Third-party CSS/JS used to come from jsdelivr on every page load. Now it
+is vendored under ``static/vendor`` and bundled per page into
+``static/dist``:
+
+    flask --app main assets vendor   # download the pinned files (needs internet; commit the result)
+    flask --app main assets build    # run on every deploy, like db-upgrade
+
+``build`` concatenates each bundle in ``BUNDLES`` and minifies the
+sources that aren't minified already. It uses ``rcssmin``/``rjsmin`` when
+installed. Without them, CSS gets a basic comment/whitespace pass and JS
+is left as is. Each bundle is written as ``<name>.<hash>.<ext>``. Files
+a stylesheet references (the icon fonts) get the same treatment, with
+the ``url()`` rewritten to match. Next to each text file goes a ``.gz``
+and, with the ``brotli`` package, a ``.br`` at maximum level: they are
+compressed once at build time rather than per request.
+``static/dist/manifest.json`` maps bundle names to the current files.
+
+``/static/dist/...`` is served with ``Cache-Control: immutable`` for a
+year. The name changes whenever the content does, so browsers never
+revalidate. A client that accepts ``br`` or ``gzip`` gets the
+precompressed file.
+
+Templates ask for ``asset_urls("base.css")``. Before the first build
+(local development) that lists the individual vendored files instead.
+Pages never load anything from the CDN, so offline and LAN terminals
+work. ``build`` refuses to run while any file in ``VENDOR`` is missing.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import urllib.request
+from posixpath import dirname, join, normpath, relpath
+
+import click
+from flask import current_app, request, send_file, url_for
+from flask.cli import AppGroup
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # optional; gzip variants only
+    brotli = None
+
+try:
+    import rcssmin
+except ImportError:  # optional; see _minify_css
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:  # optional; own JS is then shipped unminified
+    rjsmin = None
+
+CDN = "https://cdn.jsdelivr.net/npm/"
+# static/vendor path -> pinned upstream file. Layout mirrors the packages,
+# so relative url()s in the stylesheets (icon fonts) still resolve.
+VENDOR = {
+    "bootstrap/bootstrap.min.css": "bootstrap@5.3.3/dist/css/bootstrap.min.css",
+    "bootstrap/bootstrap.bundle.min.js": "bootstrap@5.3.3/dist/js/bootstrap.bundle.min.js",
+    "bootstrap-icons/bootstrap-icons.css": "bootstrap-icons@1.11.3/font/bootstrap-icons.css",
+    "bootstrap-icons/fonts/bootstrap-icons.woff2": "bootstrap-icons@1.11.3/font/fonts/bootstrap-icons.woff2",
+    "bootstrap-icons/fonts/bootstrap-icons.woff": "bootstrap-icons@1.11.3/font/fonts/bootstrap-icons.woff",
+    "jquery/jquery.min.js": "jquery@3.7.1/dist/jquery.min.js",
+    "datatables/jquery.dataTables.min.js": "datatables.net@1.13.10/js/jquery.dataTables.min.js",
+    "datatables/dataTables.bootstrap5.min.js": "datatables.net-bs5@1.13.10/js/dataTables.bootstrap5.min.js",
+    "datatables/dataTables.bootstrap5.min.css": "datatables.net-bs5@1.13.10/css/dataTables.bootstrap5.min.css",
+    "datatables/dataTables.responsive.min.js": "datatables.net-responsive@2.5.0/js/dataTables.responsive.min.js",
+    "datatables/responsive.bootstrap5.min.js": "datatables.net-responsive-bs5@2.5.0/js/responsive.bootstrap5.min.js",
+    "datatables/responsive.bootstrap5.min.css": "datatables.net-responsive-bs5@2.5.0/css/responsive.bootstrap5.min.css",
+    "select2/select2.min.css": "select2@4.1.0-rc.0/dist/css/select2.min.css",
+    "select2/select2.min.js": "select2@4.1.0-rc.0/dist/js/select2.min.js",
+    "select2/select2-bootstrap-5-theme.min.css": "select2-bootstrap-5-theme@1.3.0/dist/select2-bootstrap-5-theme.min.css",
+    "chart.js/chart.umd.min.js": "chart.js@4.4.1/dist/chart.umd.min.js",
+}
+
+# bundle -> sources relative to static/, in load order
+BUNDLES = {
+    "base.css": [
+        "vendor/bootstrap/bootstrap.min.css",
+        "vendor/datatables/dataTables.bootstrap5.min.css",
+        "vendor/datatables/responsive.bootstrap5.min.css",
+        "vendor/bootstrap-icons/bootstrap-icons.css",
+        "styles.css",
+    ],
+    "base.js": [
+        "vendor/jquery/jquery.min.js",
+        "vendor/bootstrap/bootstrap.bundle.min.js",
+        "vendor/datatables/jquery.dataTables.min.js",
+        "vendor/datatables/dataTables.bootstrap5.min.js",
+        "vendor/datatables/dataTables.responsive.min.js",
+        "vendor/datatables/responsive.bootstrap5.min.js",
+        "datatables-conditional.js",
+    ],
+    # booking page only
+    "select2.css": [
+        "vendor/select2/select2.min.css",
+        "vendor/select2/select2-bootstrap-5-theme.min.css",
+    ],
+    "select2.js": ["vendor/select2/select2.min.js"],
+    # transactions report only
+    "chart.js": ["vendor/chart.js/chart.umd.min.js"],
+}
+
+DIST = "dist"
+MANIFEST = "manifest.json"
+IMMUTABLE = 365 * 24 * 3600
+PRECOMPRESS = {".css", ".js", ".svg", ".json"}  # fonts are compressed already
+
+_URL = re.compile(r"""url\(\s*(?:"([^"]*)"|'([^']*)'|([^'")\s]+))\s*\)""")
+_SOURCE_MAP = re.compile(r"/[*/]#\s*sourceMappingURL=\S+\s*(\*/)?")
+
+
+def _fingerprint(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def _minify_css(text):
+    if rcssmin is not None:
+        return rcssmin.cssmin(text)
+    # comments and runs of whitespace; enough for our hand-written stylesheet
+    text = re.sub(r"/\*(?!!).*?\*/", "", text, flags=re.S)
+    text = re.sub(r"\s+", " ", text)
+    return re.sub(r"\s*([{};,>])\s*", r"\1", text).replace(";}", "}").strip()
+
+
+def _minify(path, text):
+    if ".min." in path:
+        return text
+    if path.endswith(".css"):
+        return _minify_css(text)
+    return rjsmin.jsmin(text) if rjsmin is not None else text
+
+
+class _Builder:
+    def __init__(self, static_dir):
+        self.static_dir = static_dir
+        self.out_dir = os.path.join(static_dir, DIST)
+        self.files = {}  # static path -> dist name, for referenced files
+
+    def read(self, path):
+        with open(os.path.join(self.static_dir, path), "rb") as fh:
+            return fh.read()
+
+    def write(self, name, data):
+        with open(os.path.join(self.out_dir, name), "wb") as fh:
+            fh.write(data)
+        if os.path.splitext(name)[1] in PRECOMPRESS:
+            with open(os.path.join(self.out_dir, name + ".gz"), "wb") as fh:
+                fh.write(gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                with open(os.path.join(self.out_dir, name + ".br"), "wb") as fh:
+                    fh.write(brotli.compress(data, quality=11))
+
+    def emit(self, stem, ext, data):
+        name = f"{stem}.{_fingerprint(data)}{ext}"
+        self.write(name, data)
+        return name
+
+    def referenced(self, path):
+        """Copy a file a stylesheet points at into dist; return its dist name."""
+        if path not in self.files:
+            stem, ext = os.path.splitext(path)
+            self.files[path] = self.emit("files/" + stem.replace("/", "-"), ext, self.read(path))
+        return self.files[path]
+
+    def css_urls(self, path, text):
+        """Point relative url()s in ``path`` at fingerprinted copies in dist."""
+        def replace(m):
+            target = next(g for g in m.groups() if g is not None).strip()
+            if re.match(r"^(data:|[a-z]+:|/|#)", target, re.I):
+                return m.group(0)
+            name = self.referenced(normpath(join(dirname(path), target.split("?")[0].split("#")[0])))
+            return f'url("{name}")'
+        return _URL.sub(replace, text)
+
+    def bundle(self, name, sources):
+        parts = []
+        for path in sources:
+            text = _SOURCE_MAP.sub("", self.read(path).decode("utf-8"))
+            if name.endswith(".css"):
+                text = self.css_urls(path, text)
+            parts.append(_minify(path, text).strip())
+        # ";" keeps a file without a trailing one from running into the next
+        data = ("\n" if name.endswith(".css") else "\n;").join(parts).encode("utf-8") + b"\n"
+        stem, ext = os.path.splitext(name)
+        return f"{DIST}/{self.emit(stem, ext, data)}"
+
+
+def build(static_dir, echo=print):
+    """Write every bundle into ``static/dist`` and the manifest; returns it.
+
+    Files from the previous build are kept so pages rendered by workers
+    that haven't restarted yet still load. Older ones are removed.
+    """
+    needed = {p for sources in BUNDLES.values() for p in sources} | {f"vendor/{p}" for p in VENDOR}
+    missing = sorted(p for p in needed if not os.path.exists(os.path.join(static_dir, p)))
+    if missing:
+        raise click.ClickException(f"missing {', '.join(missing)}; run `assets vendor` first")
+
+    builder = _Builder(static_dir)
+    os.makedirs(os.path.join(builder.out_dir, "files"), exist_ok=True)
+    manifest_path = os.path.join(builder.out_dir, MANIFEST)
+    previous = _read_manifest(manifest_path)
+
+    manifest = {}
+    for name, sources in BUNDLES.items():
+        manifest[name] = builder.bundle(name, sources)
+        size = os.path.getsize(os.path.join(static_dir, manifest[name]))
+        echo(f"{manifest[name]:<40} {size / 1024:8.1f} KiB")
+    manifest["files"] = {p: f"{DIST}/{n}" for p, n in builder.files.items()}
+
+    tmp = manifest_path + ".tmp"
+    with open(tmp, "w") as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    os.replace(tmp, manifest_path)
+
+    keep = {MANIFEST}
+    for m in (previous, manifest):
+        for path in [*(v for k, v in m.items() if k != "files"), *m.get("files", {}).values()]:
+            keep.add(relpath(path, DIST))
+    removed = 0
+    for root, _, names in os.walk(builder.out_dir):
+        for n in names:
+            rel = relpath(os.path.join(root, n), builder.out_dir).replace(os.sep, "/")
+            if re.sub(r"\.(gz|br)$", "", rel) not in keep:
+                os.remove(os.path.join(root, n))
+                removed += 1
+    if removed:
+        echo(f"Removed {removed} stale file(s).")
+    return manifest
+
+
+def vendor(static_dir, force=False, echo=print):
+    """Download the pinned third-party files into ``static/vendor``."""
+    fetched = 0
+    for path, spec in VENDOR.items():
+        target = os.path.join(static_dir, "vendor", path)
+        if os.path.exists(target) and not force:
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with urllib.request.urlopen(CDN + spec, timeout=30) as resp:
+            data = resp.read()
+        with open(target + ".tmp", "wb") as fh:
+            fh.write(data)
+        os.replace(target + ".tmp", target)
+        echo(f"{path:<52} {len(data) / 1024:8.1f} KiB")
+        fetched += 1
+    return fetched
+
+
+def _read_manifest(path):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _manifest():
+    app = current_app
+    if app.debug:  # pick up rebuilds without a restart
+        return _read_manifest(os.path.join(app.static_folder, DIST, MANIFEST))
+    return app.extensions["assets"]
+
+
+def asset_urls(bundle):
+    """URLs to load for ``bundle``: the built file, or its sources before a build."""
+    built = _manifest().get(bundle)
+    if built:
+        return [url_for("static", filename=built)]
+    return [url_for("static", filename=path) for path in BUNDLES[bundle]]
+
+
+def dist_file(filename):
+    """A fingerprinted file: immutable, and precompressed when the client allows."""
+    out_dir = os.path.join(current_app.static_folder, DIST)
+    path = safe_join(out_dir, filename)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    encoding = None
+    for enc, ext in (("br", ".br"), ("gzip", ".gz")):
+        if request.accept_encodings[enc] and os.path.isfile(path + ext):
+            encoding, path = enc, path + ext
+            break
+    response = send_file(path, mimetype=mimetype, max_age=IMMUTABLE)
+    if os.path.splitext(filename)[1] in PRECOMPRESS:
+        response.vary.add("Accept-Encoding")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+assets_cli = AppGroup("assets", help="Vendor, bundle and fingerprint static assets.")
+
+
+@assets_cli.command("vendor")
+@click.option("--force", is_flag=True, help="Download again even if the file exists.")
+def vendor_command(force):
+    """Download pinned CSS/JS/fonts into static/vendor."""
+    fetched = vendor(current_app.static_folder, force=force, echo=click.echo)
+    click.echo(f"{fetched} file(s) downloaded." if fetched else "Everything is vendored already.")
+
+
+@assets_cli.command("build")
+def build_command():
+    """Bundle, minify, fingerprint and precompress into static/dist."""
+    build(current_app.static_folder, echo=click.echo)
+    if brotli is None:
+        click.echo("brotli not installed: wrote .gz variants only.")
+
+
+def init_app(app):
+    # read once per worker; a deploy rebuilds and restarts
+    app.extensions["assets"] = _read_manifest(os.path.join(app.static_folder, DIST, MANIFEST))
+    app.add_url_rule(f"{app.static_url_path}/{DIST}/<path:filename>", "assets.dist", dist_file)
+    app.jinja_env.globals["asset_urls"] = asset_urls
+    app.cli.add_command(assets_cli)
@@ -0,0 +1,92 @@
+"""Request-scoped auth context shared by every blueprint.
+
+The JWT is decoded and verified at most once per request; the resulting
+identity and claims are memoised on ``flask.g``. Later checks in the same
+request (view guards, the ``inject_claims`` context processor) reuse them.
+``get_jwt()`` / ``get_jwt_identity()`` keep working as before because
+flask_jwt_extended stores the decoded token on ``g`` too.
+
+Failures are not memoised: a required check re-runs verification, so the
+app's JWT error loaders (redirect to login, silent refresh, JSON 401) behave
+exactly as they did with bare ``verify_jwt_in_request()`` calls.
+"""
+from functools import wraps
+
+from flask import g, abort, redirect, url_for
+from flask_jwt_extended import verify_jwt_in_request, get_jwt, get_jwt_identity
+
+
+class AuthContext:
+    def __init__(self, identity=None, claims=None):
+        self.identity = identity
+        self.claims = claims or {}
+
+    @property
+    def authenticated(self):
+        return self.identity is not None
+
+    @property
+    def is_admin(self):
+        return bool(self.claims.get("is_admin", False))
+
+    @property
+    def username(self):
+        return self.claims.get("username")
+
+    @property
+    def expires(self):
+        return self.claims.get("exp")
+
+
+def current_auth(optional=False):
+    """The request's AuthContext, verifying the JWT on first use.
+
+    Raises the usual flask_jwt_extended errors when ``optional`` is False and
+    there is no valid token.
+    """
+    ctx = g.get("_auth_ctx")
+    if ctx is None or (not ctx.authenticated and not optional):
+        verify_jwt_in_request(optional=optional)
+        ctx = AuthContext(get_jwt_identity(), get_jwt())
+        g._auth_ctx = ctx
+    return ctx
+
+
+def login_required():
+    # raises if invalid; returns the AuthContext otherwise
+    return current_auth()
+
+
+def admin_required():
+    ctx = current_auth()
+    if not ctx.is_admin:
+        abort(403, description="Admins only")
+    return ctx
+
+
+def requires_login(fn):
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        login_required()
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+def requires_admin(fn):
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        admin_required()
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+def jwt_required_or_login(fn):
+    """Like ``requires_login`` but sends any auth failure to the login page."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            current_auth()
+        except Exception:
+            return redirect(url_for("auth.login_page"))
+        return fn(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,119 @@
+"""Password hashing off the request thread.
+
+Verifying a werkzeug hash is deliberately CPU-heavy. Running it inline on
+the request thread means a burst of logins holds the GIL and stalls every
+other request in the worker. Here the check runs in a small process pool
+instead. The request thread just waits on a future, so other threads keep
+serving.
+
+The pool is bounded twice: ``PASSWORD_POOL_WORKERS`` processes and at most
+``PASSWORD_POOL_QUEUE`` checks in flight per worker process. Past that,
+``verify`` raises ``LoginBusy`` straight away rather than queueing without
+limit, and the login view answers "try again".
+
+When a password verifies and its stored hash was made with anything other
+than ``PASSWORD_HASH_METHOD``, the same pool call also returns a fresh hash,
+so changing the cost parameters upgrades users as they log in.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class LoginBusy(Exception):
+    """Too many password checks already queued in this worker."""
+
+
+_lock = threading.Lock()
+_executor = None
+_slots = None
+_owner_pid = None
+_method_prefixes = {}
+
+
+def method_prefix(method):
+    """Canonical ``method:params`` prefix werkzeug stores for ``method``.
+
+    ``"scrypt"`` is stored as ``"scrypt:32768:8:1"``, so compare against what
+    werkzeug actually writes rather than the configured string.
+    """
+    if method not in _method_prefixes:
+        _method_prefixes[method] = generate_password_hash("x", method=method).split("$", 1)[0]
+    return _method_prefixes[method]
+
+
+def hash_password(raw_password):
+    return generate_password_hash(raw_password, method=current_app.config["PASSWORD_HASH_METHOD"])
+
+
+def _verify_and_rehash(pwhash, password, method, prefix):
+    # Runs in the pool process; must stay importable and picklable.
+    if not check_password_hash(pwhash, password):
+        return False, None
+    if pwhash.split("$", 1)[0] != prefix:
+        return True, generate_password_hash(password, method=method)
+    return True, None
+
+
+def _pool(workers):
+    global _executor, _slots, _owner_pid
+    with _lock:
+        # A forked worker must not reuse its parent's pool
+        if _executor is None or _owner_pid != os.getpid():
+            methods = multiprocessing.get_all_start_methods()
+            ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=ctx)
+            _slots = threading.BoundedSemaphore(current_app.config["PASSWORD_POOL_QUEUE"])
+            _owner_pid = os.getpid()
+        return _executor, _slots
+
+
+def _discard(executor):
+    global _executor
+    with _lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+def verify(pwhash, password):
+    """Check ``password`` against ``pwhash``.
+
+    Returns ``(ok, new_hash)``. ``new_hash`` is set when the stored hash
+    should be replaced with one made by the configured method. Raises
+    ``LoginBusy`` when the queue is full or the check times out.
+    """
+    cfg = current_app.config
+    method = cfg["PASSWORD_HASH_METHOD"]
+    args = (pwhash, password, method, method_prefix(method))
+    workers = cfg["PASSWORD_POOL_WORKERS"]
+    if workers <= 0:
+        return _verify_and_rehash(*args)
+
+    executor, slots = _pool(workers)
+    if not slots.acquire(blocking=False):
+        raise LoginBusy()
+    try:
+        future = executor.submit(_verify_and_rehash, *args)
+    except BrokenProcessPool:
+        slots.release()
+        _discard(executor)
+        raise LoginBusy()
+    except Exception:
+        slots.release()
+        raise
+    # Free the slot when the check finishes, even if we stop waiting for it
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result(timeout=cfg["PASSWORD_VERIFY_TIMEOUT"])
+    except FutureTimeout:
+        raise LoginBusy()
+    except BrokenProcessPool:
+        # a pool process died (OOM killer etc.); start a fresh pool next time
+        _discard(executor)
+        raise LoginBusy()
@@ -10,10 +10,23 @@ from flask_jwt_extended import (
     jwt_required,
 )
 from datetime import timedelta
+from auth.passwords import LoginBusy
+from extensions import db
 from models import User
 
 auth_bp = Blueprint("auth", __name__, url_prefix="/auth")
 
+def _check_password(user, password):
+    """check_password plus persisting a transparently upgraded hash."""
+    before = user.password_hash
+    ok = user.check_password(password)
+    if ok and user.password_hash != before:
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()  # keep the old hash; try again next login
+    return ok
+
 @auth_bp.get("/login")
 def login_page():
     return render_template("login.html", hide_chrome=True)
@@ -24,7 +37,12 @@ def login_submit():
     password = request.form.get("password", "").strip()
     user = User.query.filter_by(username=username).first()
 
-    if not user or not user.check_password(password):
+    try:
+        ok = bool(user) and _check_password(user, password)
+    except LoginBusy:
+        flash("Too many sign-ins right now, please try again in a moment.", "warning")
+        return redirect(url_for("auth.login_page"))
+    if not ok:
         flash("Invalid username or password", "danger")
         return redirect(url_for("auth.login_page"))
 
@@ -55,7 +73,11 @@ def login_submit_json():
     username = (data.get("username") or "").strip()
     password = data.get("password") or ""
     user = User.query.filter_by(username=username).first()
-    if not user or not user.check_password(password):
+    try:
+        ok = bool(user) and _check_password(user, password)
+    except LoginBusy:
+        return jsonify({"msg": "Too many sign-ins, retry shortly"}), 503, {"Retry-After": "2"}
+    if not ok:
         return jsonify({"msg": "Bad credentials"}), 401
 
     identity = str(user.id)
@@ -0,0 +1,124 @@
+"""Benchmarks: synthetic data and latency scenarios.
+
+Point the app at a scratch database (``DATABASE_URL=sqlite:////tmp/bench.db``
+or a local MySQL container), then::
+
+    flask --app main bench seed --transactions 1000000
+    flask --app main bench run --out bench-results/before.json
+    # ... change something ...
+    flask --app main bench run --out bench-results/after.json
+    flask --app main bench compare bench-results/before.json bench-results/after.json
+
+``seed`` is deterministic for a given ``--seed``; ``run`` writes p50/p95/p99
+latency and throughput per scenario along with the commit it ran on.
+``codecs`` reports JSON encode time and compressed sizes per scenario.
+``startup`` times a cold ``import main`` and fails over ``--budget-ms``.
+"""
+import json
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+
+bench_cli = AppGroup("bench", help="Seed benchmark data and run latency scenarios.")
+
+
+@bench_cli.command("seed")
+@click.option("--transactions", default=1_000_000, show_default=True, type=click.IntRange(0))
+@click.option("--customers", default=50_000, show_default=True, type=click.IntRange(1))
+@click.option("--banks", default=20, show_default=True, type=click.IntRange(1))
+@click.option("--games", default=60, show_default=True, type=click.IntRange(1))
+@click.option("--users", default=10, show_default=True, type=click.IntRange(1))
+@click.option("--days", default=730, show_default=True, type=click.IntRange(1), help="History length.")
+@click.option("--seed", "seed_value", default=42, show_default=True, help="Random seed.")
+def seed_command(transactions, customers, banks, games, users, days, seed_value):
+    """Bulk-generate a skewed synthetic dataset into empty tables."""
+    from benchmark.seed import seed
+    started = datetime.utcnow()
+    try:
+        seed(transactions=transactions, customers=customers, banks=banks, games=games,
+             users=users, days=days, seed=seed_value, echo=click.echo)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Done in {(datetime.utcnow() - started).total_seconds():.1f}s.")
+
+
+@bench_cli.command("run")
+@click.option("--only", multiple=True, help="Scenario name or prefix (repeatable), e.g. transactions.")
+@click.option("--requests", "n", default=50, show_default=True, type=click.IntRange(1))
+@click.option("--warmup", default=5, show_default=True, type=click.IntRange(0))
+@click.option("--concurrency", default=1, show_default=True, type=click.IntRange(1))
+@click.option("--cold-cache", is_flag=True, help="Clear extensions.cache before every request.")
+@click.option("--out", type=click.Path(dir_okay=False), help="Write the JSON report here.")
+def run_command(only, n, warmup, concurrency, cold_cache, out):
+    """Run the scenarios and report latency percentiles."""
+    from benchmark import runner
+    from benchmark.scenarios import SCENARIOS
+    scenarios = [s for s in SCENARIOS if not only or any(s.name.startswith(o) for o in only)]
+    if not scenarios:
+        raise click.UsageError("no scenario matches --only")
+    report = runner.run(scenarios, requests=n, warmup=warmup, concurrency=concurrency,
+                        cold_cache=cold_cache, echo=click.echo)
+    if out:
+        runner.save(report, out)
+        click.echo(f"Saved {out}")
+
+
+@bench_cli.command("codecs")
+@click.option("--only", multiple=True, help="Scenario name or prefix (repeatable).")
+@click.option("--length", default=500, show_default=True, type=click.IntRange(1),
+              help="DataTables page length, to see large payloads.")
+@click.option("--repeat", default=20, show_default=True, type=click.IntRange(1))
+@click.option("--out", type=click.Path(dir_okay=False), help="Write the JSON report here.")
+def codecs_command(only, length, repeat, out):
+    """JSON encode time and compressed size per scenario."""
+    from benchmark import codecs, runner
+    from benchmark.scenarios import SCENARIOS, PAGE, Scenario
+
+    def big_pages(params):
+        return lambda ctx, i: {k: (length if k == "length" and v == PAGE else v) for k, v in params(ctx, i).items()}
+    scenarios = [Scenario(s.name, s.path, big_pages(s.params), s.group)
+                 for s in SCENARIOS if not only or any(s.name.startswith(o) for o in only)]
+    report = codecs.measure(scenarios, repeat=repeat, echo=click.echo)
+    if out:
+        runner.save(report, out)
+        click.echo(f"Saved {out}")
+
+
+@bench_cli.command("compare")
+@click.argument("base", type=click.File())
+@click.argument("head", type=click.File())
+@click.option("--metric", default="p95_ms", show_default=True,
+              type=click.Choice(["p50_ms", "p95_ms", "p99_ms", "mean_ms"]))
+@click.option("--fail-over", type=float, help="Exit 1 if any scenario got slower by more than this %.")
+def compare_command(base, head, metric, fail_over):
+    """Compare two saved runs scenario by scenario."""
+    from benchmark.runner import compare
+    base, head = json.load(base), json.load(head)
+    click.echo(f"{metric}: {base['meta'].get('commit')} -> {head['meta'].get('commit')}")
+    worst = 0.0
+    for name, before, after, change in compare(base, head, metric):
+        worst = max(worst, change)
+        click.echo(f"{name:<32} {before:>10.2f} -> {after:>10.2f} ms  {change:+7.1f}%")
+    if fail_over is not None and worst > fail_over:
+        raise click.ClickException(f"slowest regression {worst:+.1f}% exceeds {fail_over}%")
+
+
+@bench_cli.command("startup")
+@click.option("--repeat", default=10, show_default=True, type=click.IntRange(1))
+@click.option("--budget-ms", type=float, help="Exit 1 if the median import takes longer.")
+def startup_command(repeat, budget_ms):
+    """Time a cold worker start (import main) in fresh processes."""
+    from benchmark.startup import measure
+    report = measure(repeat=repeat, echo=click.echo)
+    click.echo(f"import main: p50 {report['p50_ms']:.1f} ms, max {report['max_ms']:.1f} ms, "
+               f"{report['connects']} DB connection(s) opened")
+    click.echo(f"forked worker, first request: p50 {report['fork_p50_ms']:.1f} ms")
+    if report["connects"]:
+        raise click.ClickException("importing the app opened database connections")
+    if budget_ms is not None and report["p50_ms"] > budget_ms:
+        raise click.ClickException(f"median startup {report['p50_ms']:.1f} ms exceeds {budget_ms} ms")
+
+
+def init_app(app):
+    app.cli.add_command(bench_cli)
@@ -0,0 +1,61 @@
+"""Encode-time and size comparison per scenario.
+
+Each scenario is fetched once, uncompressed. For JSON bodies, the decoded
+payload is re-encoded ``repeat`` times with the stdlib and with the app's
+provider. Every body is then gzip- and (if available) brotli-compressed at
+the configured levels. The report shows what the JSON provider and
+compression.py buy on each endpoint.
+"""
+import json
+import time
+
+from flask import current_app
+
+import compression
+from benchmark.runner import _client, _token
+from benchmark.scenarios import context
+
+
+def _timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        out = fn()
+    return (time.perf_counter() - started) / repeat * 1000, out
+
+
+def measure(scenarios, repeat=20, echo=print):
+    app = current_app._get_current_object()
+    cfg = app.config
+    ctx, client = context(), _client(app, _token())
+    results = []
+    for scenario in scenarios:
+        resp = client.get(scenario.path, query_string=scenario.params(ctx, 0),
+                          headers={"Accept-Encoding": "identity"})
+        body = resp.get_data()
+        row = {"name": scenario.name, "mimetype": resp.mimetype, "bytes": len(body)}
+        if resp.mimetype == "application/json":
+            payload = json.loads(body)
+            row["stdlib_encode_ms"] = round(_timed(lambda: json.dumps(payload).encode("utf-8"), repeat)[0], 3)
+            row["provider_encode_ms"] = round(_timed(lambda: app.json.dumps(payload).encode("utf-8"), repeat)[0], 3)
+        for encoding in ("gzip", "br"):
+            if encoding == "br" and compression.brotli is None:
+                continue
+            ms, packed = _timed(lambda: compression.compress(
+                body, encoding, cfg["COMPRESS_GZIP_LEVEL"], cfg["COMPRESS_BR_QUALITY"]), repeat)
+            row[f"{encoding}_ms"] = round(ms, 3)
+            row[f"{encoding}_bytes"] = len(packed)
+            row[f"{encoding}_saved_pct"] = round((1 - len(packed) / len(body)) * 100, 1) if body else 0.0
+        echo(_line(row))
+        results.append(row)
+    return {"provider": type(app.json).__name__, "results": results}
+
+
+def _line(row):
+    text = f"{row['name']:<32} {row['bytes']:>9,} B"
+    if "stdlib_encode_ms" in row:
+        text += f"  encode stdlib {row['stdlib_encode_ms']:>7} ms / app {row['provider_encode_ms']:>7} ms"
+    for encoding in ("gzip", "br"):
+        if f"{encoding}_bytes" in row:
+            text += (f"  {encoding} {row[f'{encoding}_bytes']:>8,} B (-{row[f'{encoding}_saved_pct']}%)"
+                     f" {row[f'{encoding}_ms']} ms")
+    return text
@@ -0,0 +1,163 @@
+"""Run scenarios in-process and summarise latency.
+
+Requests go through the Flask test client, so a run measures the app and
+the database without a web server or network in the way. Each scenario gets
+``warmup`` unmeasured requests, then ``requests`` measured ones spread over
+``concurrency`` threads (each with its own client, like separate browser
+sessions).
+"""
+import json
+import os
+import platform
+import subprocess
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from flask_jwt_extended import create_access_token
+from sqlalchemy import select
+
+from extensions import db, cache
+from models import User
+from benchmark.scenarios import context
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3) if seconds is not None else None
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    k = max(int(round(p / 100.0 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(k, len(sorted_values) - 1)]
+
+
+def _token():
+    admin = db.session.execute(
+        select(User).where(User.is_admin.is_(True)).order_by(User.id).limit(1)
+    ).scalar_one_or_none()
+    if admin is None:
+        raise RuntimeError("no admin user to benchmark as")
+    return create_access_token(
+        identity=str(admin.id),
+        additional_claims={"username": admin.username, "is_admin": True},
+    )
+
+
+def _client(app, token):
+    client = app.test_client()
+    client.set_cookie("access_token_cookie", token)
+    return client
+
+
+def run_scenario(app, scenario, ctx, token, requests=50, warmup=5, concurrency=1, cold_cache=False):
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    counter = iter(range(warmup, warmup + requests))
+
+    def call(client, i):
+        if cold_cache:
+            cache.clear()
+        params = scenario.params(ctx, i)
+        started = time.perf_counter()
+        resp = client.get(scenario.path, query_string=params)
+        resp.get_data()  # include streaming/serialisation in the timing
+        return time.perf_counter() - started, resp.status_code
+
+    warm = _client(app, token)
+    for i in range(warmup):
+        call(warm, i)
+
+    def worker():
+        nonlocal errors
+        client = _client(app, token)
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            elapsed, status = call(client, i)
+            with lock:
+                latencies.append(elapsed)
+                errors += status >= 400
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(max(concurrency, 1))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "name": scenario.name,
+        "group": scenario.group,
+        "path": scenario.path,
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": _ms(percentile(latencies, 50)),
+        "p95_ms": _ms(percentile(latencies, 95)),
+        "p99_ms": _ms(percentile(latencies, 99)),
+        "mean_ms": _ms(sum(latencies) / len(latencies)) if latencies else None,
+        "max_ms": _ms(latencies[-1]) if latencies else None,
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else None,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=current_app.root_path, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scenarios, requests=50, warmup=5, concurrency=1, cold_cache=False, echo=print):
+    app = current_app._get_current_object()
+    ctx = context()
+    token = _token()
+    results = []
+    for scenario in scenarios:
+        result = run_scenario(app, scenario, ctx, token, requests, warmup, concurrency, cold_cache)
+        echo(f"{result['name']:<32} p50 {result['p50_ms']:>9} ms  p95 {result['p95_ms']:>9} ms  "
+             f"p99 {result['p99_ms']:>9} ms  {result['throughput_rps']:>8} req/s"
+             + (f"  {result['errors']} errors" if result["errors"] else ""))
+        results.append(result)
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "dialect": db.engine.dialect.name,
+            "python": platform.python_version(),
+            "requests": requests,
+            "warmup": warmup,
+            "concurrency": concurrency,
+            "cold_cache": cold_cache,
+            "dataset": {k: ctx[k] for k in ("transactions", "customers")},
+        },
+        "results": results,
+    }
+
+
+def save(report, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as fh:
+        json.dump(report, fh, indent=2, default=str)
+
+
+def compare(base, head, metric="p95_ms"):
+    """[(name, base value, head value, change %)] for scenarios in both runs."""
+    before = {r["name"]: r for r in base["results"]}
+    rows = []
+    for r in head["results"]:
+        b = before.get(r["name"])
+        if not b or not b.get(metric) or r.get(metric) is None:
+            continue
+        rows.append((r["name"], b[metric], r[metric], (r[metric] - b[metric]) / b[metric] * 100))
+    return rows
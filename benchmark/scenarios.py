@@ -0,0 +1,111 @@
+"""Benchmark scenarios.
+
+A scenario is a name, a path and a ``params(ctx, i)`` callable returning the
+query string for the i-th request. ``ctx`` holds facts about the seeded data
+(row totals, date range, sample search terms) gathered once per run, so the
+same scenario means the same thing on any dataset size.
+"""
+from datetime import timedelta
+
+from sqlalchemy import select, func
+
+import counters
+from extensions import db
+from models import Customer, Transaction
+
+PAGE = 25
+
+# /api/transactions column order, as manage_transactions.html sends it
+TX_COLUMNS = ["id", "amount", "currency", "bank_stor", "customer_name", "bank_name", "game_name",
+              "type", "created_by", "updated_by", "created_at", "updated_at"]
+CUSTOMER_COLUMNS = ["id", "name", "acc_id", "created_by", "updated_by", "created_at", "updated_at"]
+
+
+class Scenario:
+    def __init__(self, name, path, params=None, group="api"):
+        self.name = name
+        self.path = path
+        self.params = params or (lambda ctx, i: {})
+        self.group = group
+
+
+def datatables(columns, start=0, length=PAGE, order="created_at", direction="desc", search=""):
+    params = {
+        "draw": 1,
+        "start": start,
+        "length": length,
+        "search[value]": search,
+        "order[0][column]": columns.index(order),
+        "order[0][dir]": direction,
+    }
+    for i, name in enumerate(columns):
+        params[f"columns[{i}][data]"] = name
+    return params
+
+
+def context():
+    """Facts about the current dataset the scenarios parameterise on."""
+    lo, hi = db.session.execute(select(func.min(Transaction.day_key), func.max(Transaction.day_key))).one()
+    # a busy customer: its name makes a realistic, selective search term
+    busy = db.session.execute(
+        select(Transaction.customer_id, func.count()).group_by(Transaction.customer_id)
+        .order_by(func.count().desc()).limit(1)
+    ).first()
+    customer = db.session.get(Customer, busy[0]) if busy else None
+    return {
+        "transactions": counters.get_count(Transaction.__tablename__),
+        "customers": counters.get_count(Customer.__tablename__),
+        "first_day": lo,
+        "last_day": hi,
+        "customer_id": customer.id if customer else None,
+        "customer_name": customer.name if customer else "",
+        "customer_prefix": customer.name.split()[0] if customer else "",
+    }
+
+
+def _deep(total, i):
+    # different deep pages each time, in the last tenth of the table
+    return max(total - PAGE - (i * 7919) % max(total // 10, 1), 0)
+
+
+def _range(ctx, days, **extra):
+    end = ctx["last_day"]
+    start = max(end - timedelta(days=days - 1), ctx["first_day"]) if end else None
+    params = {"start": f"{start:%Y-%m-%d}", "end": f"{end:%Y-%m-%d}"} if end else {}
+    params.update(extra)
+    return params
+
+
+SCENARIOS = [
+    Scenario("transactions.first_page", "/api/transactions",
+             lambda ctx, i: datatables(TX_COLUMNS)),
+    Scenario("transactions.page_walk", "/api/transactions",
+             lambda ctx, i: datatables(TX_COLUMNS, start=(i % 400) * PAGE)),
+    Scenario("transactions.deep_page", "/api/transactions",
+             lambda ctx, i: datatables(TX_COLUMNS, start=_deep(ctx["transactions"], i))),
+    Scenario("transactions.sort_amount", "/api/transactions",
+             lambda ctx, i: datatables(TX_COLUMNS, order="amount", direction="desc")),
+    Scenario("transactions.search_customer", "/api/transactions",
+             lambda ctx, i: datatables(TX_COLUMNS, search=ctx["customer_name"])),
+    Scenario("transactions.search_bank_stor", "/api/transactions",
+             lambda ctx, i: datatables(TX_COLUMNS, search=f"ABA{i % 10}")),
+    Scenario("customers.first_page", "/api/customers",
+             lambda ctx, i: datatables(CUSTOMER_COLUMNS)),
+    Scenario("customers.deep_page", "/api/customers",
+             lambda ctx, i: datatables(CUSTOMER_COLUMNS, start=_deep(ctx["customers"], i))),
+    Scenario("customers.sort_name", "/api/customers",
+             lambda ctx, i: datatables(CUSTOMER_COLUMNS, order="name", direction="asc")),
+    Scenario("customers.search", "/api/customers",
+             lambda ctx, i: datatables(CUSTOMER_COLUMNS, search=ctx["customer_prefix"])),
+    Scenario("lookup.customers", "/api/lookup/customers",
+             lambda ctx, i: {"q": ctx["customer_prefix"][: 1 + i % 3], "page": 1 + i % 3}),
+    Scenario("summary.7d_daily", "/reports/api/summary",
+             lambda ctx, i: _range(ctx, 7, period="daily"), group="reports"),
+    Scenario("summary.90d_weekly", "/reports/api/summary",
+             lambda ctx, i: _range(ctx, 90, period="weekly"), group="reports"),
+    Scenario("summary.2y_monthly", "/reports/api/summary",
+             lambda ctx, i: _range(ctx, 730, period="monthly"), group="reports"),
+    Scenario("summary.2y_customer", "/reports/api/summary",
+             lambda ctx, i: _range(ctx, 730, period="monthly", customer_id=ctx["customer_id"]), group="reports"),
+    Scenario("dashboard", "/dashboard", group="pages"),
+]
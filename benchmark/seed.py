@@ -0,0 +1,156 @@
+"""Synthetic data for benchmarks.
+
+Everything is drawn from one ``random.Random(seed)``, so the same options
+always produce the same rows. Distributions are skewed the way real traffic
+is: a few customers, banks and games get most of the transactions (Zipf
+weights), amounts are log-normal, volume grows towards the present and
+bookings cluster in the evening.
+
+Rows are written with Core ``executemany`` in ``BATCH_SIZE`` chunks. After
+the transactions, ``transaction_daily_rollup`` and ``row_counters`` are
+rebuilt so the reports and table totals match the data.
+"""
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from sqlalchemy import insert, select, func
+from werkzeug.security import generate_password_hash
+
+import counters
+from extensions import db
+from models import User, Customer, Bank, Game, Transaction, date_keys
+from reports import rollup
+
+BATCH_SIZE = 20000
+SEED_USER = "bench"
+
+FIRST_NAMES = ["Sok", "Dara", "Vanna", "Sophea", "Rith", "Chenda", "Bopha", "Kosal", "Nary", "Visal",
+               "Sreymom", "Piseth", "Kanha", "Rachana", "Vuthy", "Mealea", "Sambath", "Thida", "Heng", "Lina"]
+LAST_NAMES = ["Chan", "Sok", "Kim", "Ly", "Heng", "Meas", "Nget", "Pich", "Seng", "Tan",
+              "Keo", "Yim", "Chea", "Phan", "Ouk", "Long", "Mao", "Prak", "Ros", "Sam"]
+BANK_NAMES = ["ABA", "ACLEDA", "Wing", "TrueMoney", "Canadia", "Prince", "Sathapana", "AMK", "Chip Mong",
+              "Vattanac", "Hattha", "PPCB", "FTB", "Maybank", "CIMB", "Phillip", "RHB", "SBI", "BRED", "Bakong"]
+# evening-heavy booking hours
+HOUR_WEIGHTS = [2, 1, 1, 1, 1, 1, 2, 3, 4, 5, 6, 6, 7, 7, 6, 6, 7, 8, 10, 12, 13, 12, 9, 5]
+
+
+def zipf_cum_weights(n, s):
+    """Cumulative weights for ranks 1..n with P(rank) ~ 1/rank**s."""
+    return list(accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def _insert_batches(table, rows, echo, label):
+    batch, done = [], 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            with db.engine.begin() as conn:
+                conn.execute(insert(table), batch)
+            done += len(batch)
+            batch = []
+            echo(f"  {label}: {done:,}")
+    if batch:
+        with db.engine.begin() as conn:
+            conn.execute(insert(table), batch)
+        done += len(batch)
+    return done
+
+
+def _ids(model):
+    return [i for (i,) in db.session.execute(select(model.id).order_by(model.id)).all()]
+
+
+def _audit(user_id, username, at):
+    return {"user_id": user_id, "created_by": username, "updated_by": username,
+            "created_at": at, "updated_at": at}
+
+
+def seed(transactions=1_000_000, customers=50_000, banks=20, games=60, users=10,
+         days=730, seed=42, echo=print):
+    """Generate a dataset. Expects empty tables (refuses otherwise)."""
+    if db.session.execute(select(func.count()).select_from(Transaction)).scalar():
+        raise RuntimeError("transactions table is not empty; seed into a fresh database")
+
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    first_day = (now - timedelta(days=days)).replace(hour=0, minute=0, second=0)
+
+    # one hash shared by all bench users; hashing per user would dominate small seeds
+    pwhash = generate_password_hash(SEED_USER)
+    existing = {u for (u,) in db.session.execute(select(User.username)).all()}
+    staff = [
+        {"fullname": f"Bench User {i}", "username": f"{SEED_USER}{i:02d}", "password_hash": pwhash,
+         "is_admin": i == 0, "created_at": first_day, "updated_at": first_day}
+        for i in range(users) if f"{SEED_USER}{i:02d}" not in existing
+    ]
+    _insert_batches(User.__table__, staff, echo, "users")
+    staff = db.session.execute(
+        select(User.id, User.username).where(User.username.like(f"{SEED_USER}%")).order_by(User.id)
+    ).all()
+    staff = [(str(i), name) for i, name in staff]
+
+    echo(f"Seeding {banks} banks, {games} games, {customers:,} customers")
+    uid, uname = staff[0]
+    _insert_batches(Bank.__table__, (
+        {"name": BANK_NAMES[i] if i < len(BANK_NAMES) else f"Bank {i + 1}", **_audit(uid, uname, first_day)}
+        for i in range(banks)
+    ), echo, "banks")
+    _insert_batches(Game.__table__, (
+        {"name": f"Game {i + 1:03d}", **_audit(uid, uname, first_day)} for i in range(games)
+    ), echo, "games")
+
+    def customer_rows():
+        for i in range(customers):
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i + 1}"
+            joined = first_day + timedelta(seconds=rng.randrange(days * 86400))
+            user_id, username = rng.choice(staff)
+            yield {"name": name, "acc_id": f"AC{i + 1:08d}", **_audit(user_id, username, joined)}
+    _insert_batches(Customer.__table__, customer_rows(), echo, "customers")
+
+    customer_ids, bank_ids, game_ids = _ids(Customer), _ids(Bank), _ids(Game)
+    # shuffle so the busiest customers are spread over the id range
+    rng.shuffle(customer_ids)
+    customer_cw = zipf_cum_weights(len(customer_ids), 1.05)
+    bank_cw = zipf_cum_weights(len(bank_ids), 1.4)
+    game_cw = zipf_cum_weights(len(game_ids), 1.1)
+    staff_cw = zipf_cum_weights(len(staff), 0.7)
+    hour_cw = list(accumulate(HOUR_WEIGHTS))
+    bank_names = dict(db.session.execute(select(Bank.id, Bank.name)).all())
+
+    echo(f"Seeding {transactions:,} transactions over {days} days")
+
+    def transaction_rows():
+        remaining = transactions
+        while remaining:
+            k = min(BATCH_SIZE, remaining)
+            remaining -= k
+            cust = rng.choices(customer_ids, cum_weights=customer_cw, k=k)
+            bank = rng.choices(bank_ids, cum_weights=bank_cw, k=k)
+            game = rng.choices(game_ids, cum_weights=game_cw, k=k)
+            who = rng.choices(staff, cum_weights=staff_cw, k=k)
+            hours = rng.choices(range(24), cum_weights=hour_cw, k=k)
+            for j in range(k):
+                # sqrt skews towards recent days: volume grows over time
+                day = int(days * rng.random() ** 0.5)
+                created = first_day + timedelta(days=day, hours=hours[j], seconds=rng.randrange(3600))
+                if created > now:
+                    created = now
+                currency = "USD" if rng.random() < 0.8 else "KHR"
+                amount = round(rng.lognormvariate(3.5, 1.2), 2)
+                if currency == "KHR":
+                    amount = round(amount * 4100, -2) or 100.0
+                day_key, week_key, month_key = date_keys(created)
+                user_id, username = who[j]
+                yield {
+                    "amount": amount, "currency": currency, "type": 1 if rng.random() < 0.65 else 2,
+                    "bank_stor": f"{bank_names[bank[j]][:3].upper()}{rng.randrange(10 ** 9):09d}",
+                    "customer_id": cust[j], "bank_id": bank[j], "game_id": game[j],
+                    "day_key": day_key, "week_key": week_key, "month_key": month_key,
+                    **_audit(user_id, username, created),
+                }
+    _insert_batches(Transaction.__table__, transaction_rows(), echo, "transactions")
+
+    echo("Rebuilding report rollup")
+    rollup.backfill(echo=echo)
+    counters.reconcile()
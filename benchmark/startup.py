@@ -0,0 +1,66 @@
+"""Worker startup time: how long ``import main`` takes in a fresh process.
+
+Each sample is a new interpreter that imports the app, the way a worker
+or container does when it starts, with pool warmup off so only the import
+itself is timed. Each sample also reports how many database connections
+the import opened. That should be zero, since schema work belongs to
+``db-upgrade``.
+
+Most of a cold import is Flask and SQLAlchemy loading their own modules.
+A preloading server (``gunicorn --preload main:app``) pays that once in
+the master. Each worker is then a fork of the imported app, so
+``fork_ms`` (fork, then answer one request) is the cost of scaling out
+by one more worker.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+_PROBE = """
+import json, os, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+import metrics
+connects = sum(v for (n, _), v in metrics._counters.items() if n == "db_pool_connects_total")
+
+forked = time.perf_counter()
+pid = os.fork()
+if pid == 0:
+    main.app.test_client().get("/")
+    os._exit(0)
+os.waitpid(pid, 0)
+fork_seconds = time.perf_counter() - forked
+print(json.dumps({"seconds": elapsed, "fork_seconds": fork_seconds, "connects": connects}))
+"""
+
+
+def sample(env=None):
+    """One cold import in a subprocess: {"seconds", "fork_seconds", "connects"}."""
+    env = {**os.environ, "DB_POOL_WARMUP": "0", **(env or {})}
+    out = subprocess.run([sys.executable, "-c", _PROBE], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def measure(repeat=10, echo=print):
+    samples = []
+    for i in range(repeat):
+        s = sample()
+        samples.append(s)
+        echo(f"  #{i + 1:<3} import {s['seconds'] * 1000:8.1f} ms  fork {s['fork_seconds'] * 1000:6.1f} ms  "
+             f"{s['connects']} connection(s)")
+    times = sorted(s["seconds"] * 1000 for s in samples)
+    forks = sorted(s["fork_seconds"] * 1000 for s in samples)
+    return {
+        "samples": repeat,
+        "p50_ms": statistics.median(times),
+        "max_ms": times[-1],
+        "fork_p50_ms": statistics.median(forks),
+        "connects": max(s["connects"] for s in samples),
+    }
@@ -1,53 +1,60 @@
-from functools import wraps
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from flask_jwt_extended import verify_jwt_in_request, get_jwt
-from sqlalchemy import func
-from extensions import db, cache
+from flask import Blueprint, render_template
+from sqlalchemy import select
+from auth.context import login_required
+from extensions import cache, db
+from counters import snapshot
 from models import User, Transaction, Customer, Bank, Game
 
 books_bp = Blueprint("booking", __name__, url_prefix="")
 
-def jwt_required_or_login(fn):
-    @wraps(fn)
-    def wrapper(*args, **kwargs):
-        try:
-            verify_jwt_in_request()  # checks cookies/headers per your config
-        except Exception:
-            return redirect(url_for("auth.login_page"))
-        return fn(*args, **kwargs)
-    return wrapper
+LATEST_LIMIT = 5
+FRAGMENT_TIMEOUT = 24 * 3600  # only evicts superseded versions; writes change the key
 
-def login_required():
-    # raises if invalid; returns None otherwise
-    verify_jwt_in_request(optional=False)
+def _latest_transactions(version):
+    """Latest bookings as plain dicts, cached per transactions-table version.
 
-def admin_required():
-    login_required()
-    claims = get_jwt()
-    if not claims.get("is_admin", False):
-        from flask import abort
-        abort(403, description="Admins only")
+    Every write to ``transactions`` advances its version (counters.py), so a
+    new booking, edit or delete makes the next dashboard load miss and
+    rebuild. There is no TTL staleness and all workers agree on the key.
+
+    Only the shown columns are selected: loading ``Transaction`` objects
+    would join customers, banks and games for their ``lazy="joined"``
+    relationships.
+    """
+    key = f"dashboard:latest:{version}"
+    rows = cache.get(key)
+    if rows is None:
+        stmt = (
+            select(Transaction.id, Transaction.amount, Transaction.currency, Transaction.bank_stor,
+                   Transaction.type, Transaction.created_by)
+            .order_by(Transaction.created_at.desc())
+            .limit(LATEST_LIMIT)
+        )
+        rows = [dict(r) for r in db.session.execute(stmt).mappings()]
+        cache.set(key, rows, timeout=FRAGMENT_TIMEOUT)
+    return rows
 
 @books_bp.get("/dashboard")
-@cache.cached(timeout=120, key_prefix='dashboard_html_v1')
 def dashboard():
     login_required()
-    total_customers = db.session.scalar(db.select(func.count(Customer.id))) or 0
-    total_booked = db.session.scalar(db.select(func.coalesce(func.count(Transaction.id), 0))) or 0
-    total_users = db.session.scalar(db.select(func.count(User.id))) or 0
-    latest_transactions = Transaction.query.order_by(Transaction.created_at.desc()).limit(5).all()
+    # KPIs and data fragments only: the page itself is rendered per request
+    # so the per-user chrome from inject_claims is never shared.
+    stats = snapshot([Customer.__tablename__, Transaction.__tablename__, User.__tablename__])
+    total_customers, _ = stats[Customer.__tablename__]
+    total_booked, tx_version = stats[Transaction.__tablename__]
+    total_users, _ = stats[User.__tablename__]
     return render_template(
         "dashboard.html",
         total_customers=total_customers,
         total_booked=total_booked,
         total_users=total_users,
-        latest_transactions=latest_transactions
+        latest_transactions=_latest_transactions(tx_version)
     )
 
 @books_bp.get("/manage/booking")
 def booking():
     login_required()
+    # customers are loaded on demand through /api/lookup/customers
     banks = Bank.query.all()
-    customers = Customer.query.all()
     games = Game.query.all()
-    return render_template("booking.html", banks=banks, customers=customers, games=games)
+    return render_template("booking.html", banks=banks, games=games)
@@ -0,0 +1,254 @@
+"""Bulk CSV import of customers and transactions.
+
+Rows are validated in batches of ``BATCH_SIZE``. Each batch resolves its
+customer/bank/game references with one ``IN (...)`` lookup per table,
+inserts the valid rows with a single multi-row ``executemany`` and commits.
+Invalid rows are skipped and reported with their CSV line number.
+
+These inserts go through Core, not the ORM, so the session hooks that keep
+``row_counters`` and ``transaction_daily_rollup`` in step never see them.
+Each batch therefore updates both explicitly, on the same connection and in
+the same transaction as its insert.
+
+Used by the /manage/*/import endpoints and ``flask --app main import-csv``.
+"""
+import csv
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import select, insert
+
+import counters
+from extensions import db
+from models import User, Customer, Bank, Game, Transaction, date_keys
+from reports import rollup, summary_cache
+
+BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+CURRENCIES = ("USD", "KHR")
+TYPES = (1, 2)  # 1 = Deposit, 2 = Withdrawal
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.errors = []
+        self.error_count = 0
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def to_dict(self):
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "failed": self.error_count,
+            "errors": self.errors,
+        }
+
+
+def _batches(reader, size):
+    batch = []
+    # line 1 is the header
+    for line, row in enumerate(reader, start=2):
+        batch.append((line, row))
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _clean(row, name):
+    return (row.get(name) or "").strip()
+
+
+def _parse_created_at(value):
+    if not value:
+        return datetime.utcnow()
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    raise ValueError(f"bad created_at {value!r}")
+
+
+def _lookup(conn, key_col, id_col, values):
+    """{key: id} for ``values`` in one set-based query."""
+    if not values:
+        return {}
+    return dict(conn.execute(select(key_col, id_col).where(key_col.in_(values))).all())
+
+
+def _ref(row, id_name, key_name):
+    """The row's reference as ('id', int) or (key_name, str)."""
+    raw_id = _clean(row, id_name)
+    if raw_id:
+        return "id", int(raw_id)
+    key = _clean(row, key_name)
+    if not key:
+        raise ValueError(f"{id_name} or {key_name} is required")
+    return key_name, key
+
+
+def _resolve(conn, model, key_col, refs):
+    ids = {r[1] for r in refs if r[0] == "id"}
+    keys = {r[1] for r in refs if r[0] != "id"}
+    found_ids = set(_lookup(conn, model.id, model.id, ids))
+    by_key = _lookup(conn, key_col, model.id, keys)
+
+    def resolve(ref):
+        if ref[0] == "id":
+            return ref[1] if ref[1] in found_ids else None
+        return by_key.get(ref[1])
+    return resolve
+
+
+def import_transactions(reader, user_id, username, batch_size=BATCH_SIZE):
+    """Import transaction rows from a ``csv.DictReader``.
+
+    Columns: amount, currency, type, bank_stor, created_at (optional) and, for
+    each of customer/bank/game, either ``<x>_id`` or ``customer_acc_id`` /
+    ``bank_name`` / ``game_name``.
+    """
+    report = ImportReport()
+    tx_table = Transaction.__table__
+    for batch in _batches(reader, batch_size):
+        report.rows += len(batch)
+        parsed = []
+        for line, row in batch:
+            try:
+                amount = float(_clean(row, "amount"))
+                currency = _clean(row, "currency").upper() or "USD"
+                if currency not in CURRENCIES:
+                    raise ValueError(f"unknown currency {currency!r}")
+                type_ = int(_clean(row, "type") or 0)
+                if type_ not in TYPES:
+                    raise ValueError(f"type must be one of {TYPES}")
+                bank_stor = _clean(row, "bank_stor")
+                if not bank_stor or len(bank_stor) > 128:
+                    raise ValueError("bank_stor is required (max 128 chars)")
+                parsed.append((line, {
+                    "amount": amount,
+                    "currency": currency,
+                    "type": type_,
+                    "bank_stor": bank_stor,
+                    "created_at": _parse_created_at(_clean(row, "created_at")),
+                    "customer": _ref(row, "customer_id", "customer_acc_id"),
+                    "bank": _ref(row, "bank_id", "bank_name"),
+                    "game": _ref(row, "game_id", "game_name"),
+                }))
+            except ValueError as e:
+                report.error(line, str(e))
+
+        with db.engine.begin() as conn:
+            customer_of = _resolve(conn, Customer, Customer.acc_id, [p["customer"] for _, p in parsed])
+            bank_of = _resolve(conn, Bank, Bank.name, [p["bank"] for _, p in parsed])
+            game_of = _resolve(conn, Game, Game.name, [p["game"] for _, p in parsed])
+
+            now = datetime.utcnow()
+            values, deltas = [], {}
+            for line, p in parsed:
+                customer_id = customer_of(p["customer"])
+                bank_id = bank_of(p["bank"])
+                game_id = game_of(p["game"])
+                missing = [n for n, v in (("customer", customer_id), ("bank", bank_id), ("game", game_id)) if v is None]
+                if missing:
+                    report.error(line, "unknown " + ", ".join(missing))
+                    continue
+                day_key, week_key, month_key = date_keys(p["created_at"])
+                values.append({
+                    "amount": p["amount"], "currency": p["currency"], "bank_stor": p["bank_stor"],
+                    "type": p["type"], "user_id": user_id,
+                    "customer_id": customer_id, "bank_id": bank_id, "game_id": game_id,
+                    "created_by": username, "updated_by": username,
+                    "created_at": p["created_at"], "updated_at": now,
+                    "day_key": day_key, "week_key": week_key, "month_key": month_key,
+                })
+                key = (day_key, str(user_id), customer_id, bank_id, game_id, p["type"], p["currency"])
+                c, a = deltas.get(key, (0, 0.0))
+                deltas[key] = (c + 1, a + p["amount"])
+
+            if values:
+                conn.execute(insert(tx_table), values)
+                counters.bump(conn, Transaction.__tablename__, len(values))
+                rollup.apply_deltas(conn, deltas)
+                report.inserted += len(values)
+        if deltas:
+            summary_cache.touch(key[0] for key in deltas)
+    return report
+
+
+def import_customers(reader, user_id, username, batch_size=BATCH_SIZE):
+    """Import customer rows (columns: name, acc_id) from a ``csv.DictReader``.
+
+    Rows whose acc_id already exists, in the database or earlier in the file,
+    are rejected.
+    """
+    report = ImportReport()
+    for batch in _batches(reader, batch_size):
+        report.rows += len(batch)
+        with db.engine.begin() as conn:
+            existing = set(_lookup(conn, Customer.acc_id, Customer.id, {_clean(r, "acc_id") for _, r in batch}))
+            now = datetime.utcnow()
+            values = []
+            for line, row in batch:
+                name, acc_id = _clean(row, "name"), _clean(row, "acc_id")
+                if not name or not acc_id:
+                    report.error(line, "name and acc_id are required")
+                elif len(name) > 120 or len(acc_id) > 120:
+                    report.error(line, "name and acc_id are limited to 120 chars")
+                elif acc_id in existing:
+                    report.error(line, f"acc_id {acc_id!r} already exists")
+                else:
+                    existing.add(acc_id)
+                    values.append({
+                        "name": name, "acc_id": acc_id, "user_id": user_id,
+                        "created_by": username, "updated_by": username,
+                        "created_at": now, "updated_at": now,
+                    })
+            if values:
+                conn.execute(insert(Customer.__table__), values)
+                counters.bump(conn, Customer.__tablename__, len(values))
+                report.inserted += len(values)
+    return report
+
+
+IMPORTERS = {
+    "transactions": import_transactions,
+    "customers": import_customers,
+}
+
+
+def run_import(kind, stream, user_id, username):
+    """Import CSV text from ``stream`` (a text file object)."""
+    return IMPORTERS[kind](csv.DictReader(stream), user_id, username)
+
+
+@click.command("import-csv")
+@click.argument("kind", type=click.Choice(sorted(IMPORTERS)))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--user", "username", default="admin", show_default=True, help="Username recorded as creator.")
+@with_appcontext
+def import_command(kind, path, username):
+    """Bulk import customers or transactions from a CSV file."""
+    user = db.session.execute(select(User).filter_by(username=username)).scalar_one_or_none()
+    if user is None:
+        raise click.UsageError(f"unknown user {username!r}")
+    started = datetime.utcnow()
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        report = run_import(kind, fh, str(user.id), user.username)
+    elapsed = (datetime.utcnow() - started).total_seconds() or 1e-9
+    click.echo(f"{report.inserted}/{report.rows} row(s) imported in {elapsed:.2f}s "
+               f"({report.inserted / elapsed:,.0f} rows/s), {report.error_count} failed.")
+    for err in report.errors:
+        click.echo(f"  line {err['line']}: {err['error']}")
+
+
+def init_app(app):
+    app.cli.add_command(import_command)
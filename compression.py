@@ -0,0 +1,80 @@
+"""Negotiated gzip/brotli compression of responses.
+
+An ``after_request`` hook compresses JSON, HTML and other text bodies of at
+least ``COMPRESS_MIN_SIZE`` bytes. It uses brotli when the client accepts
+``br`` and the ``brotli`` package is installed, otherwise gzip. Levels are
+kept low (``COMPRESS_GZIP_LEVEL`` / ``COMPRESS_BR_QUALITY``) because these
+are dynamic responses compressed on every request. At low levels most of the
+size win comes for a fraction of the CPU.
+
+Streamed responses (the CSV/NDJSON export), 304s and bodies that already
+carry a ``Content-Encoding`` are left alone.
+"""
+import gzip
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+COMPRESSIBLE = {
+    "application/json",
+    "text/html",
+    "text/css",
+    "text/plain",
+    "text/csv",
+    "application/javascript",
+    "text/javascript",
+}
+
+
+def choose_encoding(accept_encoding):
+    """'br', 'gzip' or None for a parsed Accept-Encoding header."""
+    if brotli is not None and accept_encoding["br"]:
+        return "br"
+    if accept_encoding["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress(data, encoding, gzip_level=5, br_quality=4):
+    if encoding == "br":
+        return brotli.compress(data, quality=br_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+def _compress_response(response):
+    if (
+        response.status_code < 200 or response.status_code >= 300 or response.status_code == 204
+        or response.is_streamed or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+    cfg = current_app.config
+    data = response.get_data()
+    if len(data) < cfg["COMPRESS_MIN_SIZE"]:
+        return response
+
+    response.set_data(compress(data, encoding, cfg["COMPRESS_GZIP_LEVEL"], cfg["COMPRESS_BR_QUALITY"]))
+    response.headers["Content-Encoding"] = encoding
+    # a strong ETag names these exact bytes, which are now different
+    tag, weak = response.get_etag()
+    if tag and not weak:
+        response.set_etag(f"{tag}-{encoding}")
+    return response
+
+
+def init_app(app):
+    app.config.setdefault("COMPRESS_MIN_SIZE", 1024)
+    app.config.setdefault("COMPRESS_GZIP_LEVEL", 5)
+    app.config.setdefault("COMPRESS_BR_QUALITY", 4)
+    # after_request hooks run in reverse order of registration: init this
+    # before anything else that adds one, so compression happens last
+    app.after_request(_compress_response)
@@ -1,4 +1,5 @@
 # config.py
+import logging
 import os
 from pathlib import Path
 from urllib.parse import quote_plus
@@ -6,15 +7,16 @@ from datetime import timedelta
 from dotenv import load_dotenv
 
 BASE_DIR = Path(__file__).resolve().parent
+log = logging.getLogger(__name__)
 
 # 1. Try loading production .env from parent dir first
 prod_env_path = BASE_DIR.parent / ".env"
 local_env_path = BASE_DIR / ".env"
 if prod_env_path.exists():
-    print(f"Attempting to load production .env from: {prod_env_path}")
+    log.info("Loading production .env from %s", prod_env_path)
     load_dotenv(dotenv_path=prod_env_path, override=False)
 else:
-    print(f"Loading local .env from: {local_env_path}")
+    log.info("Loading local .env from %s", local_env_path)
     load_dotenv(dotenv_path=local_env_path, override=True)
 
 class Config:
@@ -29,6 +31,12 @@ class Config:
     JWT_ACCESS_COOKIE_PATH = "/"
     JWT_REFRESH_COOKIE_PATH = "/"
 
+    # Password hashing (auth/passwords.py). Changing the method rehashes users on their next login.
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", "2"))       # 0 = verify inline
+    PASSWORD_POOL_QUEUE = int(os.getenv("PASSWORD_POOL_QUEUE", "16"))          # max checks in flight per worker
+    PASSWORD_VERIFY_TIMEOUT = float(os.getenv("PASSWORD_VERIFY_TIMEOUT", "10"))
+
     MYSQL_USER = os.getenv("MYSQL_USER")
     MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD")
     MYSQL_HOST = os.getenv("MYSQL_HOST", "127.0.0.1")
@@ -36,25 +44,71 @@ class Config:
     MYSQL_DB = os.getenv("MYSQL_DB")
 
     password_encoded = quote_plus(MYSQL_PASSWORD) if MYSQL_PASSWORD else ""
-    SQLALCHEMY_DATABASE_URI = (
+    # DATABASE_URL overrides the MySQL settings (e.g. a scratch SQLite file for benchmarks)
+    SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL") or (
         f"mysql+mysqlconnector://{MYSQL_USER}:{password_encoded}"
         f"@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}?charset=utf8mb4"
     )
+    # Connection pool, per worker process (dbpool.py). Budget workers x (size + overflow) under max_connections.
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))      # seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "280"))       # keep below MySQL's wait_timeout
+    DB_POOL_IDLE_PING = float(os.getenv("DB_POOL_IDLE_PING", "30"))  # ping on checkout after this long idle
+    DB_POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", str(DB_POOL_SIZE)))  # connections opened at worker start
     SQLALCHEMY_ENGINE_OPTIONS = {
-        "pool_pre_ping": True,
-        "pool_size": 5,
-        "max_overflow": 10,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_timeout": DB_POOL_TIMEOUT,
+    }
+    # Read replicas (replicas.py): comma-separated URLs; empty = everything on the primary
+    SQLALCHEMY_REPLICA_URIS = [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+    REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))   # seconds behind before reads fall back to the primary
+    REPLICA_LAG_CHECK_INTERVAL = 5                               # seconds between lag checks (background thread per worker)
+    REPLICA_CONNECT_TIMEOUT = 2                                  # seconds before an unreachable replica counts as down
+    REPLICA_READ_YOUR_WRITES = 10                                # seconds a client reads from the primary after writing
+
+    # Async serving (asgi.py). Defaults to SQLALCHEMY_DATABASE_URI with aiomysql/aiosqlite.
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+    ASYNC_ENGINE_OPTIONS = {
+        "pool_size": int(os.getenv("ASYNC_POOL_SIZE", "20")),   # connections shared by all waiting requests
+        "max_overflow": 0,
         "pool_recycle": 280,
         "pool_timeout": 30
     }
-    SQLALCHEMY_ECHO = True
+    # Statement logging is for local debugging only; use the SQL profiler instead
+    SQLALCHEMY_ECHO = os.getenv("SQLALCHEMY_ECHO", "0") == "1"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Per-request SQL profiler (profiler/). 0 = off (default), 1 = every request.
+    SQL_PROFILE_SAMPLE_RATE = float(os.getenv("SQL_PROFILE_SAMPLE_RATE", "0"))
+    SQL_PROFILE_N_PLUS_ONE = int(os.getenv("SQL_PROFILE_N_PLUS_ONE", "5"))   # same statement this often = N+1
+    SQL_PROFILE_SLOW_STATEMENTS = 5
+    SQL_PROFILE_HISTORY = 200
+
     FS_CACHE_DIR = os.path.expanduser('~/flask_cache')
-    CACHE_TYPE = 'simple'          # use 'simple' if only 1 worker 'filesystem' if only 2 worker
+    # In-process LRU in front of a store shared by all workers (tiercache.py)
+    CACHE_TYPE = 'tiercache.TieredCache'
     CACHE_DIR = FS_CACHE_DIR
     CACHE_DEFAULT_TIMEOUT = 180
-    CACHE_THRESHOLD = 5000
+    CACHE_THRESHOLD = 5000         # L1 entries per worker
+    CACHE_L1_TTL = 30              # seconds an entry may be served from L1
+    CACHE_SYNC_INTERVAL = 0.5      # how often a worker checks for other workers' writes
+    CACHE_L2 = os.getenv("CACHE_L2", "sqlite")   # 'sqlite' (file under CACHE_DIR) or 'redis'
+    CACHE_L2_MAX_BYTES = int(os.getenv("CACHE_L2_MAX_BYTES", str(256 * 1024 * 1024)))
+    CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://127.0.0.1:6379/0")
     
+    # Prometheus /metrics (metrics.py); each worker writes its numbers here
+    METRICS_DIR = os.path.expanduser('~/flask_metrics')
+    METRICS_FLUSH_INTERVAL = 5     # seconds
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # scrapes need "Authorization: Bearer <token>"; unset = 403 outside debug
+
+    JSON_PROVIDER = os.getenv("JSON_PROVIDER", "orjson")   # 'orjson' or 'default' (stdlib)
+    # Response compression (compression.py); br needs the optional brotli package
+    COMPRESS_MIN_SIZE = 1024       # bytes
+    COMPRESS_GZIP_LEVEL = 5
+    COMPRESS_BR_QUALITY = 4
+
     JINJA_CACHE_DIR = os.path.expanduser('~/jinja_cache')
     JINJA_BYTECODE_PATTERN = '%s.cache'
@@ -0,0 +1,160 @@
+"""Incrementally maintained row counts and table version stamps.
+
+``row_counters`` holds one row per tracked table. A session ``after_flush``
+hook adds the number of inserted/deleted ORM objects to the matching counter
+on the same connection, so the bump commits or rolls back together with the
+create/delete handler that caused it. Any flush that inserts, updates or
+deletes rows of a table also increments its ``version``, which readers use
+as a cache key for data derived from that table.
+
+Readers call ``get_count(name)`` (or ``snapshot(names)`` for several tables
+plus their versions), a primary-key lookup instead of a COUNT(*) index
+scan. ``reconcile`` recomputes the real totals and should run periodically
+(``flask --app main reconcile-counters`` from cron) to heal any drift from
+writes that bypass the ORM. Those writes don't move versions either, and a
+recount only does when a total was wrong. After an UPDATE by hand, run
+``reconcile-counters --touch`` to advance every version.
+"""
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import event, func, select, update, insert
+from sqlalchemy.exc import IntegrityError
+
+import offload
+from extensions import db
+from models import RowCounter, User, Customer, Game, Bank, Transaction
+
+TRACKED = {m.__tablename__: m for m in (User, Customer, Game, Bank, Transaction)}
+
+_counters = RowCounter.__table__
+
+
+def _deltas(session):
+    """{table: row delta} for every tracked table written by this flush."""
+    deltas = {}
+    for obj in session.dirty:
+        name = getattr(obj, "__tablename__", None)
+        if name in TRACKED and session.is_modified(obj):
+            deltas.setdefault(name, 0)
+    for obj in session.new:
+        name = getattr(obj, "__tablename__", None)
+        if name in TRACKED:
+            deltas[name] = deltas.get(name, 0) + 1
+    for obj in session.deleted:
+        name = getattr(obj, "__tablename__", None)
+        if name in TRACKED:
+            deltas[name] = deltas.get(name, 0) - 1
+    return deltas
+
+
+def bump(connection, name, delta):
+    """Add ``delta`` to counter ``name`` and advance its version, using
+    ``connection``'s transaction."""
+    # A missing row is fine: get_count seeds it from a real COUNT later.
+    connection.execute(
+        update(_counters)
+        .where(_counters.c.name == name)
+        .values(
+            value=_counters.c.value + delta,
+            version=_counters.c.version + 1,
+            updated_at=datetime.utcnow(),
+        )
+    )
+
+
+def _after_flush(session, flush_context):
+    deltas = _deltas(session)
+    if not deltas:
+        return
+    conn = session.connection()
+    for name, delta in deltas.items():
+        bump(conn, name, delta)
+
+
+def _count(conn, name):
+    model = TRACKED[name]
+    return conn.execute(select(func.count(model.id))).scalar() or 0
+
+
+def _seed(name):
+    # First read after deploy: seed from a real count on its own connection,
+    # off the event loop when called from an async endpoint (see offload.py)
+    return offload.run(_seed_on, db.engine, name)
+
+
+def _seed_on(engine, name):
+    with engine.begin() as conn:
+        value = _count(conn, name)
+        try:
+            conn.execute(insert(_counters).values(name=name, value=value, version=0, updated_at=datetime.utcnow()))
+        except IntegrityError:
+            pass  # another worker seeded it first
+    return int(value)
+
+
+def get_count(name):
+    """Current row total for tracked table ``name`` (O(1) lookup)."""
+    value = db.session.execute(
+        select(_counters.c.value).where(_counters.c.name == name)
+    ).scalar()
+    if value is not None:
+        return int(value)
+    return _seed(name)
+
+
+def snapshot(names):
+    """{name: (row total, version)} for several tracked tables in one query."""
+    rows = db.session.execute(
+        select(_counters.c.name, _counters.c.value, _counters.c.version)
+        .where(_counters.c.name.in_(names))
+    ).all()
+    result = {name: (int(value), int(version or 0)) for name, value, version in rows}
+    for name in names:
+        if name not in result:
+            result[name] = (_seed(name), 0)
+    return result
+
+
+def reconcile(names=None, touch=False):
+    """Recompute counters from COUNT(*). Returns {name: (old, new)}.
+
+    A counter's version only moves when its total was wrong, unless
+    ``touch`` is set: then every version moves, which is what edits made
+    with manual SQL need, since those can change rows without changing
+    any totals.
+    """
+    result = {}
+    for name in names or TRACKED:
+        with db.engine.begin() as conn:
+            # lock the counter row so concurrent bumps queue behind the recount
+            old = conn.execute(
+                select(_counters.c.value).where(_counters.c.name == name).with_for_update()
+            ).scalar()
+            new = _count(conn, name)
+            if old is None:
+                conn.execute(insert(_counters).values(name=name, value=new, version=0, updated_at=datetime.utcnow()))
+            elif old != new or touch:
+                conn.execute(
+                    update(_counters).where(_counters.c.name == name)
+                    .values(value=new, version=_counters.c.version + 1, updated_at=datetime.utcnow())
+                )
+        result[name] = (old, new)
+    return result
+
+
+@click.command("reconcile-counters")
+@click.option("--touch", is_flag=True,
+              help="Advance every version even if the totals are right (after manual SQL updates).")
+@with_appcontext
+def reconcile_command(touch):
+    """Recompute row_counters from the real tables."""
+    for name, (old, new) in reconcile(touch=touch).items():
+        click.echo(f"{name}: {old} -> {new}")
+
+
+def init_app(app):
+    if not event.contains(db.session, "after_flush", _after_flush):
+        event.listen(db.session, "after_flush", _after_flush)
+    app.cli.add_command(reconcile_command)
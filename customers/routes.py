@@ -1,34 +1,15 @@
-from functools import wraps
+import io
 
-from flask import Blueprint, url_for, redirect, render_template, request, flash
-from flask_jwt_extended import verify_jwt_in_request, get_jwt, get_jwt_identity
+from flask import Blueprint, url_for, redirect, render_template, request, flash, jsonify
+from flask_jwt_extended import get_jwt, get_jwt_identity
 
+import bulk
+from auth.context import jwt_required_or_login, login_required, admin_required
 from extensions import db
 from models import Customer
 
 customers_bp = Blueprint("customers", __name__, url_prefix="")
 
-def jwt_required_or_login(fn):
-    @wraps(fn)
-    def wrapper(*args, **kwargs):
-        try:
-            verify_jwt_in_request()  # checks cookies/headers per your config
-        except Exception:
-            return redirect(url_for("auth.login_page"))
-        return fn(*args, **kwargs)
-    return wrapper
-
-def login_required():
-    # raises if invalid; returns None otherwise
-    verify_jwt_in_request(optional=False)
-
-def admin_required():
-    login_required()
-    claims = get_jwt()
-    if not claims.get("is_admin", False):
-        from flask import abort
-        abort(403, description="Admins only")
-
 @customers_bp.get("/manage/customers")
 def list_customers():
     login_required()
@@ -37,7 +18,6 @@ def list_customers():
 @customers_bp.post("/manage/customers/create")
 @jwt_required_or_login
 def create_customer():
-    login_required()
     user_id = get_jwt_identity()
     username = get_jwt().get("username")
     form = request.form
@@ -86,4 +66,15 @@ def delete_customer(customer_id: int):
     except Exception as e:
         db.session.rollback()
         flash(f"Error deleting customer: {e}", "danger")
-    return redirect(url_for("customers.list_customers"))
\ No newline at end of file
+    return redirect(url_for("customers.list_customers"))
+
+@customers_bp.post("/manage/customers/import")
+def import_customers():
+    """Bulk import from an uploaded CSV (multipart field ``file``); returns a JSON report."""
+    admin_required()
+    upload = request.files.get("file")
+    if not upload:
+        return jsonify({"msg": "CSV file is required (field 'file')."}), 400
+    stream = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+    report = bulk.run_import("customers", stream, get_jwt_identity(), get_jwt().get("username"))
+    return jsonify(report.to_dict())
@@ -0,0 +1,157 @@
+"""Connection pool sizing, warmup and telemetry.
+
+Pool settings come from the environment (``DB_POOL_SIZE``,
+``DB_MAX_OVERFLOW``, ``DB_POOL_TIMEOUT``, ``DB_POOL_RECYCLE``; see
+config.py). Every worker process has its own pool, so the database can see
+up to workers x (size + overflow) connections from the app, per primary and
+per replica. Keep that under MySQL's ``max_connections``. The
+``db_pool_max_connections`` gauge sums it over the live workers.
+
+Liveness: ``pool_pre_ping`` costs a round trip on every checkout. Instead,
+a connection is pinged only when it has sat in the pool longer than
+``DB_POOL_IDLE_PING`` seconds, which is when ``wait_timeout`` or a firewall
+may have dropped it. A failed ping raises ``DisconnectionError``, so the
+pool discards that connection and checks out a fresh one.
+``DB_POOL_RECYCLE`` still retires connections before ``wait_timeout``.
+
+Warmup: each worker opens ``DB_POOL_WARMUP`` connections in a background
+thread, so the first requests after a deploy don't pay for connection
+setup. A forked worker warms right after the fork, with any connections
+inherited from the parent dropped; an unforked process warms on its first
+request. Nothing is opened at import or in ``start()``, so a
+``gunicorn --preload`` master never holds idle connections of its own.
+
+Exported through metrics.py:
+
+* ``db_pool_checkout_wait_seconds`` histogram (time to get a connection)
+* ``db_pool_timeouts_total`` checkouts that gave up after ``pool_timeout``
+* ``db_pool_connects_total`` new connections opened
+* ``db_pool_pings_total`` idle-time liveness pings by result
+"""
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import Pool, QueuePool
+
+import metrics
+from extensions import db
+
+log = logging.getLogger(__name__)
+
+_idle_ping = 30.0
+_app = None
+_warmed_pid = None
+_warm_lock = threading.Lock()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            metrics.inc("db_pool_timeouts_total")
+            raise
+        finally:
+            metrics.observe("db_pool_checkout_wait_seconds", (), time.perf_counter() - started)
+
+
+def _connect(dbapi_connection, connection_record):
+    metrics.inc("db_pool_connects_total")
+
+
+def _checkin(dbapi_connection, connection_record):
+    if dbapi_connection is not None:
+        connection_record.info["dbpool_idle_since"] = time.monotonic()
+
+
+def _checkout(dbapi_connection, connection_record, connection_proxy):
+    idle_since = connection_record.info.pop("dbpool_idle_since", None)
+    if idle_since is None or time.monotonic() - idle_since < _idle_ping:
+        return  # fresh, or recently used
+    try:
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+        finally:
+            cursor.close()
+    except Exception as e:
+        metrics.inc("db_pool_pings_total", ("failed",))
+        raise exc.DisconnectionError() from e  # the pool reconnects and retries
+    metrics.inc("db_pool_pings_total", ("ok",))
+
+
+def warmup(app, connections=None):
+    """Open up to ``connections`` pooled connections and return them to the pool."""
+    connections = app.config["DB_POOL_WARMUP"] if connections is None else connections
+    with app.app_context():
+        engine = db.engine
+        held = []
+        try:
+            for _ in range(min(connections, app.config["DB_POOL_SIZE"])):
+                held.append(engine.connect())
+        except Exception:
+            log.warning("connection pool warmup stopped early", exc_info=True)
+        finally:
+            for conn in held:
+                conn.close()
+    return len(held)
+
+
+def _start_warmup():
+    """Warm this process's pool once, in the background."""
+    global _warmed_pid
+    if _app is None or _app.config["DB_POOL_WARMUP"] <= 0:
+        return
+    with _warm_lock:
+        if _warmed_pid == os.getpid():
+            return
+        _warmed_pid = os.getpid()
+    threading.Thread(target=warmup, args=(_app,), name="db-pool-warmup", daemon=True).start()
+
+
+def _after_fork():
+    global _warm_lock
+    _warm_lock = threading.Lock()  # another thread may have held it at fork time
+    if _app is None:
+        return
+    # the parent's sockets must not be shared; drop them without closing
+    with _app.app_context():
+        db.engine.dispose(close=False)
+    _start_warmup()
+
+
+def _before_request():
+    if _warmed_pid != os.getpid():
+        _start_warmup()
+
+
+def init_app(app):
+    """Pool options and listeners; call before ``db.init_app`` builds the engine."""
+    global _idle_ping
+    _idle_ping = app.config["DB_POOL_IDLE_PING"]
+    options = dict(app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}))
+    url = make_url(app.config["SQLALCHEMY_DATABASE_URI"])
+    if "poolclass" not in options and url.database not in (None, "", ":memory:"):
+        options["poolclass"] = TimedQueuePool
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+
+    for name, fn in (("connect", _connect), ("checkin", _checkin), ("checkout", _checkout)):
+        if not event.contains(Pool, name, fn):
+            event.listen(Pool, name, fn)
+
+
+def start(app):
+    """Arrange pool warmup for each worker; call after ``db.init_app``."""
+    global _app
+    if _app is None:
+        os.register_at_fork(after_in_child=_after_fork)
+    _app = app
+    app.before_request(_before_request)
@@ -0,0 +1,53 @@
+"""Conditional GET for JSON endpoints, keyed on table version stamps.
+
+Every write to a tracked table bumps its ``row_counters.version`` (see
+counters.py), so the versions of the tables an endpoint reads, plus the
+request path and query string, identify its response exactly. That stamp
+costs one primary-key read of ``row_counters``. When the client's
+``If-None-Match`` already carries it, the endpoint answers 304 without
+running its data queries.
+
+Writes that bypass the app (manual SQL) don't bump versions; run
+``flask --app main reconcile-counters --touch`` after those. The app's own
+repairs, ``rollup-backfill`` with or without ``--missing-keys``, advance
+the transactions version themselves.
+"""
+import hashlib
+
+from flask import Response, request
+
+from counters import snapshot
+
+
+def etag_for(tables, exclude=(), extra=()):
+    """(etag, {table: (rows, version)}) for the current GET request.
+
+    ``exclude`` names query params that don't change the data, e.g. the
+    DataTables ``draw`` counter and jQuery's ``_`` cache buster. ``extra``
+    adds values the response depends on that aren't in the query string,
+    such as a date range defaulting to "the last 7 days".
+    """
+    versions = snapshot(sorted(tables))
+    args = sorted((k, v) for k, vs in request.args.lists() if k not in exclude for v in vs)
+    raw = "\x00".join([
+        request.path,
+        *(f"{t}={versions[t][1]}" for t in sorted(tables)),
+        *(f"{k}={v}" for k, v in args),
+        *(str(v) for v in extra),
+    ])
+    return hashlib.md5(raw.encode("utf-8")).hexdigest(), versions
+
+
+def stamp(response, etag):
+    """Attach ``etag`` and make the browser revalidate on every use."""
+    # weak: the DataTables body echoes ``draw``, which the tag ignores
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def not_modified(etag):
+    """A 304 response if the client already has ``etag``, else None."""
+    if request.if_none_match.contains_weak(etag):
+        return stamp(Response(status=304), etag)
+    return None
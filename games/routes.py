@@ -1,34 +1,12 @@
-from functools import wraps
-
 from flask import Blueprint, url_for, redirect, render_template, request, flash
-from flask_jwt_extended import verify_jwt_in_request, get_jwt, get_jwt_identity
+from flask_jwt_extended import get_jwt, get_jwt_identity
 
+from auth.context import jwt_required_or_login, login_required, admin_required
 from extensions import db
 from models import Game
 
 games_bp = Blueprint("games", __name__, url_prefix="")
 
-def jwt_required_or_login(fn):
-    @wraps(fn)
-    def wrapper(*args, **kwargs):
-        try:
-            verify_jwt_in_request()  # checks cookies/headers per your config
-        except Exception:
-            return redirect(url_for("auth.login_page"))
-        return fn(*args, **kwargs)
-    return wrapper
-
-def login_required():
-    # raises if invalid; returns None otherwise
-    verify_jwt_in_request(optional=False)
-
-def admin_required():
-    login_required()
-    claims = get_jwt()
-    if not claims.get("is_admin", False):
-        from flask import abort
-        abort(403, description="Admins only")
-
 @games_bp.get("/manage/games")
 def list_games():
     login_required()
@@ -37,7 +15,6 @@ def list_games():
 @games_bp.post("/manage/games/create")
 @jwt_required_or_login
 def create_game():
-    login_required()
     user_id = get_jwt_identity()
     username = get_jwt().get("username")
     form = request.form
@@ -1,8 +1,7 @@
 from flask import Flask, redirect, url_for, request
-from flask_jwt_extended import get_jwt, get_jwt_identity, verify_jwt_in_request
+from auth.context import current_auth
 from config import Config
 from extensions import db, jwt, cache
-from models import User
 import os
 from jinja2 import FileSystemBytecodeCache
 
@@ -24,9 +23,36 @@ def create_app():
         app.config.get('JINJA_BYTECODE_PATTERN', '%s.cache'),
     )
 
+    import dbpool
+    dbpool.init_app(app)
     db.init_app(app)
+    dbpool.start(app)
     jwt.init_app(app)
 
+    import compression
+    import jsonprovider
+    compression.init_app(app)
+    jsonprovider.init_app(app)
+
+    import assets
+    import benchmark
+    import bulk
+    import counters
+    import metrics
+    import migrations
+    import profiler
+    import replicas
+    from reports import rollup
+    assets.init_app(app)
+    counters.init_app(app)
+    metrics.init_app(app)
+    migrations.init_app(app)
+    profiler.init_app(app)
+    replicas.init_app(app)
+    rollup.init_app(app)
+    bulk.init_app(app)
+    benchmark.init_app(app)
+
     @app.context_processor
     def inject_claims():
         # Defaults for anonymous users
@@ -37,16 +63,14 @@ def create_app():
             "token_expiry": None,
         }
         try:
-            # ✅ Only read identity/claims if a JWT is present; won't raise for anonymous
-            verify_jwt_in_request(optional=True)
-            claims = get_jwt() or {}
-            ctx["current_user_id"] = get_jwt_identity()
-            ctx["is_admin"] = bool(claims.get("is_admin", False))
+            # ✅ Reuses the identity verified by the view; won't raise for anonymous
+            auth = current_auth(optional=True)
+            ctx["current_user_id"] = auth.identity
+            ctx["is_admin"] = auth.is_admin
             # We stored username in additional_claims at login
-            ctx["username"] = claims.get("username")
+            ctx["username"] = auth.username
             # Keep the exp so your timer still works
-            if "exp" in claims:
-                ctx["token_expiry"] = claims["exp"]
+            ctx["token_expiry"] = auth.expires
         except Exception:
             # No valid token: leave defaults
             pass
@@ -96,6 +120,7 @@ def create_app():
     from banks.routes import banks_bp
     from transactions.routes import transactions_bp
     from reports.routes import reports_bp
+    from profiler.routes import profiler_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(books_bp)
@@ -106,17 +131,14 @@ def create_app():
     app.register_blueprint(users_bp)
     app.register_blueprint(api_bp)
     app.register_blueprint(reports_bp)
+    app.register_blueprint(profiler_bp)
 
     @app.route("/")
     def index():
         return redirect(url_for("booking.dashboard"))
 
-    # Initialize DB & seed an admin user (only if empty)
-    with app.app_context():
-        db.create_all()
-        if not User.query.first():
-            User.create_admin_if_missing()
-
+    # No database I/O here: schema and the first admin come from
+    # `flask --app main db-upgrade`, run once per deploy.
     return app
 
 app = create_app()
@@ -0,0 +1,308 @@
+"""Prometheus metrics at /metrics.
+
+Each worker process keeps its own counters and histograms in memory and
+writes them to ``METRICS_DIR/<pid>.json`` at most every
+``METRICS_FLUSH_INTERVAL`` seconds (atomically, via ``os.replace``). A scrape
+of /metrics, served by whichever worker gets it, flushes that worker and
+sums every file in the directory, so the numbers cover all workers without
+an external store.
+
+Counters and histograms of workers that have exited are kept (they are
+cumulative, and Prometheus copes with the occasional reset). Gauges, i.e.
+the connection pool, only count processes that are still alive. Clear the
+directory on deploy with ``flask --app main metrics-clear``.
+
+Only processes that serve real traffic write a file: the first request a
+process serves registers a final flush for its exit. Requests made by
+tests (``TESTING``) or by CLI commands such as ``bench`` leave no file.
+Neither do ``db-upgrade`` and the other commands, which serve none.
+
+Scrapes must send ``Authorization: Bearer <METRICS_TOKEN>``. Without a
+token configured, /metrics answers 403 unless the app runs in debug mode.
+
+Exported:
+
+* ``http_request_duration_seconds`` histogram by blueprint, endpoint, status
+* ``http_request_db_seconds`` histogram of DB time per request
+* ``cache_requests_total`` by result (hit/miss) for ``extensions.cache``,
+  counted in the tiercache backend (other backends aren't counted)
+* ``db_pool_size``, ``db_pool_checked_out``, ``db_pool_overflow`` and
+  ``db_pool_max_connections`` gauges
+* pool checkout wait, timeouts, connects and pings (see dbpool.py)
+"""
+import atexit
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+
+import click
+from flask.cli import with_appcontext
+from flask import Response, abort, current_app, g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import offload
+from extensions import db, cache
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    "http_request_duration_seconds": ("histogram", "Request latency."),
+    "http_request_db_seconds": ("histogram", "Time spent in database calls per request."),
+    "cache_requests_total": ("counter", "extensions.cache lookups by result."),
+    "db_pool_size": ("gauge", "Configured connection pool size."),
+    "db_pool_checked_out": ("gauge", "Connections currently checked out."),
+    "db_pool_overflow": ("gauge", "Connections open beyond pool_size."),
+    "db_pool_max_connections": ("gauge", "pool_size + max_overflow, i.e. the most connections workers may open."),
+    "db_pool_checkout_wait_seconds": ("histogram", "Time spent waiting for a pooled connection."),
+    "db_pool_timeouts_total": ("counter", "Checkouts that gave up after pool_timeout."),
+    "db_pool_connects_total": ("counter", "New database connections opened."),
+    "db_pool_pings_total": ("counter", "Idle-time liveness pings by result."),
+}
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+_last_flush = 0.0
+_exit_flush_pid = None  # process that registered its final flush
+
+
+def _reset_after_fork():
+    # a forked worker starts from zero; the parent's numbers are in its own file
+    global _lock, _last_flush
+    _lock = threading.Lock()
+    _counters.clear()
+    _histograms.clear()
+    _last_flush = 0.0
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def inc(name, labels=(), amount=1):
+    key = (name, tuple(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, labels, value):
+    key = (name, tuple(labels))
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                h[i] += 1
+                break
+        else:
+            h[len(BUCKETS)] += 1
+        h[-1] += value
+
+
+def _pool_gauges():
+    try:
+        pool = db.engine.pool
+        return {
+            "db_pool_size": pool.size(),
+            "db_pool_checked_out": pool.checkedout(),
+            "db_pool_overflow": max(pool.overflow(), 0),
+            "db_pool_max_connections": pool.size() + max(current_app.config["DB_MAX_OVERFLOW"], 0),
+        }
+    except (AttributeError, RuntimeError):
+        # pools without size/overflow (SQLite's), or no app context
+        return {}
+
+
+def _snapshot():
+    with _lock:
+        return {
+            "pid": os.getpid(),
+            "counters": [[n, list(l), v] for (n, l), v in _counters.items()],
+            "histograms": [[n, list(l), list(h)] for (n, l), h in _histograms.items()],
+            "gauges": _pool_gauges(),
+        }
+
+
+def _write(directory, data):
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as fh:
+        json.dump(data, fh)
+    os.replace(tmp, os.path.join(directory, f"{os.getpid()}.json"))
+
+
+def flush(directory=None):
+    global _last_flush
+    directory = directory or current_app.config["METRICS_DIR"]
+    _last_flush = time.monotonic()
+    offload.run(_write, directory, _snapshot())  # a file write; off the loop under asgi.py
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect(directory):
+    """Merge every worker's file into (counters, histograms, gauges)."""
+    counters, histograms, gauges = {}, {}, {}
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        try:
+            with open(path) as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            continue  # being replaced or truncated; next scrape picks it up
+        for name, labels, value in data["counters"]:
+            key = (name, tuple(labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, h in data["histograms"]:
+            key = (name, tuple(labels))
+            acc = histograms.get(key)
+            histograms[key] = h if acc is None else [a + b for a, b in zip(acc, h)]
+        if data["pid"] == os.getpid() or _alive(data["pid"]):
+            for name, value in data["gauges"].items():
+                gauges[name] = gauges.get(name, 0) + value
+    return counters, histograms, gauges
+
+
+LABEL_NAMES = {
+    "http_request_duration_seconds": ("blueprint", "endpoint", "status"),
+    "http_request_db_seconds": ("blueprint", "endpoint"),
+    "cache_requests_total": ("result",),
+    "db_pool_pings_total": ("result",),
+}
+
+
+def _labels(name, values, extra=()):
+    pairs = list(zip(LABEL_NAMES.get(name, ()), values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def render(counters, histograms, gauges):
+    by_name = {}
+    for (name, labels), value in sorted(counters.items(), key=lambda kv: str(kv[0])):
+        by_name.setdefault(name, []).append(f"{name}{_labels(name, labels)} {value}")
+    for (name, labels), h in sorted(histograms.items(), key=lambda kv: str(kv[0])):
+        lines = by_name.setdefault(name, [])
+        cumulative = 0
+        for bound, n in zip(BUCKETS, h):
+            cumulative += n
+            lines.append(f"{name}_bucket{_labels(name, labels, [('le', bound)])} {cumulative}")
+        cumulative += h[len(BUCKETS)]
+        lines.append(f"{name}_bucket{_labels(name, labels, [('le', '+Inf')])} {cumulative}")
+        lines.append(f"{name}_sum{_labels(name, labels)} {h[-1]}")
+        lines.append(f"{name}_count{_labels(name, labels)} {cumulative}")
+    for name, value in gauges.items():
+        by_name.setdefault(name, []).append(f"{name} {value}")
+
+    out = []
+    for name in sorted(by_name):
+        kind, text = HELP.get(name, ("untyped", name))
+        out.append(f"# HELP {name} {text}")
+        out.append(f"# TYPE {name} {kind}")
+        out.extend(by_name[name])
+    return "\n".join(out) + "\n"
+
+
+def metrics_view():
+    token = current_app.config.get("METRICS_TOKEN")
+    if not token:
+        if not current_app.debug:
+            abort(403)  # never public by accident
+    elif request.headers.get("Authorization") != f"Bearer {token}":
+        abort(401)
+    directory = current_app.config["METRICS_DIR"]
+    flush(directory)
+    return Response(render(*collect(directory)), mimetype="text/plain; version=0.0.4")
+
+
+def _db_start(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "_metrics_start" in g:
+        conn.info.setdefault("_metrics_db_start", []).append(time.perf_counter())
+
+
+def _db_end(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("_metrics_db_start")
+    if starts and has_request_context() and "_metrics_start" in g:
+        g._metrics_db_time = g.get("_metrics_db_time", 0.0) + time.perf_counter() - starts.pop()
+
+
+def _before_request():
+    g._metrics_start = time.perf_counter()
+
+
+def _serving():
+    """False for requests from tests or from inside a CLI command (bench)."""
+    return not current_app.testing and click.get_current_context(silent=True) is None
+
+
+def _flush_at_exit(directory):
+    global _exit_flush_pid
+    if _exit_flush_pid != os.getpid():
+        _exit_flush_pid = os.getpid()
+        # last counts from a worker that's shutting down
+        atexit.register(flush, directory)
+
+
+def _after_request(response):
+    started = g.pop("_metrics_start", None)
+    if started is None or request.endpoint == "metrics":
+        return response
+    blueprint = request.blueprint or ""
+    endpoint = request.endpoint or "none"
+    observe("http_request_duration_seconds", (blueprint, endpoint, response.status_code),
+            time.perf_counter() - started)
+    observe("http_request_db_seconds", (blueprint, endpoint), g.pop("_metrics_db_time", 0.0))
+    if _serving():
+        _flush_at_exit(current_app.config["METRICS_DIR"])
+        if time.monotonic() - _last_flush >= current_app.config["METRICS_FLUSH_INTERVAL"]:
+            flush()
+    return response
+
+
+def _cache_lookup(hit):
+    inc("cache_requests_total", ("hit" if hit else "miss",))
+
+
+@click.command("metrics-clear")
+@with_appcontext
+def clear_command():
+    """Remove per-worker metric files (run on deploy, before workers start)."""
+    directory = current_app.config["METRICS_DIR"]
+    removed = 0
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        os.remove(path)
+        removed += 1
+    click.echo(f"Removed {removed} metric file(s) from {directory}.")
+
+
+def init_app(app):
+    app.config.setdefault("METRICS_DIR", os.path.expanduser("~/flask_metrics"))
+    app.config.setdefault("METRICS_FLUSH_INTERVAL", 5)
+    app.config.setdefault("METRICS_TOKEN", None)
+    directory = app.config["METRICS_DIR"]
+    os.makedirs(directory, exist_ok=True)
+
+    if not event.contains(Engine, "before_cursor_execute", _db_start):
+        event.listen(Engine, "before_cursor_execute", _db_start)
+        event.listen(Engine, "after_cursor_execute", _db_end)
+
+    backend = app.extensions.get("cache", {}).get(cache)
+    if hasattr(backend, "on_lookup"):
+        backend.on_lookup = _cache_lookup
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
+    app.cli.add_command(clear_command)
@@ -0,0 +1,79 @@
+"""Versioned schema migrations.
+
+Each module in ``migrations.versions`` defines ``version``, ``description``
+and ``upgrade(conn)``. Applied versions are recorded in ``schema_migrations``
+so every migration runs exactly once per database. Run them once per deploy,
+before restarting the workers. Rows the old workers write in between are
+healed by the last step:
+
+    flask --app main db-upgrade
+    # restart the workers, then
+    flask --app main rollup-backfill --missing-keys
+
+Importing the app never touches the database. A fresh database gets its
+tables from 0000 and its first admin user from 0006, both through this
+command.
+"""
+import importlib
+import pkgutil
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, select, insert
+
+from extensions import db
+
+_meta = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _meta,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def discover():
+    """All migration modules, ordered by version."""
+    from migrations import versions
+    mods = [
+        importlib.import_module(f"{versions.__name__}.{info.name}")
+        for info in pkgutil.iter_modules(versions.__path__)
+    ]
+    return sorted(mods, key=lambda m: m.version)
+
+
+def pending(engine):
+    _meta.create_all(engine)
+    with engine.connect() as conn:
+        done = set(conn.execute(select(schema_migrations.c.version)).scalars())
+    return [m for m in discover() if m.version not in done]
+
+
+def upgrade(engine, echo=print):
+    """Apply every pending migration in order. Returns the versions applied."""
+    applied = []
+    for mod in pending(engine):
+        echo(f"Applying {mod.version:04d} {mod.description} ...")
+        # Migrations manage their own transactions so long backfills can
+        # commit in batches instead of holding one huge transaction open.
+        with engine.connect() as conn:
+            mod.upgrade(conn)
+            conn.execute(insert(schema_migrations).values(
+                version=mod.version, description=mod.description, applied_at=datetime.utcnow(),
+            ))
+            conn.commit()
+        applied.append(mod.version)
+    return applied
+
+
+@click.command("db-upgrade")
+@with_appcontext
+def upgrade_command():
+    """Apply pending schema migrations."""
+    applied = upgrade(db.engine, echo=click.echo)
+    click.echo(f"{len(applied)} migration(s) applied." if applied else "Schema is up to date.")
+
+
+def init_app(app):
+    app.cli.add_command(upgrade_command)
@@ -0,0 +1,114 @@
+"""Small, idempotent DDL helpers used by migration scripts.
+
+On MySQL the statements ask InnoDB for online DDL (INSTANT column adds,
+INPLACE/LOCK=NONE index builds) so reads and writes keep flowing while a
+migration runs. Every helper checks the live schema first, which also makes
+migrations safe on databases that ``create_all`` already brought up to date.
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import inspect, text
+
+
+def _is_mysql(conn):
+    return conn.dialect.name in ("mysql", "mariadb")
+
+
+def has_column(conn, table, column):
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+
+def has_index(conn, table, name):
+    return any(ix["name"] == name for ix in inspect(conn).get_indexes(table))
+
+
+def add_column(conn, table, column, ddl_type):
+    if has_column(conn, table, column):
+        return False
+    sql = f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"
+    if _is_mysql(conn):
+        sql += ", ALGORITHM=INSTANT"
+    conn.execute(text(sql))
+    conn.commit()
+    return True
+
+
+def create_index(conn, table, name, columns):
+    if has_index(conn, table, name):
+        return False
+    cols = ", ".join(columns)
+    if _is_mysql(conn):
+        sql = f"ALTER TABLE {table} ADD INDEX {name} ({cols}), ALGORITHM=INPLACE, LOCK=NONE"
+    else:
+        sql = f"CREATE INDEX {name} ON {table} ({cols})"
+    conn.execute(text(sql))
+    conn.commit()
+    return True
+
+
+@contextmanager
+def fulltext_without_stopwords(conn):
+    """Build the FULLTEXT indexes created in this block without stopwords.
+
+    InnoDB's default stopword list includes "a" and "i", and the ngram
+    parser drops every token that contains a stopword, so a phrase search
+    for e.g. "ka" would never match. An index keeps the stopword setting
+    it was built with; queries can't change it later.
+    """
+    if not _is_mysql(conn):
+        yield
+        return
+    conn.execute(text("SET SESSION innodb_ft_enable_stopword = OFF"))
+    try:
+        yield
+    finally:
+        conn.execute(text("SET SESSION innodb_ft_enable_stopword = DEFAULT"))
+
+
+def create_fulltext_index(conn, table, name, columns, parser="ngram"):
+    """FULLTEXT index on MySQL; a plain index elsewhere, as ``create_all`` does."""
+    if not _is_mysql(conn):
+        return create_index(conn, table, name, columns)
+    if has_index(conn, table, name):
+        return False
+    # InnoDB can't build FULLTEXT with LOCK=NONE; let it pick the lock level
+    with fulltext_without_stopwords(conn):
+        conn.execute(text(
+            f"ALTER TABLE {table} ADD FULLTEXT INDEX {name} ({', '.join(columns)}) WITH PARSER {parser}"
+        ))
+    conn.commit()
+    return True
+
+
+def rebuild_fulltext_index(conn, table, name, columns, parser="ngram"):
+    """Drop and re-add a MySQL FULLTEXT index in one statement, without stopwords."""
+    if not _is_mysql(conn):
+        return False
+    if not has_index(conn, table, name):
+        return create_fulltext_index(conn, table, name, columns, parser)
+    with fulltext_without_stopwords(conn):
+        conn.execute(text(
+            f"ALTER TABLE {table} DROP INDEX {name},"
+            f" ADD FULLTEXT INDEX {name} ({', '.join(columns)}) WITH PARSER {parser}"
+        ))
+    conn.commit()
+    return True
+
+
+def backfill(conn, select_sql, update_sql, compute, batch_size=5000):
+    """Rewrite rows in id-ordered batches, committing after each batch.
+
+    ``select_sql`` (a string or ``text()`` clause) must select ``id`` first and
+    accept ``:after`` / ``:limit``; ``compute(row)`` returns the bind params
+    for ``update_sql``.
+    """
+    stmt = text(select_sql) if isinstance(select_sql, str) else select_sql
+    after, total = 0, 0
+    while True:
+        rows = conn.execute(stmt, {"after": after, "limit": batch_size}).all()
+        if not rows:
+            return total
+        conn.execute(text(update_sql), [compute(r) for r in rows])
+        conn.commit()
+        after = rows[-1][0]
+        total += len(rows)
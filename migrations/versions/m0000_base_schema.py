@@ -0,0 +1,19 @@
+"""Base schema: every model's table, for a fresh database.
+
+This used to run as ``db.create_all()`` in every worker at import time.
+It only creates tables that are missing, so on existing databases it
+changes nothing and the later migrations stay no-ops where the schema is
+already current.
+"""
+from extensions import db
+from migrations import ops
+
+version = 0
+description = "base schema"
+
+
+def upgrade(conn):
+    # the models declare FULLTEXT indexes; build them the way 0003 does
+    with ops.fulltext_without_stopwords(conn):
+        db.metadata.create_all(conn, checkfirst=True)
+    conn.commit()
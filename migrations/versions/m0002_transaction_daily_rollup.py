@@ -0,0 +1,13 @@
+"""Daily transaction rollup table used by the transactions report."""
+from models import TransactionDailyRollup
+
+version = 2
+description = "transaction daily rollup"
+
+
+def upgrade(conn):
+    TransactionDailyRollup.__table__.create(conn, checkfirst=True)
+    conn.commit()
+    # Imported here: the backfill runs on its own engine connections
+    from reports.rollup import backfill
+    backfill()
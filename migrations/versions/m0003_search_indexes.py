@@ -0,0 +1,22 @@
+"""Search indexes backing the /api DataTables search box (see search.py).
+
+The FULLTEXT indexes are built with InnoDB stopwords off
+(``ops.fulltext_without_stopwords``); 0007 rebuilds indexes that were
+created before that.
+"""
+from migrations import ops
+
+version = 3
+description = "fulltext search indexes"
+
+FULLTEXT_INDEXES = [
+    ("customers", "ft_customers_name_acc_id", ["name", "acc_id"]),
+    ("games", "ft_games_name", ["name"]),
+    ("banks", "ft_banks_name", ["name"]),
+]
+
+
+def upgrade(conn):
+    for table, name, columns in FULLTEXT_INDEXES:
+        ops.create_fulltext_index(conn, table, name, columns)
+    ops.create_index(conn, "transactions", "ix_transactions_bank_stor", ["bank_stor"])
@@ -0,0 +1,10 @@
+"""Prefix indexes for the customer typeahead (/api/lookup/customers)."""
+from migrations import ops
+
+version = 4
+description = "customer lookup indexes"
+
+
+def upgrade(conn):
+    ops.create_index(conn, "customers", "ix_customers_name", ["name"])
+    ops.create_index(conn, "customers", "ix_customers_acc_id", ["acc_id"])
@@ -0,0 +1,9 @@
+"""Per-table write version on row_counters, used as a cache key."""
+from migrations import ops
+
+version = 5
+description = "row counter versions"
+
+
+def upgrade(conn):
+    ops.add_column(conn, "row_counters", "version", "BIGINT NOT NULL DEFAULT 0")
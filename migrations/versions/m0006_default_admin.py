@@ -0,0 +1,27 @@
+"""Default admin account on a database without users.
+
+This used to be checked by every worker at import time. Change the
+password right after the first login.
+"""
+from datetime import datetime
+
+from sqlalchemy import func, insert, select
+
+from auth.passwords import hash_password
+from models import User
+
+version = 6
+description = "default admin user"
+
+
+def upgrade(conn):
+    users = User.__table__
+    if conn.execute(select(func.count()).select_from(users)).scalar():
+        return
+    now = datetime.utcnow()
+    conn.execute(insert(users).values(
+        fullname="ADMIN", username="admin", is_admin=True,
+        password_hash=hash_password("admin123"),  # change immediately in production
+        created_at=now, updated_at=now,
+    ))
+    conn.commit()
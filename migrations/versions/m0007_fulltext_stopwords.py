@@ -0,0 +1,20 @@
+"""Rebuild the FULLTEXT search indexes without InnoDB's stopword list.
+
+Indexes built by 0000 or 0003 before those turned stopwords off dropped
+every ngram containing a stopword ("a", "i", ...), so phrase searches
+missed names and account ids that the old ILIKE search found. Each index
+is dropped and re-added in one ALTER, so search keeps working while it
+rebuilds. A database that ran 0003 in the same upgrade builds these
+indexes twice. They are on the small lookup tables, so that costs little.
+No-op outside MySQL.
+"""
+from migrations import ops
+from migrations.versions.m0003_search_indexes import FULLTEXT_INDEXES
+
+version = 7
+description = "fulltext indexes without stopwords"
+
+
+def upgrade(conn):
+    for table, name, columns in FULLTEXT_INDEXES:
+        ops.rebuild_fulltext_index(conn, table, name, columns)
@@ -1,7 +1,15 @@
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event
 from extensions import db
 
+def date_keys(dt):
+    """Report bucket keys for a datetime or date: (day, ISO year*100+week, year*100+month)."""
+    if dt is None:
+        return None, None, None
+    iso_year, iso_week, _ = dt.isocalendar()
+    day = dt.date() if isinstance(dt, datetime) else dt
+    return day, iso_year * 100 + iso_week, dt.year * 100 + dt.month
+
 class User(db.Model):
     __tablename__ = "users"
     id = db.Column(db.Integer, primary_key=True)
@@ -14,17 +22,17 @@ class User(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def set_password(self, raw_password: str):
-        self.password_hash = generate_password_hash(raw_password)
+        from auth.passwords import hash_password
+        self.password_hash = hash_password(raw_password)
 
     def check_password(self, raw_password: str) -> bool:
-        return check_password_hash(self.password_hash, raw_password)
-
-    @staticmethod
-    def create_admin_if_missing():
-        admin = User(fullname="ADMIN",username="admin", is_admin=True)
-        admin.set_password("admin123")  # change immediately in production
-        db.session.add(admin)
-        db.session.commit()
+        """Verify off the request thread; upgrades the stored hash when the
+        configured method changed (caller commits). Raises LoginBusy."""
+        from auth.passwords import verify
+        ok, new_hash = verify(self.password_hash, raw_password)
+        if ok and new_hash:
+            self.password_hash = new_hash
+        return ok
 
 class Customer(db.Model):
     __tablename__ = "customers"
@@ -37,6 +45,13 @@ class Customer(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # prefix lookups for the booking typeahead
+        db.Index("ix_customers_name", "name"),
+        db.Index("ix_customers_acc_id", "acc_id"),
+        db.Index("ft_customers_name_acc_id", "name", "acc_id", mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),
+    )
+
 class Game(db.Model):
     __tablename__ = "games"
     id = db.Column(db.Integer, primary_key=True)
@@ -47,6 +62,10 @@ class Game(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index("ft_games_name", "name", mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),
+    )
+
 class Bank(db.Model):
     __tablename__ = "banks"
     id = db.Column(db.Integer, primary_key=True)
@@ -57,6 +76,10 @@ class Bank(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index("ft_banks_name", "name", mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),
+    )
+
 class Transaction(db.Model):
     __tablename__ = "transactions"
     id = db.Column(db.Integer, primary_key=True)
@@ -70,10 +93,62 @@ class Transaction(db.Model):
     game_id = db.Column(db.Integer, db.ForeignKey("games.id"))
     created_by = db.Column(db.String(120), nullable=False)
     updated_by = db.Column(db.String(120), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Report buckets derived from created_at (kept in sync by _stamp_date_keys)
+    day_key = db.Column(db.Date)
+    week_key = db.Column(db.Integer)
+    month_key = db.Column(db.Integer)
+
+    __table_args__ = (
+        # Equality filters first, then the day range used by reports
+        db.Index("ix_transactions_day_type", "day_key", "type"),
+        db.Index("ix_transactions_user_day", "user_id", "day_key"),
+        db.Index("ix_transactions_customer_day", "customer_id", "day_key"),
+        db.Index("ix_transactions_bank_day", "bank_id", "day_key"),
+        db.Index("ix_transactions_game_day", "game_id", "day_key"),
+        # bank_stor search is a prefix match
+        db.Index("ix_transactions_bank_stor", "bank_stor"),
+    )
+
     # Relationships (for join)
     customer = db.relationship("Customer", backref="transactions", lazy="joined")
     bank = db.relationship("Bank", backref="transactions", lazy="joined")
-    game = db.relationship("Game", backref="transactions", lazy="joined")
\ No newline at end of file
+    game = db.relationship("Game", backref="transactions", lazy="joined")
+
+@event.listens_for(Transaction, "before_insert")
+@event.listens_for(Transaction, "before_update")
+def _stamp_date_keys(mapper, connection, target):
+    if target.created_at is None:
+        target.created_at = datetime.utcnow()
+    target.day_key, target.week_key, target.month_key = date_keys(target.created_at)
+
+class RowCounter(db.Model):
+    """Per-table row totals and write versions kept in step with writes (see counters.py)."""
+    __tablename__ = "row_counters"
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class TransactionDailyRollup(db.Model):
+    """Per-day transaction totals maintained by reports/rollup.py.
+
+    Key columns are NOT NULL so they can form the primary key; missing
+    foreign keys are stored as 0 and a missing user_id as ''.
+    """
+    __tablename__ = "transaction_daily_rollup"
+    day = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.String(32), primary_key=True, default="")
+    customer_id = db.Column(db.Integer, primary_key=True, autoincrement=False, default=0)
+    bank_id = db.Column(db.Integer, primary_key=True, autoincrement=False, default=0)
+    game_id = db.Column(db.Integer, primary_key=True, autoincrement=False, default=0)
+    type = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    currency = db.Column(db.String(10), primary_key=True)
+    tx_count = db.Column(db.BigInteger, nullable=False, default=0)
+    amount_sum = db.Column(db.Double, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index("ix_rollup_customer_day", "customer_id", "day"),
+    )
@@ -0,0 +1,29 @@
+"""Keep blocking I/O off the event loop under asgi.py.
+
+Async endpoints run inside ``AsyncSession.run_sync``: a greenlet on the
+event loop's thread. Queries through ``db.session`` await the async driver
+there, but any other blocking call (the cache's SQLite L2, a sync engine,
+a file write) would stall every request on the loop.
+
+``run(fn, *args)`` called from that greenlet hands ``fn`` to the loop's
+default thread pool and waits for it via SQLAlchemy's ``await_only``, so
+the loop keeps serving other requests meanwhile. Anywhere else (WSGI
+threads, the CLI) it just calls ``fn``. ``fn`` runs without the app or
+request context; read what it needs from them beforehand.
+"""
+import asyncio
+import functools
+
+from sqlalchemy.util.concurrency import await_only, in_greenlet
+
+
+def on_loop():
+    """True inside an async endpoint's dispatch on the event loop."""
+    return in_greenlet()
+
+
+def run(fn, *args, **kwargs):
+    if not in_greenlet():
+        return fn(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await_only(loop.run_in_executor(None, functools.partial(fn, *args, **kwargs)))
@@ -0,0 +1,154 @@
+"""Per-request SQL profiling.
+
+A sampled request gets a ``RequestProfile`` on ``flask.g``. Engine-level
+``before/after_cursor_execute`` listeners time every statement it runs and
+count them by SQL text. When the request finishes:
+
+* a ``Server-Timing`` header reports DB time, query count and total time,
+  to admins and in debug mode only (it tells anyone how the app queries),
+* statements repeated ``SQL_PROFILE_N_PLUS_ONE`` times or more with only
+  their parameters changing (lazy ``customer.transactions`` in a loop and
+  the like) are flagged as N+1 and logged,
+* a summary goes into a per-process ring buffer of the last
+  ``SQL_PROFILE_HISTORY`` requests, shown at /manage/profiler.
+
+``SQL_PROFILE_SAMPLE_RATE`` picks the fraction of requests profiled. It
+defaults to 0 (off); set it in the environment to opt in. For an
+unsampled request the listeners return after one ``g`` lookup.
+"""
+import logging
+import random
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+from flask import current_app, g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from auth.context import current_auth
+
+log = logging.getLogger(__name__)
+
+_history = deque(maxlen=200)
+_history_lock = threading.Lock()
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.statements = Counter()
+        self.durations = {}  # statement -> total seconds
+        self.slowest = []    # (seconds, statement), longest first
+
+    def record(self, statement, elapsed, keep):
+        self.query_count += 1
+        self.db_time += elapsed
+        self.statements[statement] += 1
+        self.durations[statement] = self.durations.get(statement, 0.0) + elapsed
+        if len(self.slowest) < keep or elapsed > self.slowest[-1][0]:
+            self.slowest.append((elapsed, statement))
+            self.slowest.sort(key=lambda s: s[0], reverse=True)
+            del self.slowest[keep:]
+
+    def repeated(self, threshold):
+        return [
+            {"statement": stmt, "count": n, "ms": round(self.durations[stmt] * 1000, 2)}
+            for stmt, n in self.statements.most_common()
+            if n >= threshold
+        ]
+
+
+def _profile():
+    return g.get("_sql_profile") if has_request_context() else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _profile() is not None:
+        conn.info.setdefault("_sql_profile_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    prof = _profile()
+    if prof is None:
+        return
+    starts = conn.info.get("_sql_profile_start")
+    if not starts:
+        # statement started before the request was sampled
+        return
+    prof.record(statement, time.perf_counter() - starts.pop(), current_app.config["SQL_PROFILE_SLOW_STATEMENTS"])
+
+
+def _start():
+    rate = current_app.config["SQL_PROFILE_SAMPLE_RATE"]
+    if rate > 0 and (rate >= 1 or random.random() < rate):
+        g._sql_profile = RequestProfile()
+
+
+def _show_timing():
+    if current_app.debug:
+        return True
+    try:
+        return current_auth(optional=True).is_admin
+    except Exception:  # bad or expired token: not an admin
+        return False
+
+
+def _finish(response):
+    prof = g.pop("_sql_profile", None)
+    if prof is None:
+        return response
+    total = time.perf_counter() - prof.started
+    n_plus_one = prof.repeated(current_app.config["SQL_PROFILE_N_PLUS_ONE"])
+
+    if _show_timing():
+        response.headers.add(
+            "Server-Timing",
+            f'db;dur={prof.db_time * 1000:.1f};desc="{prof.query_count} queries", app;dur={total * 1000:.1f}',
+        )
+    for item in n_plus_one:
+        log.warning("possible N+1 on %s %s: %dx %s", request.method, request.path, item["count"], item["statement"])
+
+    entry = {
+        "at": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+        "method": request.method,
+        "path": request.path,
+        "endpoint": request.endpoint,
+        "status": response.status_code,
+        "total_ms": round(total * 1000, 2),
+        "db_ms": round(prof.db_time * 1000, 2),
+        "queries": prof.query_count,
+        "slowest": [{"ms": round(s * 1000, 2), "statement": stmt} for s, stmt in prof.slowest],
+        "n_plus_one": n_plus_one,
+    }
+    with _history_lock:
+        _history.append(entry)
+    return response
+
+
+def recent():
+    """Profiled requests in this worker process, newest first."""
+    with _history_lock:
+        return list(reversed(_history))
+
+
+def init_app(app):
+    global _history
+    app.config.setdefault("SQL_PROFILE_SAMPLE_RATE", 0.0)
+    app.config.setdefault("SQL_PROFILE_N_PLUS_ONE", 5)
+    app.config.setdefault("SQL_PROFILE_SLOW_STATEMENTS", 5)
+    app.config.setdefault("SQL_PROFILE_HISTORY", 200)
+    if _history.maxlen != app.config["SQL_PROFILE_HISTORY"]:
+        with _history_lock:
+            _history = deque(_history, maxlen=app.config["SQL_PROFILE_HISTORY"])
+
+    # on the Engine class so every engine (and any added later) is covered
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    app.before_request(_start)
+    app.after_request(_finish)
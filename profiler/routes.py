@@ -0,0 +1,17 @@
+from flask import Blueprint, render_template, request, jsonify
+
+import profiler
+from auth.context import admin_required
+
+profiler_bp = Blueprint("profiler", __name__, url_prefix="/manage/profiler")
+
+@profiler_bp.get("/")
+def recent_requests():
+    admin_required()
+    entries = profiler.recent()
+    if request.args.get("format") == "json":
+        return jsonify(entries)
+    n_plus_one_only = request.args.get("n_plus_one") == "1"
+    if n_plus_one_only:
+        entries = [e for e in entries if e["n_plus_one"]]
+    return render_template("manage_profiler.html", entries=entries, n_plus_one_only=n_plus_one_only)
@@ -0,0 +1,232 @@
+"""Read-replica routing.
+
+With ``SQLALCHEMY_REPLICA_URIS`` set, GET/HEAD requests to the read-heavy
+endpoints (``REPLICA_ROUTES``: the ``api`` and ``reports`` blueprints and
+the dashboard) run their queries on a replica. All other requests, and
+anything a session flushes or any DML statement, use the primary.
+
+Routing happens in ``RoutingSession.get_bind``. ``before_request`` picks
+one healthy replica for the request and stores it on ``g``. Outside such
+requests (CLI, other endpoints) nothing changes.
+
+Replica health is checked by a background thread in each worker, every
+``REPLICA_LAG_CHECK_INTERVAL`` seconds, so a request never waits on it.
+Requests read whatever the last check found. Until the first check
+finishes, and whenever no replica is usable, reads go to the primary.
+Replica connections time out after ``REPLICA_CONNECT_TIMEOUT`` seconds,
+so an unreachable host only delays that thread.
+
+On MySQL, lag is the replica's own ``Seconds_Behind_Source`` from
+``SHOW REPLICA STATUS`` (``Seconds_Behind_Master`` on older servers). The
+app user needs the REPLICATION CLIENT privilege for it. A replica that
+reports no status, a stopped SQL thread (NULL), more than
+``REPLICA_MAX_LAG`` seconds of lag, or that can't be reached is skipped
+until the next check.
+
+Other backends (SQLite copies in development) have no replication status.
+For them, lag is estimated as how far the replica's newest
+``row_counters.updated_at`` trails the primary's. Those stamps are
+``utcnow()`` of whichever app host wrote, so the estimate suffers from
+clock skew between hosts. After a pause in writes it also overstates lag
+as the gap between the last two writes. Good enough for a single dev
+host; don't rely on it in production.
+
+Read-your-writes: a request that writes (flushes changes, or any
+successful POST/PUT/DELETE) sets a short-lived
+``db_primary_until`` cookie. For ``REPLICA_READ_YOUR_WRITES`` seconds that
+client's reads stay on the primary, so a table reload right after an edit
+shows the edit.
+
+Locally, copy the SQLite file and point a replica at the copy::
+
+    cp app.db replica.db
+    DATABASE_URL=sqlite:///$PWD/app.db DATABASE_REPLICA_URLS=sqlite:///$PWD/replica.db flask --app main run
+"""
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, request, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.engine import make_url
+
+import offload
+import extensions  # module import: extensions builds db with RoutingSession
+
+log = logging.getLogger(__name__)
+
+REPLICA_ROUTES = {"api", "reports", "booking.dashboard"}  # blueprints or endpoints
+PRIMARY_COOKIE = "db_primary_until"
+
+
+class RoutingSession(Session):
+    """Sends reads to the request's replica, everything else to the primary."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not getattr(clause, "is_dml", False):
+            replica = current()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class _Replicas:
+    def __init__(self, app):
+        self.app = app
+        self.engines = [self._engine(app, url) for url in app.config["SQLALCHEMY_REPLICA_URIS"]]
+        self.max_lag = app.config["REPLICA_MAX_LAG"]
+        self.interval = max(app.config["REPLICA_LAG_CHECK_INTERVAL"], 0.5)
+        self.sticky = app.config["REPLICA_READ_YOUR_WRITES"]
+        self.healthy = []
+        self.lag = {}  # url -> seconds behind at the last check, None if unusable
+        self.checked_at = 0.0
+        self._thread_pid = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _engine(app, url):
+        options = dict(app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}))
+        url = make_url(url)
+        if url.get_backend_name() in ("mysql", "mariadb"):
+            timeout = app.config["REPLICA_CONNECT_TIMEOUT"]
+            key = "connection_timeout" if url.get_driver_name() == "mysqlconnector" else "connect_timeout"
+            options["connect_args"] = {**options.get("connect_args", {}), key: timeout}
+        return create_engine(url, **options)
+
+    def _mysql_lag(self, conn):
+        for statement, column in (("SHOW REPLICA STATUS", "Seconds_Behind_Source"),
+                                  ("SHOW SLAVE STATUS", "Seconds_Behind_Master")):
+            try:
+                row = conn.exec_driver_sql(statement).mappings().first()
+            except Exception:
+                continue  # older server without the new syntax
+            if row is None:
+                return None  # not a replica
+            lag = row.get(column)
+            return None if lag is None else float(lag)  # NULL: replication stopped
+        return None
+
+    def _stamp_lag(self, conn, primary_stamp):
+        from counters import _counters
+        stamp = conn.execute(select(func.max(_counters.c.updated_at))).scalar()
+        if primary_stamp is None or stamp is None:
+            return 0.0
+        return max((primary_stamp - stamp).total_seconds(), 0.0)
+
+    def check(self):
+        """Measure every replica and update ``healthy``."""
+        primary_stamp = None
+        if any(e.dialect.name not in ("mysql", "mariadb") for e in self.engines):
+            from counters import _counters
+            with self.app.app_context(), extensions.db.engine.connect() as conn:
+                primary_stamp = conn.execute(select(func.max(_counters.c.updated_at))).scalar()
+        healthy = []
+        for engine in self.engines:
+            url = engine.url.render_as_string()
+            try:
+                with engine.connect() as conn:
+                    if engine.dialect.name in ("mysql", "mariadb"):
+                        lag = self._mysql_lag(conn)
+                    else:
+                        lag = self._stamp_lag(conn, primary_stamp)
+            except Exception:
+                lag = None
+            self.lag[url] = lag
+            if lag is not None and lag <= self.max_lag:
+                healthy.append(engine)
+        self.healthy = healthy
+        self.checked_at = time.monotonic()
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception:
+                log.warning("replica check failed", exc_info=True)
+                self.healthy = []
+            time.sleep(self.interval)
+
+    def _ensure_thread(self):
+        # started lazily so that each worker (after a fork) runs its own
+        if self._thread_pid != os.getpid():
+            with self._lock:
+                if self._thread_pid != os.getpid():
+                    self._thread_pid = os.getpid()
+                    threading.Thread(target=self._run, name="replica-check", daemon=True).start()
+
+    def pick(self):
+        self._ensure_thread()
+        healthy = self.healthy
+        return random.choice(healthy) if healthy else None
+
+
+def _state(app=None):
+    from flask import current_app
+    return (app or current_app).extensions.get("replicas")
+
+
+def current():
+    """The replica engine this request reads from, or None for the primary."""
+    if not has_request_context():
+        return None
+    return g.get("_db_replica")
+
+
+@contextmanager
+def using_primary():
+    """Run the enclosed queries on the primary even in a replica-routed request."""
+    replica = g.pop("_db_replica", None) if has_request_context() else None
+    try:
+        yield
+    finally:
+        if replica is not None:
+            g._db_replica = replica
+
+
+def read_engine():
+    """Engine for Core reads outside the session (e.g. streamed exports)."""
+    return current() or extensions.db.engine
+
+
+def _routed(endpoint):
+    return endpoint is not None and (endpoint in REPLICA_ROUTES or endpoint.partition(".")[0] in REPLICA_ROUTES)
+
+
+def _before_request():
+    state = _state()
+    if offload.on_loop():
+        return  # async endpoints (asgi.py) read through their own engine
+    if state is None or request.method not in ("GET", "HEAD") or not _routed(request.endpoint):
+        return
+    if request.cookies.get(PRIMARY_COOKIE, type=float, default=0) > time.time():
+        return  # this client wrote recently
+    g._db_replica = state.pick()
+
+
+def _after_flush(session, flush_context):
+    if has_request_context() and (session.new or session.dirty or session.deleted):
+        g._db_wrote = True
+
+
+def _after_request(response):
+    state = _state()
+    # unsafe methods count as writes too: CSV imports write through Core, not the session
+    wrote = g.get("_db_wrote") or (request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400)
+    if state is not None and wrote:
+        response.set_cookie(PRIMARY_COOKIE, str(time.time() + state.sticky), max_age=int(state.sticky) + 1,
+                            httponly=True, samesite="Lax")
+    return response
+
+
+def init_app(app):
+    if not app.config.get("SQLALCHEMY_REPLICA_URIS"):
+        return
+    app.extensions["replicas"] = _Replicas(app)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    if not event.contains(extensions.db.session, "after_flush", _after_flush):
+        event.listen(extensions.db.session, "after_flush", _after_flush)
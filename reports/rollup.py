@@ -0,0 +1,238 @@
+"""Incrementally maintained daily transaction rollup.
+
+``transaction_daily_rollup`` holds count and amount sums per
+(day, user_id, customer_id, bank_id, game_id, type, currency). A session
+``after_flush`` hook applies the delta of every inserted, updated or deleted
+Transaction as an upsert on the flushing connection, so the rollup commits
+together with the write that changed it.
+
+Days touched by a change are remembered on the session and handed to
+``summary_cache.touch`` once it commits, so cached report buckets for those
+days are dropped.
+
+``backfill`` rebuilds a day range from the raw table
+(``flask --app main rollup-backfill``), for the first deploy or to heal
+writes that bypassed the ORM. ``heal_missing_keys`` (``--missing-keys``)
+stamps rows inserted without date keys, e.g. by workers still running
+pre-0001 code during a deploy, and rebuilds only their days. Run it as
+the last deploy step, after every worker has restarted.
+"""
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import event, inspect, select, delete, insert, func, and_
+
+import counters
+from extensions import db
+from models import Transaction, TransactionDailyRollup
+from reports import summary_cache
+
+_rollup = TransactionDailyRollup.__table__
+_tx = Transaction.__table__
+
+KEY_COLUMNS = ("day", "user_id", "customer_id", "bank_id", "game_id", "type", "currency")
+# Transaction attributes feeding each key column, in KEY_COLUMNS order
+KEY_ATTRS = ("day_key", "user_id", "customer_id", "bank_id", "game_id", "type", "currency")
+TRACKED_ATTRS = KEY_ATTRS + ("amount",)
+
+
+def _key(values):
+    day, user_id, customer_id, bank_id, game_id, type_, currency = values
+    return (
+        day,
+        str(user_id or ""),
+        int(customer_id or 0),
+        int(bank_id or 0),
+        int(game_id or 0),
+        int(type_),
+        currency,
+    )
+
+
+def _current(obj):
+    return _key([getattr(obj, a) for a in KEY_ATTRS]), float(obj.amount or 0)
+
+
+def _previous(obj):
+    state = inspect(obj)
+
+    def old(name):
+        hist = state.attrs[name].history
+        return hist.deleted[0] if hist.deleted else getattr(obj, name)
+
+    return _key([old(a) for a in KEY_ATTRS]), float(old("amount") or 0)
+
+
+def _changed(obj):
+    state = inspect(obj)
+    return any(state.attrs[a].history.has_changes() for a in TRACKED_ATTRS)
+
+
+def _collect(session):
+    deltas = {}
+
+    def add(key, count, amount):
+        if key[0] is None:
+            return  # no created_at, nothing to bucket
+        c, a = deltas.get(key, (0, 0.0))
+        deltas[key] = (c + count, a + amount)
+
+    for obj in session.new:
+        if isinstance(obj, Transaction):
+            key, amount = _current(obj)
+            add(key, 1, amount)
+    for obj in session.deleted:
+        if isinstance(obj, Transaction):
+            key, amount = _previous(obj)
+            add(key, -1, -amount)
+    for obj in session.dirty:
+        if isinstance(obj, Transaction) and obj not in session.deleted and _changed(obj):
+            key, amount = _previous(obj)
+            add(key, -1, -amount)
+            key, amount = _current(obj)
+            add(key, 1, amount)
+    return {k: v for k, v in deltas.items() if v[0] or v[1]}
+
+
+def apply_deltas(conn, deltas):
+    """Upsert ``{key: (count_delta, amount_delta)}`` into the rollup."""
+    if not deltas:
+        return
+    rows = [
+        dict(zip(KEY_COLUMNS, key), tx_count=count, amount_sum=amount)
+        for key, (count, amount) in deltas.items()
+    ]
+    dialect = conn.dialect.name
+    if dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+        stmt = dialect_insert(_rollup)
+        stmt = stmt.on_duplicate_key_update(
+            tx_count=_rollup.c.tx_count + stmt.inserted.tx_count,
+            amount_sum=_rollup.c.amount_sum + stmt.inserted.amount_sum,
+        )
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(_rollup)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(KEY_COLUMNS),
+            set_={
+                "tx_count": _rollup.c.tx_count + stmt.excluded.tx_count,
+                "amount_sum": _rollup.c.amount_sum + stmt.excluded.amount_sum,
+            },
+        )
+    conn.execute(stmt, rows)
+
+
+def _after_flush(session, flush_context):
+    deltas = _collect(session)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+        session.info.setdefault("rollup_days", set()).update(key[0] for key in deltas)
+
+
+def _after_commit(session):
+    days = session.info.pop("rollup_days", None)
+    if days:
+        summary_cache.touch(days)
+
+
+def _after_rollback(session):
+    session.info.pop("rollup_days", None)
+
+
+def _month_chunks(start, end):
+    """Yield [lo, hi) month-aligned day ranges covering [start, end)."""
+    lo = start
+    while lo < end:
+        hi = (lo.replace(day=1) + timedelta(days=32)).replace(day=1)
+        yield lo, min(hi, end)
+        lo = hi
+
+
+def backfill(start=None, end=None, echo=print):
+    """Rebuild the rollup for days in [start, end) from ``transactions``.
+
+    Each month is rebuilt in its own transaction so the raw table is never
+    locked for the whole range at once. Each also advances the transactions
+    version, so summary ETags computed before the rebuild stop matching.
+    """
+    if start is None or end is None:
+        with db.engine.connect() as conn:
+            lo, hi = conn.execute(select(func.min(_tx.c.day_key), func.max(_tx.c.day_key))).one()
+        if lo is None:
+            return 0
+        start = start or lo
+        end = end or hi + timedelta(days=1)
+
+    total = 0
+    for lo, hi in _month_chunks(start, end):
+        with db.engine.begin() as conn:
+            conn.execute(delete(_rollup).where(and_(_rollup.c.day >= lo, _rollup.c.day < hi)))
+            sel = (
+                select(
+                    _tx.c.day_key,
+                    func.coalesce(_tx.c.user_id, ""),
+                    func.coalesce(_tx.c.customer_id, 0),
+                    func.coalesce(_tx.c.bank_id, 0),
+                    func.coalesce(_tx.c.game_id, 0),
+                    _tx.c.type,
+                    _tx.c.currency,
+                    func.count(_tx.c.id),
+                    func.coalesce(func.sum(_tx.c.amount), 0),
+                )
+                .where(and_(_tx.c.day_key >= lo, _tx.c.day_key < hi))
+                .group_by(*[_tx.c[a] for a in KEY_ATTRS])
+            )
+            result = conn.execute(
+                insert(_rollup).from_select(list(KEY_COLUMNS) + ["tx_count", "amount_sum"], sel)
+            )
+            total += max(result.rowcount or 0, 0)
+            counters.bump(conn, "transactions", 0)
+        summary_cache.touch_range(lo, hi)
+        echo(f"{lo:%Y-%m-%d} .. {hi:%Y-%m-%d}: rebuilt")
+    return total
+
+
+def heal_missing_keys(echo=print):
+    """Stamp rows that have no ``day_key`` and rebuild the rollup for their days."""
+    from migrations.versions.m0001_transaction_report_keys import stamp_keys
+    with db.engine.connect() as conn:
+        days = sorted(stamp_keys(conn))
+    total, spans = 0, []
+    for day in days:
+        if spans and spans[-1][1] == day:
+            spans[-1][1] = day + timedelta(days=1)
+        else:
+            spans.append([day, day + timedelta(days=1)])
+    for lo, hi in spans:
+        total += backfill(lo, hi, echo=echo)
+    return len(days), total
+
+
+def _parse_day(value):
+    return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+
+
+@click.command("rollup-backfill")
+@click.option("--start", help="First day to rebuild (YYYY-MM-DD). Defaults to the oldest transaction.")
+@click.option("--end", help="Day after the last one to rebuild (YYYY-MM-DD). Defaults to after the newest.")
+@click.option("--missing-keys", is_flag=True,
+              help="Only stamp rows without date keys and rebuild their days (last deploy step).")
+@with_appcontext
+def backfill_command(start, end, missing_keys):
+    """Rebuild transaction_daily_rollup from the transactions table."""
+    if missing_keys:
+        days, rows = heal_missing_keys(echo=click.echo)
+        click.echo(f"{days} day(s) had rows without date keys; {rows} rollup row(s) written.")
+        return
+    rows = backfill(_parse_day(start), _parse_day(end), echo=click.echo)
+    click.echo(f"{rows} rollup row(s) written.")
+
+
+def init_app(app):
+    for name, fn in (("after_flush", _after_flush), ("after_commit", _after_commit),
+                     ("after_rollback", _after_rollback)):
+        if not event.contains(db.session, name, fn):
+            event.listen(db.session, name, fn)
+    app.cli.add_command(backfill_command)
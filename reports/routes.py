@@ -1,10 +1,11 @@
 # transactions/routes.py
-from flask import Blueprint, render_template, request, jsonify
-from flask_jwt_extended import jwt_required
-from sqlalchemy import func, and_
+from flask import Blueprint, render_template, request, jsonify, abort, Response, stream_with_context
+from auth.context import requires_login
 from datetime import datetime, timedelta
+import etags
 from extensions import db
-from models import Transaction, User  # and your Customer, Bank, Game models
+from reports import breakdown, export, summary_cache
+from models import User, TransactionDailyRollup, date_keys  # and your Customer, Bank, Game models
 
 reports_bp = Blueprint("reports", __name__, url_prefix="/reports")
 
@@ -14,8 +15,61 @@ def _parse_date(s, default=None):
     except Exception:
         return default
 
+def _parse_range():
+    """(start, end) from the query string; end is exclusive (day after ``end``)."""
+    start = _parse_date(request.args.get("start"), default=(datetime.utcnow() - timedelta(days=6)))
+    end   = _parse_date(request.args.get("end"),   default=datetime.utcnow())
+    # normalize end to inclusive end-of-day
+    return start, end + timedelta(days=1)
+
+_INT_FILTERS = ("customer_id", "bank_id", "game_id", "type")
+
+def _parse_filters():
+    """Optional equality filters shared by the summary and export endpoints.
+
+    Ids and ``type`` are parsed here, so bad input is a 400, not a 500.
+    """
+    filters = {"user_id": request.args.get("user_id") or None}
+    for name in _INT_FILTERS:
+        value = request.args.get(name) or None
+        if value is not None:
+            try:
+                value = int(value)
+            except ValueError:
+                abort(400, description=f"{name} must be an integer")
+        filters[name] = value
+    return filters
+
+def _filter_conds(cols, start, end, filters):
+    """WHERE clauses for ``filters`` over ``cols`` (logical name -> column).
+
+    ``start=None`` leaves out the day range, for callers that add their own.
+    """
+    conds = [] if start is None else [cols["day"] >= start.date(), cols["day"] < end.date()]
+    if filters["user_id"]:     conds.append(cols["user_id"] == filters["user_id"])
+    for name in _INT_FILTERS:
+        if filters[name] is not None:
+            conds.append(cols[name] == filters[name])
+    return conds
+
+def _bucket_key(period, day):
+    day_key, week_key, month_key = date_keys(day)
+    if period == "monthly":
+        return month_key
+    if period == "weekly":
+        return week_key
+    return day_key
+
+def _bucket_label(period, key):
+    """Display label for a stored bucket key: 2025-10-14, 2025-W05, 2025-10."""
+    if period == "monthly":
+        return f"{key // 100}-{key % 100:02d}"
+    if period == "weekly":
+        return f"{key // 100}-W{key % 100:02d}"
+    return key.strftime("%Y-%m-%d") if hasattr(key, "strftime") else str(key)
+
 @reports_bp.get("/report")
-@jwt_required()  # require login
+@requires_login
 def report_page():
     # Prefill dropdowns (optional; adjust to your models/fields)
     users = db.session.query(User.id, User.username).order_by(User.username).all()
@@ -33,7 +87,7 @@ def report_page():
     )
 
 @reports_bp.get("/api/summary")
-@jwt_required()
+@requires_login
 def api_summary():
     """
     Returns grouped totals by period with filters applied.
@@ -42,78 +96,89 @@ def api_summary():
       start=YYYY-MM-DD, end=YYYY-MM-DD
       period=daily|weekly|monthly (default=daily)
       user_id, customer_id, bank_id, game_id, type
-    """
-    period = (request.args.get("period") or "daily").lower()
-    start = _parse_date(request.args.get("start"), default=(datetime.utcnow() - timedelta(days=6)))
-    end   = _parse_date(request.args.get("end"),   default=datetime.utcnow())
-    # normalize end to inclusive end-of-day
-    end = end + timedelta(days=1)
-
-    user_id     = request.args.get("user_id") or None
-    customer_id = request.args.get("customer_id") or None
-    bank_id     = request.args.get("bank_id") or None
-    game_id     = request.args.get("game_id") or None
-    type    = request.args.get("type") or None
-
-    # Build filters
-    conds = [Transaction.created_at >= start, Transaction.created_at < end]
-    if user_id:     conds.append(Transaction.user_id == user_id)
-    if customer_id: conds.append(Transaction.customer_id == int(customer_id))
-    if bank_id:     conds.append(Transaction.bank_id == int(bank_id))
-    if game_id:     conds.append(Transaction.game_id == int(game_id))
-    if type:    conds.append(Transaction.type == type)
-
-    # MySQL-friendly group expressions
-    if period == "monthly":
-        # label like 2025-10
-        grp_label = func.date_format(Transaction.created_at, "%Y-%m")
-        order_key = func.date_format(Transaction.created_at, "%Y-%m-01")
-    elif period == "weekly":
-        # YEARWEEK with mode 1 (ISO weeks), label like 2025-W41
-        yw = func.yearweek(Transaction.created_at, 1)
-        grp_label = func.concat(func.year(Transaction.created_at), "-W", func.week(Transaction.created_at, 1))
-        order_key = yw
-    else:  # daily
-        grp_label = func.date(Transaction.created_at)             # 'YYYY-MM-DD'
-        order_key = func.date(Transaction.created_at)
-
-    q = (
-        db.session.query(
-            grp_label.label("bucket"),
-            func.count(Transaction.id).label("count"),
-            func.sum(Transaction.amount).label("amount"),
-        )
-        .filter(and_(*conds))
-        .group_by("bucket")
-        .order_by(order_key.asc())
-    )
+      group_by=currency,type,bank,game,customer,user (any, comma separated)
 
-    rows = q.all()
+    Bucket labels: daily ``2025-10-14``, monthly ``2025-10``, weekly the
+    ISO week with its ISO year and a zero-padded number, ``2025-W05``. Days
+    around New Year belong to the ISO year of their week: 2025-12-29 is in
+    ``2026-W01``. (Weekly labels used to be the calendar year plus MySQL's
+    ``WEEK(d, 1)``, e.g. ``2025-W5``, which could label one week twice.)
+    The page uses them only as category names for the chart and table.
 
-    # overall totals
-    tq = (
-        db.session.query(
-            func.count(Transaction.id), func.sum(Transaction.amount)
-        ).filter(and_(*conds))
-    ).first()
+    Each bucket row and the totals carry per-currency ``amounts``; with
+    ``group_by`` the response also has ``groups`` (per bucket and
+    dimension values) and ``subtotals`` (per dimension over the range).
+    See reports/breakdown.py; past buckets are cached, see
+    reports/summary_cache.py.
 
-    total_count = int(tq[0] or 0)
-    total_amount = float(tq[1] or 0.0)
+    The ETag covers the transactions version, the versions of the tables
+    the requested dimensions take their labels from (a renamed bank changes
+    the response), and the resolved range: without ``start``/``end`` the
+    window moves at midnight UTC.
+    """
+    period = (request.args.get("period") or "daily").lower()
+    start, end = _parse_range()
+    try:
+        dims = breakdown.parse_dimensions(request.args.getlist("group_by"))
+    except ValueError as e:
+        abort(400, description=str(e))
+    filters = _parse_filters()
+    etag, _ = etags.etag_for(["transactions", *summary_cache.label_tables(dims)],
+                             extra=(start.date(), end.date()))
+    unchanged = etags.not_modified(etag)
+    if unchanged is not None:
+        return unchanged
 
-    data = [
-        {
-            "bucket": r.bucket,
-            "count": int(r.count or 0),
-            "amount": float(r.amount or 0.0),
-        }
-        for r in rows
-    ]
+    # Answer from the daily rollup in one grouped query: its size depends on
+    # the length of the range and the dimensions, not on the number of
+    # transactions. Buckets, breakdowns and totals all come from that pass,
+    # and closed buckets come from the summary cache when they can.
+    R = TransactionDailyRollup
+    conds = _filter_conds(
+        {"day": R.day, "user_id": R.user_id, "customer_id": R.customer_id,
+         "bank_id": R.bank_id, "game_id": R.game_id, "type": R.type},
+        None, None, filters,
+    )
+    summary = summary_cache.summarize(
+        conds, dims, summary_cache.signature(filters, dims),
+        period, start.date(), end.date(),
+        bucket_key=lambda day: _bucket_key(period, day),
+        bucket_label=lambda key: _bucket_label(period, key),
+    )
+    totals = summary.pop("totals")
 
-    return jsonify({
+    return etags.stamp(jsonify({
         "period": period,
         "start": start.strftime("%Y-%m-%d"),
         "end":   (end - timedelta(days=1)).strftime("%Y-%m-%d"),
-        "total_count": total_count,
-        "total_amount": total_amount,
-        "rows": data
-    })
+        "total_count": totals["count"],
+        "total_amount": totals["amount"],
+        "total_amounts": totals["amounts"],
+        **summary,
+    }), etag)
+
+@reports_bp.get("/api/export")
+@requires_login
+def api_export():
+    """
+    Streams the raw transactions behind the summary.
+
+    Query params: same filters as /api/summary, plus format=csv|ndjson (default=csv)
+    """
+    fmt = (request.args.get("format") or "csv").lower()
+    if fmt not in ("csv", "ndjson"):
+        abort(400, description="format must be csv or ndjson")
+    start, end = _parse_range()
+    filters = _parse_filters()
+    stmt = export.build_query(_filter_conds(export.FILTER_COLUMNS, start, end, filters))
+
+    if fmt == "ndjson":
+        body, mimetype = export.iter_ndjson(stmt), "application/x-ndjson"
+    else:
+        body, mimetype = export.iter_csv(stmt), "text/csv"
+    filename = f"transactions_{start:%Y%m%d}_{(end - timedelta(days=1)):%Y%m%d}.{fmt}"
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,161 @@
+"""Per-bucket result cache for the transactions summary.
+
+A summary is a fold over buckets (days, ISO weeks or months). Once a
+bucket's last day is in the past its numbers only change if someone
+writes a back-dated transaction, so each closed bucket's partial result
+is cached with no timeout, keyed by (period, bucket, generation, filters,
+dimensions, clipped day range). Only the open bucket and the closed
+buckets that miss the cache are read from the rollup, each group in one
+query over its coalesced day ranges. Cache fills always read the primary
+(see replicas.py), never a possibly lagging replica.
+
+Precise invalidation works through generations. Every committed rollup
+change (see reports/rollup.py, bulk.py and backfill) calls ``touch`` with
+the days it changed. ``touch`` rotates the generation token of the daily,
+weekly and monthly bucket containing each day. Entries keyed on the old
+token are never read again and age out of the cache. Tokens are random
+rather than counters, so a token lost to eviction can't bring a stale
+entry back. Readers fetch tokens before querying, and tokens rotate only
+after commit, so a result computed from pre-commit data is never stored
+under the new token.
+
+Writes that bypass the app (manual SQL) rotate nothing; run
+``flask --app main rollup-backfill`` over the affected range after them.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_
+
+from counters import snapshot
+from extensions import cache
+from models import TransactionDailyRollup, date_keys
+import replicas
+from reports import breakdown
+
+R = TransactionDailyRollup
+PERIODS = ("daily", "weekly", "monthly")  # same order as date_keys()
+# dimensions whose labels come from another table, and that table
+LABEL_TABLES = {"bank": "banks", "game": "games", "customer": "customers", "user": "users"}
+
+
+def _period(period):
+    return period if period in PERIODS else "daily"
+
+
+def _gen_key(period, key):
+    return f"report:gen:{period}:{key}"
+
+
+def _token():
+    return os.urandom(8).hex()
+
+
+def touch(days):
+    """Invalidate every cached bucket containing one of ``days``."""
+    names = set()
+    for day in days:
+        if day is None:
+            continue
+        for period, key in zip(PERIODS, date_keys(day)):
+            names.add(_gen_key(period, key))
+    if names:
+        cache.set_many({name: _token() for name in names}, timeout=0)
+
+
+def touch_range(start, end):
+    """``touch`` every day in [start, end)."""
+    touch(start + timedelta(days=i) for i in range((end - start).days))
+
+
+def _generations(period, keys):
+    names = [_gen_key(period, k) for k in keys]
+    tokens = dict(zip(names, cache.get_many(*names))) if names else {}
+    for name, token in tokens.items():
+        if token is None:
+            cache.add(name, _token(), timeout=0)
+            tokens[name] = cache.get(name)
+    return [tokens[name] for name in names]
+
+
+def _spans(start, end, bucket_key):
+    """[(bucket, lo, hi)] covering the days [start, end), in order."""
+    spans = []
+    day = start
+    while day < end:
+        key = bucket_key(day)
+        if spans and spans[-1][0] == key:
+            spans[-1][2] = day + timedelta(days=1)
+        else:
+            spans.append([key, day, day + timedelta(days=1)])
+        day += timedelta(days=1)
+    return [tuple(s) for s in spans]
+
+
+def _ranges(spans):
+    """Coalesce adjacent spans into as few [lo, hi) day ranges as possible."""
+    ranges = []
+    for _, lo, hi in spans:
+        if ranges and ranges[-1][1] == lo:
+            ranges[-1][1] = hi
+        else:
+            ranges.append([lo, hi])
+    return ranges
+
+
+def _compute(conds, dims, spans, bucket_key):
+    days = or_(*(and_(R.day >= lo, R.day < hi) for lo, hi in _ranges(spans)))
+    return breakdown.by_bucket(breakdown.query_rows([*conds, days], dims), bucket_key)
+
+
+def label_tables(dims):
+    """Tables whose rows name the values of ``dims`` (renames change results)."""
+    return sorted({LABEL_TABLES[d] for d in dims if d in LABEL_TABLES})
+
+
+def signature(filters, dims):
+    """Digest of everything besides the bucket that shapes a cached result."""
+    versions = snapshot(label_tables(dims))
+    raw = json.dumps([sorted(filters.items()), dims, sorted((t, v[1]) for t, v in versions.items())], default=str)
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+
+def summarize(conds, dims, sig, period, start, end, bucket_key, bucket_label):
+    """``breakdown.summarize`` for days [start, end), reusing closed buckets.
+
+    ``conds`` are the filter clauses without a day range (this adds the
+    ranges it needs), ``sig`` is ``signature()`` of the filters they came
+    from.
+    """
+    period = _period(period)
+    today = datetime.utcnow().date()
+    spans = _spans(start, end, bucket_key)
+    closed = [s for s in spans if s[2] <= today]
+
+    entry_keys = {}
+    for (key, lo, hi), token in zip(closed, _generations(period, [s[0] for s in closed])):
+        entry_keys[key] = f"report:bucket:{period}:{key}:{token}:{sig}:{lo}:{hi}"
+
+    found, missing = {}, [s for s in spans if s[0] not in entry_keys]
+    if entry_keys:
+        for (key, lo, hi), value in zip(closed, cache.get_many(*entry_keys.values())):
+            if value is None:
+                missing.append((key, lo, hi))
+            else:
+                found[key] = value
+
+    # Closed buckets are stored for good, so they are computed on the primary:
+    # a lagging replica could miss a back-dated write whose token already rotated.
+    fill = sorted((s for s in missing if s[0] in entry_keys), key=lambda s: s[1])
+    if fill:
+        with replicas.using_primary():
+            computed = _compute(conds, dims, fill, bucket_key)
+        cache.set_many({entry_keys[key]: computed.get(key, []) for key, _, _ in fill}, timeout=0)
+        found.update(computed)
+    open_spans = sorted((s for s in missing if s[0] not in entry_keys), key=lambda s: s[1])
+    if open_spans:
+        found.update(_compute(conds, dims, open_spans, bucket_key))
+
+    return breakdown.fold(found, dims, bucket_label)
@@ -0,0 +1,82 @@
+"""Index-backed search for the /api tables.
+
+On MySQL, customer/game/bank names (and customer acc_id) are matched through
+FULLTEXT indexes built with the ngram parser, so infix search is an index
+lookup instead of ``LIKE '%term%'`` over every row. The indexes are built
+with InnoDB stopwords off (see migrations 0003 and 0007); with the default
+list, every ngram containing "a" or "i" would be missing, and phrase
+searches would skip rows that ILIKE finds. Other dialects (SQLite for local
+runs) fall back to ILIKE.
+
+Transactions are searched without touching their text: the term is resolved
+to matching customer/bank/game ids through the small tables' indexes, and the
+transactions are then filtered by those ids (covered by the ``*_day``
+composite indexes) or by a ``bank_stor`` prefix on its own index.
+"""
+from sqlalchemy import or_, select
+from sqlalchemy.dialects.mysql import match
+
+from extensions import db
+from models import User, Customer, Game, Bank, Transaction
+
+MIN_NGRAM = 2         # MySQL's default ngram_token_size
+ID_LIST_CAP = 5000    # beyond this many matching ids, use a subquery instead
+
+
+def _is_mysql():
+    return db.session.get_bind().dialect.name in ("mysql", "mariadb")
+
+
+def _escape_like(term):
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def text_match(columns, term):
+    """Clause matching ``term`` anywhere in ``columns``."""
+    if _is_mysql() and len(term) >= MIN_NGRAM:
+        # A quoted phrase makes the ngram parser require the n-grams in order
+        phrase = '"%s"' % term.replace('"', " ")
+        return match(*columns, against=phrase).in_boolean_mode()
+    like = f"%{_escape_like(term)}%"
+    return or_(*[c.ilike(like, escape="\\") for c in columns])
+
+
+def prefix_match(column, term):
+    return column.like(f"{_escape_like(term)}%", escape="\\")
+
+
+def customers(term):
+    return text_match([Customer.name, Customer.acc_id], term)
+
+
+def games(term):
+    return text_match([Game.name], term)
+
+
+def banks(term):
+    return text_match([Bank.name], term)
+
+
+def users(term):
+    return User.username.ilike(f"%{_escape_like(term)}%", escape="\\")
+
+
+def _matching_ids(model, clause):
+    ids = db.session.execute(select(model.id).where(clause).limit(ID_LIST_CAP + 1)).scalars().all()
+    if len(ids) > ID_LIST_CAP:
+        return select(model.id).where(clause)
+    return ids
+
+
+def transactions(term):
+    conds = [prefix_match(Transaction.bank_stor, term)]
+    for fk, model, matcher in (
+        (Transaction.customer_id, Customer, customers),
+        (Transaction.bank_id, Bank, banks),
+        (Transaction.game_id, Game, games),
+    ):
+        ids = _matching_ids(model, matcher(term))
+        if isinstance(ids, list) and not ids:
+            continue
+        conds.append(fk.in_(ids))
+    return or_(*conds)
@@ -0,0 +1,37 @@
+// DataTables ajax source that revalidates with ETags.
+//
+// The /api tables answer If-None-Match with 304 when nothing changed. The
+// browser's own cache can't use that because every DataTables request has
+// a new `draw` in its URL, so we keep the last body per query (minus draw)
+// here, send its ETag, and replay it with the current draw on a 304.
+window.dtConditionalAjax = function (url, onError) {
+  const MAX_ENTRIES = 50;
+  const cache = new Map();  // query without draw -> {etag, json}
+
+  return function (data, callback) {
+    const key = $.param(Object.assign({}, data, { draw: 0 }));
+    const hit = cache.get(key);
+    $.ajax({
+      url: url,
+      type: "GET",
+      data: data,
+      dataType: "json",
+      cache: true,
+      headers: hit ? { "If-None-Match": hit.etag } : {},
+      success: function (json, status, xhr) {
+        if (xhr.status === 304 && hit) {
+          callback(Object.assign({}, hit.json, { draw: data.draw }));
+          return;
+        }
+        const etag = xhr.getResponseHeader("ETag");
+        if (etag) {
+          cache.delete(key);
+          cache.set(key, { etag: etag, json: json });
+          if (cache.size > MAX_ENTRIES) cache.delete(cache.keys().next().value);
+        }
+        callback(json);
+      },
+      error: onError
+    });
+  };
+};
@@ -0,0 +1,65 @@
+"""Shared fixtures: the app on a scratch SQLite database built by db-upgrade.
+
+config.py reads its settings at import, so the fixture points the paths at
+a temporary directory before ``main`` is imported. Test modules must not
+import ``main`` themselves.
+"""
+from datetime import datetime
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from extensions import db
+from models import Bank, Customer, Game, Transaction
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("app")
+    import config
+    config.Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp / 'app.sqlite'}"
+    config.Config.SQLALCHEMY_REPLICA_URIS = []
+    config.Config.CACHE_DIR = str(tmp / "cache")
+    config.Config.METRICS_DIR = str(tmp / "metrics")
+    config.Config.JINJA_CACHE_DIR = str(tmp / "jinja")
+    config.Config.DB_POOL_WARMUP = 0
+    config.Config.TESTING = True
+    config.Config.JWT_SECRET_KEY = "test-" + "x" * 32
+
+    import main
+    import migrations
+    with main.app.app_context():
+        migrations.upgrade(db.engine, echo=lambda msg: None)
+    return main.app
+
+
+@pytest.fixture
+def client(app):
+    """A test client logged in as an admin."""
+    c = app.test_client()
+    with app.app_context():
+        token = create_access_token(identity="1", additional_claims={"username": "admin", "is_admin": True})
+    c.set_cookie("access_token_cookie", token)
+    return c
+
+
+@pytest.fixture(scope="session")
+def refs(app):
+    """Ids of one customer, bank and game for transactions to point at."""
+    with app.app_context():
+        customer = Customer(name="Alice", acc_id="A-1", user_id="1", created_by="admin", updated_by="admin")
+        bank = Bank(name="First Bank", user_id="1", created_by="admin", updated_by="admin")
+        game = Game(name="Poker", user_id="1", created_by="admin", updated_by="admin")
+        db.session.add_all([customer, bank, game])
+        db.session.commit()
+        return {"customer_id": customer.id, "bank_id": bank.id, "game_id": game.id}
+
+
+def make_transaction(refs, **values):
+    """An unsaved Transaction with defaults for every required column."""
+    values = {
+        "amount": 10.0, "currency": "USD", "bank_stor": "A", "type": 1, "user_id": "1",
+        "created_by": "admin", "updated_by": "admin", "created_at": datetime(2026, 3, 2, 12, 0),
+        **refs, **values,
+    }
+    return Transaction(**values)
@@ -0,0 +1,23 @@
+"""Static bundles come from the vendored files, never from the CDN."""
+import click
+import pytest
+
+import assets
+
+
+def test_build_needs_every_vendored_file(tmp_path):
+    (tmp_path / "styles.css").write_text("body { margin: 0 }")
+    (tmp_path / "datatables-conditional.js").write_text("")
+    with pytest.raises(click.ClickException) as e:
+        assets.build(str(tmp_path), echo=lambda msg: None)
+    # fonts referenced by stylesheets count too
+    assert "vendor/bootstrap-icons/fonts/bootstrap-icons.woff2" in str(e.value)
+    assert not (tmp_path / "dist").exists()
+
+
+def test_unbuilt_bundles_load_local_files(app, monkeypatch):
+    monkeypatch.setitem(app.extensions, "assets", {})
+    with app.test_request_context():
+        for bundle, sources in assets.BUNDLES.items():
+            urls = assets.asset_urls(bundle)
+            assert urls == [f"/static/{path}" for path in sources]
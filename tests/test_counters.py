@@ -0,0 +1,65 @@
+"""row_counters stays in step with the tables it counts."""
+from sqlalchemy import insert
+
+import counters
+from conftest import make_transaction
+from extensions import db
+from models import Transaction
+
+
+def assert_counted(app):
+    with app.app_context():
+        db.session.expire_all()
+        assert counters.get_count("transactions") == Transaction.query.count()
+        # a recount finds nothing to fix (None: a counter nobody has read yet)
+        assert all(old in (None, new) for old, new in counters.reconcile().values())
+
+
+def test_create_update_delete(app, refs, client):
+    with app.app_context():
+        before = counters.snapshot(["transactions"])["transactions"]
+    resp = client.post("/manage/transactions/create", data={
+        "amount": "12.5", "bank_stor": "B", "currency": "KHR", "type": "2", **refs,
+    })
+    assert resp.status_code == 302
+    assert_counted(app)
+
+    with app.app_context():
+        after_create = counters.snapshot(["transactions"])["transactions"]
+        tid = db.session.query(db.func.max(Transaction.id)).scalar()
+    assert after_create[0] == before[0] + 1
+    assert after_create[1] > before[1]
+
+    resp = client.post(f"/manage/transactions/{tid}/update", data={"amount": "20"})
+    assert resp.status_code == 302
+    with app.app_context():
+        after_update = counters.snapshot(["transactions"])["transactions"]
+    # an update keeps the total but still moves the version
+    assert after_update[0] == after_create[0]
+    assert after_update[1] > after_create[1]
+
+    resp = client.post(f"/manage/transactions/{tid}/delete")
+    assert resp.status_code == 302
+    assert_counted(app)
+
+
+def test_rolled_back_write_changes_nothing(app, refs):
+    with app.app_context():
+        before = counters.snapshot(["transactions"])["transactions"]
+        db.session.add(make_transaction(refs, amount=99.0))
+        db.session.flush()
+        db.session.rollback()
+        assert counters.snapshot(["transactions"])["transactions"] == before
+    assert_counted(app)
+
+
+def test_reconcile_heals_raw_inserts(app, refs):
+    with app.app_context():
+        counters.get_count("transactions")
+        with db.engine.begin() as conn:
+            conn.execute(insert(Transaction.__table__).values(
+                amount=1.0, currency="USD", type=1, user_id="1", created_by="sql", updated_by="sql", **refs,
+            ))
+        old, new = counters.reconcile(["transactions"])["transactions"]
+        assert new == old + 1
+    assert_counted(app)
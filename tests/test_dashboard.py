@@ -0,0 +1,25 @@
+"""The dashboard's latest bookings load only the columns they show."""
+from sqlalchemy import event
+
+from booking import routes
+from conftest import make_transaction
+from extensions import db
+
+
+def test_latest_transactions_skip_joins(app, refs, client):
+    with app.app_context():
+        db.session.add(make_transaction(refs))
+        db.session.commit()
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            rows = routes._latest_transactions("test-no-joins")
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+    assert statements and not any("JOIN" in s.upper() for s in statements)
+    assert 0 < len(rows) <= routes.LATEST_LIMIT
+    assert set(rows[0]) == {"id", "amount", "currency", "bank_stor", "type", "created_by"}
+
+    resp = client.get("/dashboard")
+    assert resp.status_code == 200
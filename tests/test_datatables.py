@@ -0,0 +1,104 @@
+"""Keyset paging in api/datatables.py must return exactly what OFFSET does."""
+import pytest
+
+from api import datatables
+from conftest import make_transaction
+from extensions import db
+from tiercache import LRU
+
+# column indexes in api.routes.TRANSACTIONS
+AMOUNT, BANK_STOR, CREATED_AT = 1, 3, 10
+
+
+@pytest.fixture(scope="module")
+def transactions(app, refs):
+    """Ties and NULLs in bank_stor, ties in amount."""
+    with app.app_context():
+        db.session.add_all(
+            make_transaction(refs, amount=float(i % 5), bank_stor=None if i % 4 == 0 else "ABCDE"[i % 5])
+            for i in range(60)
+        )
+        db.session.commit()
+
+
+@pytest.fixture
+def seeks(monkeypatch):
+    """Count the pages answered by seeking from a cursor."""
+    calls = []
+    seek = datatables._seek
+
+    def counting(*args):
+        calls.append(args[2])
+        return seek(*args)
+
+    monkeypatch.setattr(datatables, "_seek", counting)
+    monkeypatch.setattr(datatables, "_cursors", LRU(datatables.CURSOR_ITEMS))
+    return calls
+
+
+def ids(client, column, direction, start, length):
+    resp = client.get("/api/transactions", query_string={
+        "draw": 1, "start": start, "length": length, "format": "array",
+        "order[0][column]": column, "order[0][dir]": direction,
+    })
+    assert resp.status_code == 200
+    return [row[0] for row in resp.get_json()["data"]]
+
+
+@pytest.mark.parametrize("column", [AMOUNT, BANK_STOR, CREATED_AT])
+@pytest.mark.parametrize("direction", ["asc", "desc"])
+def test_forward_pages_match_offset(client, transactions, seeks, column, direction):
+    full = ids(client, column, direction, 0, -1)
+    pages = [ids(client, column, direction, start, 7) for start in range(0, len(full), 7)]
+    assert sum(pages, []) == full
+    assert len(seeks) == len(pages) - 1
+
+
+@pytest.mark.parametrize("column", [AMOUNT, BANK_STOR])
+@pytest.mark.parametrize("direction", ["asc", "desc"])
+def test_backward_pages_match_offset(client, transactions, seeks, column, direction):
+    full = ids(client, column, direction, 0, -1)
+    last = (len(full) - 1) // 7 * 7
+    pages = [ids(client, column, direction, start, 7) for start in range(last, -1, -7)]
+    assert sum(reversed(pages), []) == full
+    # the jump to the last page has no cursor and page 0 needs none
+    assert len(seeks) == len(pages) - 2
+
+
+def test_null_boundary(client, transactions, seeks):
+    """Pages that start or end on a NULL seek across the NULL/value edge."""
+    full = ids(client, BANK_STOR, "asc", 0, -1)
+    nulls = db_nulls(client, full)
+    assert 0 < nulls < len(full)
+    for length in (nulls - 1, nulls, nulls + 1):
+        pages = [ids(client, BANK_STOR, "asc", start, length) for start in range(0, len(full), length)]
+        assert sum(pages, []) == full
+
+
+def db_nulls(client, full):
+    resp = client.get("/api/transactions", query_string={
+        "start": 0, "length": -1, "order[0][column]": BANK_STOR, "order[0][dir]": "asc",
+    })
+    rows = resp.get_json()["data"]
+    assert [r["id"] for r in rows] == full
+    return sum(1 for r in rows if r["bank_stor"] is None)
+
+
+def test_insert_between_pages(app, refs, client, transactions, seeks):
+    """A row inserted ahead of the cursor shifts every later page by one."""
+    first = ids(client, BANK_STOR, "desc", 0, 7)
+    second = ids(client, BANK_STOR, "desc", 7, 7)
+    with app.app_context():
+        # highest bank_stor and highest id: the new first row
+        row = make_transaction(refs, bank_stor="E")
+        db.session.add(row)
+        db.session.commit()
+        new_id = row.id
+    seeks.clear()
+    third = ids(client, BANK_STOR, "desc", 14, 7)
+    full = ids(client, BANK_STOR, "desc", 0, -1)
+    assert full[0] == new_id
+    assert full[1:15] == first + second
+    # seeking from the old page-2 cursor would skip full[14]
+    assert third == full[14:21]
+    assert seeks == []
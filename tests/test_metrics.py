@@ -0,0 +1,33 @@
+"""Only processes serving real traffic leave a metrics file behind."""
+import os
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def exits(monkeypatch):
+    registered = []
+    monkeypatch.setattr(metrics.atexit, "register", lambda fn, *args: registered.append(args))
+    monkeypatch.setattr(metrics, "_exit_flush_pid", None)
+    return registered
+
+
+def files(app):
+    return os.listdir(app.config["METRICS_DIR"])
+
+
+def test_test_requests_write_nothing(app, client, exits):
+    before = files(app)
+    client.get("/auth/login")
+    assert exits == []
+    assert files(app) == before
+
+
+def test_served_requests_flush_at_exit(app, client, exits, monkeypatch):
+    monkeypatch.setitem(app.config, "TESTING", False)
+    client.get("/auth/login")
+    client.get("/auth/login")
+    assert exits == [(app.config["METRICS_DIR"],)]
+    assert f"{os.getpid()}.json" in files(app)
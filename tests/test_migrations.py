@@ -0,0 +1,24 @@
+"""The migration chain builds the models' schema on an empty database."""
+from sqlalchemy import create_engine, inspect, select
+
+import migrations
+from extensions import db
+from models import User
+
+
+def test_fresh_database(app, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.sqlite'}")
+    versions = [m.version for m in migrations.discover()]
+    assert versions == list(range(len(versions)))
+
+    with app.app_context():
+        assert migrations.upgrade(engine, echo=lambda msg: None) == versions
+        assert migrations.upgrade(engine, echo=lambda msg: None) == []
+
+    schema = inspect(engine)
+    for table in db.metadata.sorted_tables:
+        columns = {c["name"] for c in schema.get_columns(table.name)}
+        assert columns == set(table.columns.keys()), table.name
+    with engine.connect() as conn:
+        assert conn.execute(select(User.username)).scalars().all() == ["admin"]
+    engine.dispose()
@@ -0,0 +1,36 @@
+"""The SQL profiler is opt-in and only shows Server-Timing to admins."""
+import pytest
+from flask_jwt_extended import create_access_token
+
+
+@pytest.fixture
+def sampled(app, monkeypatch):
+    monkeypatch.setitem(app.config, "SQL_PROFILE_SAMPLE_RATE", 1.0)
+
+
+def client_as(app, is_admin):
+    c = app.test_client()
+    with app.app_context():
+        token = create_access_token(identity="2", additional_claims={"username": "clerk", "is_admin": is_admin})
+    c.set_cookie("access_token_cookie", token)
+    return c
+
+
+def test_off_by_default(app, client):
+    assert app.config["SQL_PROFILE_SAMPLE_RATE"] == 0
+    assert "Server-Timing" not in client.get("/api/banks").headers
+
+
+def test_admins_see_server_timing(client, sampled):
+    timing = client.get("/api/banks").headers["Server-Timing"]
+    assert "queries" in timing
+
+
+def test_others_do_not(app, sampled):
+    assert "Server-Timing" not in client_as(app, is_admin=False).get("/api/banks").headers
+    assert "Server-Timing" not in app.test_client().get("/auth/login").headers
+
+
+def test_debug_shows_it_to_everyone(app, sampled, monkeypatch):
+    monkeypatch.setattr(app, "debug", True)
+    assert "Server-Timing" in app.test_client().get("/auth/login").headers
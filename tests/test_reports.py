@@ -0,0 +1,45 @@
+"""Report endpoint input handling and bucket labels."""
+from datetime import datetime
+
+import pytest
+
+from conftest import make_transaction
+from extensions import db
+
+
+@pytest.mark.parametrize("url", ["/reports/api/summary", "/reports/api/export"])
+@pytest.mark.parametrize("name", ["customer_id", "bank_id", "game_id", "type"])
+def test_non_numeric_filter_is_rejected(client, url, name):
+    resp = client.get(url, query_string={name: "abc"})
+    assert resp.status_code == 400
+    assert name in resp.get_data(as_text=True)
+
+
+def test_numeric_filters_apply(app, refs, client):
+    resp = client.get("/reports/api/summary", query_string={
+        "start": "2026-03-01", "end": "2026-03-31", "type": "1", "bank_id": str(refs["bank_id"]),
+    })
+    assert resp.status_code == 200
+    assert client.get("/reports/api/summary", query_string={
+        "start": "2026-03-01", "end": "2026-03-31", "type": "1", "bank_id": str(refs["bank_id"] + 999),
+    }).get_json()["total_count"] == 0
+    resp = client.get("/reports/api/export", query_string={"type": "1", "format": "ndjson"})
+    assert resp.status_code == 200
+
+
+def test_weekly_labels_use_the_iso_year(app, refs, client):
+    with app.app_context():
+        db.session.add_all([
+            make_transaction(refs, created_at=datetime(2025, 12, 30, 10, 0)),
+            make_transaction(refs, created_at=datetime(2026, 1, 2, 10, 0)),
+            make_transaction(refs, created_at=datetime(2026, 2, 3, 10, 0)),
+        ])
+        db.session.commit()
+    rows = client.get("/reports/api/summary", query_string={
+        "period": "weekly", "start": "2025-12-29", "end": "2026-02-08",
+    }).get_json()["rows"]
+    by_label = {r["bucket"]: r["count"] for r in rows}
+    # one ISO week across New Year, one label
+    assert by_label["2026-W01"] == 2
+    assert by_label["2026-W06"] == 1
+    assert all(not label.startswith("2025") for label in by_label)
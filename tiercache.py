@@ -0,0 +1,351 @@
+"""Two-tier cache backend for ``extensions.cache``.
+
+``CACHE_TYPE = "tiercache.TieredCache"`` gives every worker process:
+
+* **L1**: an in-process LRU of at most ``CACHE_THRESHOLD`` entries. A hit
+  costs a dict lookup and an unpickle. Entries live for at most
+  ``CACHE_L1_TTL`` seconds, however long their real timeout is.
+* **L2**: a store shared by all workers on the host. The default is a SQLite
+  database in WAL mode under ``CACHE_DIR`` (readers never block the writer),
+  capped at ``CACHE_L2_MAX_BYTES``; least recently used entries are evicted
+  past that. With ``CACHE_L2 = "redis"`` it is a Redis-compatible server at
+  ``CACHE_REDIS_URL`` instead (bound its memory with ``maxmemory`` and an
+  ``allkeys-lru`` policy there).
+
+Writes go to L2 first and then L1. Every ``set``/``delete``/``clear`` is
+also appended to an invalidation log in L2. At most every
+``CACHE_SYNC_INTERVAL`` seconds each worker reads the entries it hasn't seen
+yet and drops those keys from its L1. A value changed by one worker is
+therefore visible to the others within that interval. A worker that fell
+behind the log's retention drops its whole L1.
+
+Values are pickled, as with the stock backends, so callers can't mutate what
+is cached.
+
+Under asgi.py every L2 call goes through ``offload.run``, so the SQLite or
+Redis round trip happens on the loop's thread pool instead of the loop.
+
+``on_lookup``, if set, is called with True (hit) or False (miss) for every
+``get``. That covers ``get_many`` and the ``cached``/``memoize`` decorators
+too, and a stored ``None`` counts as a hit. metrics.py hooks it.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask_caching.backends.base import BaseCache
+
+import offload
+
+_CLEAR_ALL = "*"
+LOG_RETENTION = 300  # seconds an invalidation stays in the log; must exceed CACHE_L1_TTL
+LOG_BATCH = 10000
+
+
+class LRU:
+    """Thread-safe in-process LRU of key -> (expires_at, pickled value)."""
+
+    def __init__(self, max_items):
+        self.max_items = max_items
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, now):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[0] and item[0] <= now:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item[1]
+
+    def set(self, key, blob, expires_at):
+        with self._lock:
+            self._data[key] = (expires_at, blob)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def discard(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteStore:
+    """L2 on local disk: a WAL-mode SQLite file shared by all workers."""
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY, value BLOB NOT NULL,
+                expires REAL NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS ix_entries_accessed ON entries (accessed);
+            CREATE TABLE IF NOT EXISTS invalidations (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, origin INTEGER NOT NULL, at REAL NOT NULL);
+        """)
+
+    def _conn(self):
+        # one connection per thread, and never one inherited across fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key, now):
+        row = self._conn().execute(
+            "SELECT value, expires, accessed FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or (row[1] and row[1] <= now):
+            return None, 0
+        if now - row[2] > 30:
+            # coarse LRU: refresh the access time at most every 30s per entry
+            self._conn().execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        return row[0], row[1]
+
+    def set(self, key, blob, expires_at, now, only_if_missing=False):
+        conn = self._conn()
+        if only_if_missing:
+            # an expired entry doesn't count as present
+            conn.execute("DELETE FROM entries WHERE key = ? AND expires > 0 AND expires <= ?", (key, now))
+            verb = "INSERT OR IGNORE"
+        else:
+            verb = "INSERT OR REPLACE"
+        cur = conn.execute(
+            f"{verb} INTO entries (key, value, expires, size, accessed) VALUES (?, ?, ?, ?, ?)",
+            (key, blob, expires_at, len(blob) + len(key), now),
+        )
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self.evict(now)
+        return cur.rowcount > 0
+
+    def delete(self, key):
+        return self._conn().execute("DELETE FROM entries WHERE key = ?", (key,)).rowcount > 0
+
+    def clear(self):
+        self._conn().execute("DELETE FROM entries")
+
+    def evict(self, now):
+        conn = self._conn()
+        conn.execute("DELETE FROM entries WHERE expires > 0 AND expires <= ?", (now,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # drop least recently used entries until 10% under the cap
+        excess = total - int(self.max_bytes * 0.9)
+        freed = 0
+        stale = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ?", stale)
+
+    def publish(self, key, now):
+        conn = self._conn()
+        seq = conn.execute(
+            "INSERT INTO invalidations (key, origin, at) VALUES (?, ?, ?)", (key, os.getpid(), now)
+        ).lastrowid
+        if seq % 100 == 0:
+            conn.execute("DELETE FROM invalidations WHERE at < ?", (now - LOG_RETENTION,))
+
+    def changes(self, since):
+        """(keys changed by other processes after ``since``, newest seq, whether ``since`` was pruned)."""
+        conn = self._conn()
+        rows = conn.execute(
+            "SELECT seq, key, origin FROM invalidations WHERE seq > ? ORDER BY seq LIMIT ?", (since, LOG_BATCH)
+        ).fetchall()
+        oldest = conn.execute("SELECT MIN(seq) FROM invalidations").fetchone()[0]
+        # rows we never saw were pruned, or there are more than one batch
+        gap = (oldest is not None and oldest > since + 1) or len(rows) >= LOG_BATCH
+        pid = os.getpid()
+        keys = [key for _, key, origin in rows if origin != pid]
+        newest = rows[-1][0] if rows else since
+        return keys, newest, gap
+
+    def latest(self):
+        return self._conn().execute("SELECT COALESCE(MAX(seq), 0) FROM invalidations").fetchone()[0]
+
+
+class RedisStore:
+    """L2 on a Redis-compatible server. Invalidations go through a capped stream."""
+
+    def __init__(self, url, prefix="tiercache:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_L2 = 'redis' needs the redis package (pip install redis)")
+        self._redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.stream = prefix + "invalidations"
+
+    def get(self, key, now):
+        pipe = self._redis.pipeline()
+        pipe.get(self.prefix + key)
+        pipe.pttl(self.prefix + key)
+        blob, pttl = pipe.execute()
+        if blob is None:
+            return None, 0
+        return blob, (now + pttl / 1000.0) if pttl and pttl > 0 else 0
+
+    def set(self, key, blob, expires_at, now, only_if_missing=False):
+        ttl = max(expires_at - now, 0.001) if expires_at else None
+        return bool(self._redis.set(self.prefix + key, blob, px=int(ttl * 1000) if ttl else None, nx=only_if_missing))
+
+    def delete(self, key):
+        return bool(self._redis.delete(self.prefix + key))
+
+    def clear(self):
+        keys = [k for k in self._redis.scan_iter(match=self.prefix + "*") if k != self.stream.encode()]
+        for i in range(0, len(keys), 500):
+            self._redis.delete(*keys[i:i + 500])
+
+    def evict(self, now):
+        pass  # the server's maxmemory policy does this
+
+    def publish(self, key, now):
+        self._redis.xadd(self.stream, {"key": key, "origin": os.getpid()}, maxlen=LOG_BATCH, approximate=True)
+
+    def changes(self, since):
+        # "(" makes the start exclusive (Redis >= 6.2)
+        entries = self._redis.xrange(self.stream, min=f"({since}", count=LOG_BATCH)
+        pid = str(os.getpid()).encode()
+        keys = [f[b"key"].decode() for _, f in entries if f.get(b"origin") != pid]
+        newest = entries[-1][0].decode() if entries else since
+        # a full batch means we may be behind the capped stream
+        return keys, newest, len(entries) >= LOG_BATCH
+
+    def latest(self):
+        last = self._redis.xrevrange(self.stream, count=1)
+        return last[0][0].decode() if last else "0-0"
+
+
+class TieredCache(BaseCache):
+    def __init__(self, l2, l1_max_items=5000, l1_ttl=30, sync_interval=0.5, default_timeout=300, **kwargs):
+        super().__init__(default_timeout=default_timeout, **kwargs)
+        self.l1 = LRU(l1_max_items)
+        self.l2 = l2
+        self.l1_ttl = l1_ttl
+        self.sync_interval = sync_interval
+        self._sync_lock = threading.Lock()
+        self._seen = l2.latest()
+        self._last_sync = time.monotonic()
+        self.on_lookup = None  # callable(hit: bool)
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        if config.get("CACHE_L2", "sqlite") == "redis":
+            l2 = RedisStore(config["CACHE_REDIS_URL"], config.get("CACHE_KEY_PREFIX") or "tiercache:")
+        else:
+            path = config.get("CACHE_L2_PATH") or os.path.join(config["CACHE_DIR"], "tiercache.sqlite")
+            l2 = SQLiteStore(path, config.get("CACHE_L2_MAX_BYTES", 256 * 1024 * 1024))
+        kwargs.update(
+            l1_max_items=config["CACHE_THRESHOLD"],
+            l1_ttl=config.get("CACHE_L1_TTL", 30),
+            sync_interval=config.get("CACHE_SYNC_INTERVAL", 0.5),
+        )
+        return cls(l2, *args, **kwargs)
+
+    def _sync(self):
+        if time.monotonic() - self._last_sync < self.sync_interval:
+            return
+        if not self._sync_lock.acquire(blocking=False):
+            return  # another thread is already syncing
+        try:
+            keys, self._seen, gap = offload.run(self.l2.changes, self._seen)
+            if gap or _CLEAR_ALL in keys:
+                self.l1.clear()
+            elif keys:
+                self.l1.discard(keys)
+            self._last_sync = time.monotonic()
+        finally:
+            self._sync_lock.release()
+
+    def _expires_at(self, timeout, now):
+        timeout = self._normalize_timeout(timeout)
+        return now + timeout if timeout else 0
+
+    def _l1_set(self, key, blob, expires_at, now):
+        l1_expires = now + self.l1_ttl
+        if expires_at:
+            l1_expires = min(l1_expires, expires_at)
+        self.l1.set(key, blob, l1_expires)
+
+    # L2 write plus its invalidation, as one call for offload.run
+    def _l2_set(self, key, blob, expires_at, now, only_if_missing=False):
+        if not self.l2.set(key, blob, expires_at, now, only_if_missing=only_if_missing):
+            return False
+        self.l2.publish(key, now)
+        return True
+
+    def _l2_delete(self, key):
+        if key is None:
+            self.l2.clear()
+            self.l2.publish(_CLEAR_ALL, time.time())
+            return True
+        existed = self.l2.delete(key)
+        self.l2.publish(key, time.time())
+        return existed
+
+    def get(self, key):
+        self._sync()
+        now = time.time()
+        blob = self.l1.get(key, now)
+        if blob is None:
+            blob, expires_at = offload.run(self.l2.get, key, now)
+            if blob is not None:
+                self._l1_set(key, blob, expires_at, now)
+        if self.on_lookup is not None:
+            self.on_lookup(blob is not None)
+        return None if blob is None else pickle.loads(blob)
+
+    def has(self, key):
+        self._sync()
+        now = time.time()
+        return self.l1.get(key, now) is not None or offload.run(self.l2.get, key, now)[0] is not None
+
+    def set(self, key, value, timeout=None):
+        now = time.time()
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires_at = self._expires_at(timeout, now)
+        offload.run(self._l2_set, key, blob, expires_at, now)
+        self._l1_set(key, blob, expires_at, now)
+        return True
+
+    def add(self, key, value, timeout=None):
+        now = time.time()
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires_at = self._expires_at(timeout, now)
+        if not offload.run(self._l2_set, key, blob, expires_at, now, only_if_missing=True):
+            return False
+        self._l1_set(key, blob, expires_at, now)
+        return True
+
+    def delete(self, key):
+        self.l1.discard([key])
+        return offload.run(self._l2_delete, key)
+
+    def clear(self):
+        self.l1.clear()
+        offload.run(self._l2_delete, None)
+        return True
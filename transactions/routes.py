@@ -1,34 +1,15 @@
-from functools import wraps
+import io
 
-from flask import Blueprint, url_for, redirect, render_template, request, flash
-from flask_jwt_extended import verify_jwt_in_request, get_jwt, get_jwt_identity
+from flask import Blueprint, url_for, redirect, render_template, request, flash, jsonify
+from flask_jwt_extended import get_jwt, get_jwt_identity
 
+import bulk
+from auth.context import jwt_required_or_login, login_required, admin_required
 from extensions import db
 from models import Transaction
 
 transactions_bp = Blueprint("transactions", __name__, url_prefix="")
 
-def jwt_required_or_login(fn):
-    @wraps(fn)
-    def wrapper(*args, **kwargs):
-        try:
-            verify_jwt_in_request()  # checks cookies/headers per your config
-        except Exception:
-            return redirect(url_for("auth.login_page"))
-        return fn(*args, **kwargs)
-    return wrapper
-
-def login_required():
-    # raises if invalid; returns None otherwise
-    verify_jwt_in_request(optional=False)
-
-def admin_required():
-    login_required()
-    claims = get_jwt()
-    if not claims.get("is_admin", False):
-        from flask import abort
-        abort(403, description="Admins only")
-
 @transactions_bp.get("/manage/transactions")
 def list_transactions():
     login_required()
@@ -37,7 +18,6 @@ def list_transactions():
 @transactions_bp.post("/manage/transactions/create")
 @jwt_required_or_login
 def create_transaction():
-    login_required()
     user_id = get_jwt_identity()
     username = get_jwt().get("username")
     form = request.form
@@ -93,4 +73,15 @@ def delete_transaction(transaction_id: int):
     except Exception as e:
         db.session.rollback()
         flash(f"Error deleting transaction: {e}", "danger")
-    return redirect(url_for("transactions.list_transactions"))
\ No newline at end of file
+    return redirect(url_for("transactions.list_transactions"))
+
+@transactions_bp.post("/manage/transactions/import")
+def import_transactions():
+    """Bulk import from an uploaded CSV (multipart field ``file``); returns a JSON report."""
+    admin_required()
+    upload = request.files.get("file")
+    if not upload:
+        return jsonify({"msg": "CSV file is required (field 'file')."}), 400
+    stream = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+    report = bulk.run_import("transactions", stream, get_jwt_identity(), get_jwt().get("username"))
+    return jsonify(report.to_dict())
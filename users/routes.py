@@ -1,19 +1,13 @@
 from datetime import datetime
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
-from flask_jwt_extended import verify_jwt_in_request, get_jwt
+from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask_jwt_extended import get_jwt_identity
+from auth.context import admin_required
 from extensions import db
 from models import User
-from werkzeug.security import generate_password_hash
 
 users_bp = Blueprint("users", __name__, url_prefix="/manage/users")
 
-def admin_required():
-    verify_jwt_in_request()
-    claims = get_jwt() or {}
-    if not claims.get("is_admin", False):
-        abort(403, description="Admins only")
-
 @users_bp.get("/")
 def list_users():
     admin_required()
@@ -55,7 +49,7 @@ def change_password(user_id: int):
     if not new_pw:
         flash("New password required.", "warning")
         return redirect(url_for("users.list_users"))
-    user.password_hash = generate_password_hash(new_pw)
+    user.set_password(new_pw)
     user.updated_at = datetime.utcnow()
     try:
         db.session.commit()
@@ -71,7 +65,6 @@ def toggle_admin(user_id: int):
     user = User.query.get_or_404(user_id)
     # prevent removing *your own* admin accidentally (optional safeguard)
     # You can remove this block if you don't want the safeguard.
-    from flask_jwt_extended import get_jwt_identity
     if str(user.id) == str(get_jwt_identity()):
         flash("You cannot change your own admin role.", "warning")
         return redirect(url_for("users.list_users"))
@@ -91,7 +84,6 @@ def delete_user(user_id: int):
     admin_required()
     user = User.query.get_or_404(user_id)
     # Optional: prevent deleting yourself
-    from flask_jwt_extended import get_jwt_identity
     if str(user.id) == str(get_jwt_identity()):
         flash("You cannot delete your own account.", "warning")
         return redirect(url_for("users.list_users"))